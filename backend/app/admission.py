@@ -0,0 +1,222 @@
+"""
+Adaptive admission control for VideoGPT
+Builds are admitted by what they are expected to cost rather than by a fixed
+worker count. A job's CPU and memory demand is estimated from its probed
+media, scene count and output geometry; it starts once the reservations of
+the running jobs plus its own fit the host and live CPU / memory pressure is
+under the limits. Each admitted job gets an ffmpeg thread budget sized to its
+estimate, so concurrent encodes don't oversubscribe the cores.
+
+    VIDEOGPT_ADMISSION=0               admit every job at once (no cost gating)
+    VIDEOGPT_CPU_TARGET=1.0            cores running jobs may reserve, as a fraction of the host's
+    VIDEOGPT_CPU_HIGH=90               live CPU % at which no new job starts
+    VIDEOGPT_MEMORY_TARGET=0.8         memory running jobs may reserve, as a fraction of RAM
+    VIDEOGPT_MEMORY_RESERVE_MB=512     memory always left free
+"""
+
+import os
+import math
+import time
+import threading
+from dataclasses import dataclass, asdict
+
+import psutil
+
+from cancellation import check_cancelled
+from metrics import log_event
+
+ADMISSION_ENV = "VIDEOGPT_ADMISSION"
+CPU_TARGET = float(os.getenv("VIDEOGPT_CPU_TARGET", "1.0"))
+CPU_HIGH = float(os.getenv("VIDEOGPT_CPU_HIGH", "90"))
+MEMORY_TARGET = float(os.getenv("VIDEOGPT_MEMORY_TARGET", "0.8"))
+MEMORY_RESERVE = int(os.getenv("VIDEOGPT_MEMORY_RESERVE_MB", "512")) * 1024 * 1024
+ADMISSION_POLL = 1.0        # seconds between re-checks of a waiting job
+STARVATION_SECONDS = 60     # after this the oldest waiting job stops being overtaken
+
+# Cost model (rough, per real-time second of output)
+WORDS_PER_SECOND = 2.6          # narration pace of the TTS voices
+MIN_SCENE_SECONDS = 2.0
+ENCODE_PIXELS_PER_CORE = 15e6   # x264 "medium" pixels/s one core keeps up with
+DECODE_PIXELS_PER_CORE = 60e6   # source video pixels/s one core decodes
+COMPOSITE_CORES = 1.0           # frame compositing runs on the build's own thread
+JOB_BASE_MEMORY = 200 * 1024 * 1024
+ENCODER_BYTES_PER_PIXEL = 60    # ~40 lookahead frames of yuv420 per writer
+DECODER_BYTES_PER_PIXEL = 24    # a few RGB frames buffered per source video
+IMAGE_BYTES_PER_PIXEL = 8       # decoded RGBA still plus its resized copy
+
+
+@dataclass
+class JobCost:
+    cores: float        # cores the job keeps busy
+    memory: int         # bytes
+    duration: float     # estimated seconds of output
+    frames: int
+    out_pixels: int     # pixels encoded per frame, all outputs together
+    outputs: int
+    scenes: int
+    media: int          # media files the scenes use
+    videos: int
+
+    def to_dict(self):
+        return {**asdict(self), "cores": round(self.cores, 2), "duration": round(self.duration, 1)}
+
+
+def narration_seconds(narration):
+    return max(len(narration.split()) / WORDS_PER_SECOND, MIN_SCENE_SECONDS)
+
+
+def estimate_cost(media_info, media_paths, scenes, width, height, fps, scale=1.0, extra_sizes=()):
+    """
+    Expected cost of rendering `scenes` over the probed media (`media_info`
+    from probe_media) at width x height * scale, plus `extra_sizes` outputs
+    """
+
+    duration = sum(narration_seconds(scene["narration"]) for scene in scenes)
+    sizes = [(int(width * scale), int(height * scale)), *extra_sizes]
+    out_pixels = sum(w * h for w, h in sizes)
+
+    # Scenes decode one at a time, so the heaviest source sets the decode load
+    used = set()
+    if media_paths:
+        used = {media_paths[min(i, len(media_paths) - 1)] for i in range(len(scenes))}
+    videos = [media_info[path] for path in used if "fps" in media_info.get(path, {})]
+    stills = [media_info[path] for path in used if "fps" not in media_info.get(path, {})]
+    decode_rate = max((v["width"] * v["height"] * (v["fps"] or fps) for v in videos), default=0)
+    largest_still = max((s["width"] * s["height"] for s in stills), default=0)
+    largest_video = max((v["width"] * v["height"] for v in videos), default=0)
+
+    cores = (COMPOSITE_CORES + out_pixels * fps / ENCODE_PIXELS_PER_CORE
+             + decode_rate / DECODE_PIXELS_PER_CORE)
+    memory = (JOB_BASE_MEMORY + out_pixels * ENCODER_BYTES_PER_PIXEL
+              + largest_video * DECODER_BYTES_PER_PIXEL + largest_still * IMAGE_BYTES_PER_PIXEL)
+    return JobCost(cores=cores, memory=int(memory), duration=duration,
+                   frames=int(duration * fps), out_pixels=out_pixels, outputs=len(sizes),
+                   scenes=len(scenes), media=len(used), videos=len(videos))
+
+
+def estimate_build(build_kwargs):
+    """
+    JobCost of a build from its kwargs (probes the media unless given in
+    "media"; reads prompts.json if no scenes)
+    """
+    from video_engine import FPS, OUT_H, OUT_W, load_scenes, probe_media, read_user_media
+    from renderer import OUTPUT_FORMATS, RENDER_PROFILES
+
+    scenes = build_kwargs.get("scenes") or load_scenes()
+    media = build_kwargs.get("media")
+    if media is None:
+        media_paths = read_user_media(build_kwargs["image_folder"])
+        media = media_paths, probe_media(media_paths)
+    media_paths, media_info = media
+    scale = RENDER_PROFILES[build_kwargs.get("render_profile", "final")]["scale"]
+    extra_sizes = [(int(OUTPUT_FORMATS[name][0] * scale), int(OUTPUT_FORMATS[name][1] * scale))
+                   for name in build_kwargs.get("formats") or ()
+                   if OUTPUT_FORMATS[name] != (OUT_W, OUT_H)]
+    return estimate_cost(media_info, media_paths, scenes,
+                         OUT_W, OUT_H, FPS, scale, extra_sizes)
+
+
+class AdmissionController:
+    """
+    Admits jobs while their estimated cost fits what the running jobs have
+    reserved and the host's live CPU / memory pressure allows. One job is
+    always admitted when nothing runs, however big it is.
+    """
+
+    def __init__(self, cores=None, memory=None, cpu_target=CPU_TARGET, cpu_high=CPU_HIGH,
+                 memory_target=MEMORY_TARGET, memory_reserve=MEMORY_RESERVE):
+        self.cores = cores or psutil.cpu_count() or 1
+        self.memory = memory or psutil.virtual_memory().total
+        self.cpu_target = cpu_target
+        self.cpu_high = cpu_high
+        self.memory_target = memory_target
+        self.memory_reserve = memory_reserve
+        self.cond = threading.Condition()
+        self.admitted = {}  # job_id -> JobCost
+        self.waiting = {}   # job_id -> time it started waiting
+        self.cpu = psutil.cpu_percent(None)  # primes the live CPU reading
+        self.cpu_sampled = time.monotonic()
+
+    def live_cpu(self):
+        """
+        Host CPU %, sampled at most once per ADMISSION_POLL (call with `cond`
+        held). Every waiter reads the same sample: cpu_percent(None) measures
+        since its previous call, so per-waiter calls would see slivers of a
+        second and flap.
+        """
+        now = time.monotonic()
+        if now - self.cpu_sampled >= ADMISSION_POLL:
+            self.cpu = psutil.cpu_percent(None)
+            self.cpu_sampled = now
+        return self.cpu
+
+    def threads_for(self, cost):
+        """ffmpeg threads of a job: the cores it was admitted for"""
+        return max(1, min(self.cores, math.ceil(cost.cores)))
+
+    def _fits(self, job_id, cost):
+        if not self.admitted:
+            return True
+        oldest = min(self.waiting, key=self.waiting.get)
+        if oldest != job_id and time.time() - self.waiting[oldest] > STARVATION_SECONDS:
+            return False
+        if sum(c.cores for c in self.admitted.values()) + cost.cores > self.cores * self.cpu_target:
+            return False
+        if sum(c.memory for c in self.admitted.values()) + cost.memory > self.memory * self.memory_target:
+            return False
+        if self.live_cpu() >= self.cpu_high:
+            return False
+        return psutil.virtual_memory().available - cost.memory >= self.memory_reserve
+
+    def acquire(self, job_id, cost, cancel=None, on_wait=None):
+        """
+        Blocks until the job fits and returns its ffmpeg thread budget.
+        `on_wait()` is called once if it has to wait; raises JobCancelled if
+        `cancel` fires meanwhile.
+        """
+
+        started = time.time()
+        with self.cond:
+            self.waiting[job_id] = started
+            try:
+                notified = False
+                while not self._fits(job_id, cost):
+                    check_cancelled(cancel)
+                    if not notified and on_wait is not None:
+                        on_wait()
+                        notified = True
+                    self.cond.wait(ADMISSION_POLL)
+                self.admitted[job_id] = cost
+            finally:
+                del self.waiting[job_id]
+                self.cond.notify_all()
+
+        threads = self.threads_for(cost)
+        log_event("admitted", wait=round(time.time() - started, 3), cores=round(cost.cores, 2),
+                  memory=cost.memory, threads=threads)
+        return threads
+
+    def release(self, job_id):
+        with self.cond:
+            self.admitted.pop(job_id, None)
+            self.cond.notify_all()
+
+    def snapshot(self):
+        with self.cond:
+            return {
+                "cores": self.cores,
+                "memory": self.memory,
+                "reserved_cores": round(sum(c.cores for c in self.admitted.values()), 2),
+                "reserved_memory": sum(c.memory for c in self.admitted.values()),
+                "running": len(self.admitted),
+                "waiting": len(self.waiting),
+                "cpu_percent": self.live_cpu(),
+                "available_memory": psutil.virtual_memory().available,
+            }
+
+
+def admission_from_env():
+    """An AdmissionController unless VIDEOGPT_ADMISSION=0"""
+    if os.getenv(ADMISSION_ENV, "1") == "0":
+        return None
+    return AdmissionController()
@@ -0,0 +1,303 @@
+"""
+Audio mixing stage for VideoGPT
+Decodes narration and background music to PCM once and mixes them with NumPy
+"""
+
+import subprocess
+import numpy as np
+from moviepy.config import get_setting
+
+# -------------------------
+# CONFIG
+# -------------------------
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+MUSIC_VOLUME = 0.18       # 18% volume for music (same level as the old volumex mix)
+DUCK_GAIN = 0.45          # Extra attenuation applied to music while narration is speaking
+DUCK_THRESHOLD_DB = -38   # Narration RMS above this level counts as speech
+DUCK_WINDOW = 0.02        # Energy analysis window in seconds
+DUCK_ATTACK = 0.05        # Seconds for the music to duck once speech starts
+DUCK_RELEASE = 0.40       # Seconds for the music to recover after speech stops
+MUSIC_FADE_IN = 1.0
+MUSIC_FADE_OUT = 2.0
+MIX_FADE_OUT = 0.25       # Short fade on the whole mix to avoid a click at the end
+
+AUDIO_CODEC = "aac"
+AUDIO_BITRATE = "192k"
+PCM_CHUNK_BYTES = 1 << 20
+
+
+def _ffmpeg():
+    return get_setting("FFMPEG_BINARY")
+
+# -------------------------
+# DECODE / ENCODE
+# -------------------------
+def _decode_command(path, sample_rate, channels):
+    return [
+        _ffmpeg(), "-v", "error",
+        "-i", path,
+        "-vn",
+        "-f", "f32le", "-acodec", "pcm_f32le",
+        "-ac", str(channels), "-ar", str(sample_rate),
+        "-",
+    ]
+
+def decode_audio(path, sample_rate=SAMPLE_RATE, channels=CHANNELS):
+    """
+    Decodes any audio file ffmpeg can read into a float32 PCM array
+    of shape (samples, channels).
+    """
+
+    proc = subprocess.run(_decode_command(path, sample_rate, channels),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"❌ Could not decode audio: {path}\n"
+            f"   {proc.stderr.decode(errors='ignore').strip()}"
+        )
+
+    return np.frombuffer(proc.stdout, dtype=np.float32).reshape(-1, channels)
+
+def decode_audio_into(path, fileobj, sample_rate=SAMPLE_RATE, channels=CHANNELS):
+    """
+    Streams the decoded float32 PCM of `path` into an open binary file
+    without holding the whole clip in memory. Returns the number of
+    samples (frames) written.
+    """
+
+    proc = subprocess.Popen(_decode_command(path, sample_rate, channels),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    written = 0
+    while True:
+        chunk = proc.stdout.read(PCM_CHUNK_BYTES)
+        if not chunk:
+            break
+        fileobj.write(chunk)
+        written += len(chunk)
+    stderr = proc.stderr.read()
+    proc.wait()
+
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"❌ Could not decode audio: {path}\n"
+            f"   {stderr.decode(errors='ignore').strip()}"
+        )
+
+    return written // (4 * channels)
+
+def encode_audio(pcm, output_file, sample_rate=SAMPLE_RATE,
+                 codec=AUDIO_CODEC, bitrate=AUDIO_BITRATE):
+    """
+    Encodes a PCM array (in memory or memory-mapped) into a compressed
+    audio file that the video encoder can mux directly (no re-encode).
+    The samples are streamed to ffmpeg in chunks.
+    """
+
+    cmd = [
+        _ffmpeg(), "-y", "-v", "error",
+        "-f", "f32le", "-ar", str(sample_rate), "-ac", str(pcm.shape[1]),
+        "-i", "-",
+        "-c:a", codec, "-b:a", bitrate,
+        output_file,
+    ]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE)
+
+    step = max(1, PCM_CHUNK_BYTES // (4 * pcm.shape[1]))
+    try:
+        for start in range(0, len(pcm), step):
+            chunk = np.ascontiguousarray(pcm[start:start + step], dtype=np.float32)
+            proc.stdin.write(chunk.tobytes())
+    except BrokenPipeError:
+        pass
+    _, stderr = proc.communicate()
+
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"❌ Could not encode audio mix: {output_file}\n"
+            f"   {stderr.decode(errors='ignore').strip()}"
+        )
+
+    return output_file
+
+# -------------------------
+# MIXING HELPERS
+# -------------------------
+def fit_to_length(pcm, num_samples):
+    """
+    Loops or trims a PCM array to exactly `num_samples` by indexing.
+    """
+
+    if len(pcm) == 0:
+        return np.zeros((num_samples, pcm.shape[1]), dtype=np.float32)
+
+    if len(pcm) >= num_samples:
+        return pcm[:num_samples]
+
+    repeats = -(-num_samples // len(pcm))
+    return np.tile(pcm, (repeats, 1))[:num_samples]
+
+def fade_envelope(num_samples, fade_in=0.0, fade_out=0.0, sample_rate=SAMPLE_RATE):
+    """
+    Linear fade-in/fade-out gain curve of length `num_samples`.
+    """
+
+    env = np.ones(num_samples, dtype=np.float32)
+
+    n_in = min(int(fade_in * sample_rate), num_samples)
+    if n_in > 0:
+        env[:n_in] = np.linspace(0.0, 1.0, n_in, dtype=np.float32)
+
+    n_out = min(int(fade_out * sample_rate), num_samples)
+    if n_out > 0:
+        env[num_samples - n_out:] *= np.linspace(1.0, 0.0, n_out, dtype=np.float32)
+
+    return env
+
+def ducking_envelope(narration, sample_rate=SAMPLE_RATE):
+    """
+    Sidechain gain curve for the music: drops to DUCK_GAIN while the
+    narration's short-term energy is above DUCK_THRESHOLD_DB, with
+    attack/release smoothing so the music doesn't pump.
+    """
+
+    num_samples = len(narration)
+    if num_samples == 0:
+        return np.ones(0, dtype=np.float32)
+
+    window = max(1, int(DUCK_WINDOW * sample_rate))
+    num_windows = -(-num_samples // window)
+
+    # Short-term RMS energy of the (mono) narration, one value per window
+    mono = narration.mean(axis=1) if narration.ndim == 2 else narration
+    padded = np.zeros(num_windows * window, dtype=np.float32)
+    padded[:num_samples] = mono
+    rms = np.sqrt(np.mean(padded.reshape(num_windows, window) ** 2, axis=1))
+    rms_db = 20 * np.log10(np.maximum(rms, 1e-9))
+
+    target = np.where(rms_db > DUCK_THRESHOLD_DB, DUCK_GAIN, 1.0)
+
+    # One-pole smoothing with separate attack (ducking) and release coefficients
+    attack = np.exp(-DUCK_WINDOW / DUCK_ATTACK)
+    release = np.exp(-DUCK_WINDOW / DUCK_RELEASE)
+    gains = np.empty(num_windows, dtype=np.float32)
+    gain = 1.0
+    for i, t in enumerate(target):
+        coeff = attack if t < gain else release
+        gain = t + coeff * (gain - t)
+        gains[i] = gain
+
+    # Interpolate the per-window gains back up to per-sample resolution
+    centers = (np.arange(num_windows) + 0.5) * window
+    return np.interp(np.arange(num_samples), centers, gains).astype(np.float32)
+
+# -------------------------
+# LOUDNESS (ITU-R BS.1770)
+# -------------------------
+def _biquad_response(b, a, freqs, sample_rate):
+    z = np.exp(-2j * np.pi * freqs / sample_rate)
+    return (b[0] + b[1] * z + b[2] * z ** 2) / (a[0] + a[1] * z + a[2] * z ** 2)
+
+def _k_weighting_response(num_samples, sample_rate):
+    """
+    Frequency response of the BS.1770 K-weighting filter (high shelf +
+    high pass, RBJ biquads) at the rfft bins of a `num_samples` signal.
+    """
+
+    freqs = np.fft.rfftfreq(num_samples, 1.0 / sample_rate)
+
+    # Stage 1: +4 dB high shelf around 1.5 kHz (head acoustics)
+    gain = 10 ** (4.0 / 40)
+    w0 = 2 * np.pi * 1681.97 / sample_rate
+    alpha = np.sin(w0) / (2 * 0.7072)
+    cos_w0 = np.cos(w0)
+    sq = 2 * np.sqrt(gain) * alpha
+    shelf_b = [gain * ((gain + 1) + (gain - 1) * cos_w0 + sq),
+               -2 * gain * ((gain - 1) + (gain + 1) * cos_w0),
+               gain * ((gain + 1) + (gain - 1) * cos_w0 - sq)]
+    shelf_a = [(gain + 1) - (gain - 1) * cos_w0 + sq,
+               2 * ((gain - 1) - (gain + 1) * cos_w0),
+               (gain + 1) - (gain - 1) * cos_w0 - sq]
+
+    # Stage 2: RLB high pass around 38 Hz
+    w0 = 2 * np.pi * 38.14 / sample_rate
+    alpha = np.sin(w0) / (2 * 0.5003)
+    cos_w0 = np.cos(w0)
+    hp_b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+    hp_a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+
+    return (_biquad_response(shelf_b, shelf_a, freqs, sample_rate) *
+            _biquad_response(hp_b, hp_a, freqs, sample_rate))
+
+def integrated_loudness(pcm, sample_rate=SAMPLE_RATE):
+    """
+    Gated integrated loudness in LUFS (BS.1770: K-weighting, 400 ms blocks
+    with 75% overlap, -70 LUFS absolute gate, -10 LU relative gate).
+    Returns -inf for silence or clips shorter than one block.
+    """
+
+    block = int(0.4 * sample_rate)
+    step = block // 4
+    num_samples = len(pcm)
+    if num_samples < block:
+        return float("-inf")
+
+    # K-weight each channel in the frequency domain (one FFT per channel)
+    response = _k_weighting_response(num_samples, sample_rate)
+    power = np.zeros(num_samples, dtype=np.float64)
+    for ch in range(pcm.shape[1]):
+        weighted = np.fft.irfft(np.fft.rfft(pcm[:, ch]) * response, n=num_samples)
+        power += weighted ** 2
+
+    # Mean square of every overlapping block via a cumulative sum
+    cumulative = np.concatenate(([0.0], np.cumsum(power)))
+    starts = np.arange(0, num_samples - block + 1, step)
+    block_power = (cumulative[starts + block] - cumulative[starts]) / block
+
+    with np.errstate(divide="ignore"):
+        block_lufs = -0.691 + 10 * np.log10(block_power)
+
+    gated = block_power[block_lufs > -70.0]
+    if len(gated) == 0:
+        return float("-inf")
+
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) - 10.0
+    gated = block_power[block_lufs > max(relative_gate, -70.0)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+# -------------------------
+# MIX
+# -------------------------
+def mix_narration_and_music(narration, music=None, sample_rate=SAMPLE_RATE,
+                            music_volume=MUSIC_VOLUME, out=None):
+    """
+    Mixes the full narration track with looped, ducked and faded background
+    music. Returns a float32 PCM array the same length as the narration,
+    written into `out` (e.g. a memory-mapped file) when given.
+    """
+
+    num_samples = len(narration)
+    if out is None:
+        mix = np.array(narration, dtype=np.float32, copy=True)
+    else:
+        mix = out
+        mix[:] = narration
+
+    if music is not None and len(music) > 0 and num_samples > 0:
+        bed = fit_to_length(music, num_samples)
+        gain = ducking_envelope(narration, sample_rate)
+        gain *= fade_envelope(num_samples, MUSIC_FADE_IN, MUSIC_FADE_OUT, sample_rate)
+        gain *= music_volume
+        mix += bed * gain[:, None]
+
+    mix *= fade_envelope(num_samples, 0.0, MIX_FADE_OUT, sample_rate)[:, None]
+
+    # Keep peaks inside full scale instead of letting the encoder clip them
+    peak = float(np.max(np.abs(mix))) if num_samples else 0.0
+    if peak > 0.99:
+        mix *= 0.99 / peak
+
+    return mix
@@ -0,0 +1,103 @@
+"""
+Batch builds for VideoGPT
+Groups several build jobs under one batch id. Jobs of a batch share the
+work that doesn't depend on their render settings (scene generation and
+the LLM analysis of each title, the media list and probe of each upload),
+and the batch reports aggregate progress over its jobs. TTS clips are
+shared through the process-wide TTS cache; decoded frames aren't shared,
+each build decodes its media while rendering.
+"""
+
+import os
+import time
+import threading
+
+BATCH_CONCURRENCY_ENV = "VIDEOGPT_BATCH_CONCURRENCY"   # builds of all batches at once
+
+
+class Batch:
+    """
+    One submitted batch: its job ids plus memoized results shared by its
+    jobs. `shared(key, compute)` runs `compute` once per key even when
+    several jobs ask at the same time; the others wait for that result.
+    """
+
+    def __init__(self, batch_id):
+        self.id = batch_id
+        self.job_ids = []
+        self.created_at = time.time()
+        self.lock = threading.Lock()
+        self.results = {}   # key -> value
+        self.pending = {}   # key -> Lock held while computing
+
+    def shared(self, key, compute):
+        with self.lock:
+            if key in self.results:
+                return self.results[key]
+            key_lock = self.pending.setdefault(key, threading.Lock())
+        with key_lock:
+            with self.lock:
+                if key in self.results:
+                    return self.results[key]
+            value = compute()
+            with self.lock:
+                self.results[key] = value
+                self.pending.pop(key, None)
+            return value
+
+
+def batch_concurrency(workers):
+    """Builds to run at once: the env override, else one per render worker"""
+    configured = int(os.getenv(BATCH_CONCURRENCY_ENV, "0") or 0)
+    return configured if configured > 0 else max(workers, 1)
+
+
+def summarize_batch(batch, jobs):
+    """
+    Aggregate view of a batch: mean progress, per-status counts, the overall
+    status (queued / building / done / error / cancelled / expired / partial)
+    and each job's summary. Jobs no longer in `jobs` (deleted, or expired by
+    the janitor) count as "expired" and as finished without an output.
+    """
+
+    records = [jobs.get(job_id, {"status": "expired"}) for job_id in batch.job_ids]
+    counts = {}
+    for job in records:
+        status = job.get("status", "unknown")
+        counts[status] = counts.get(status, 0) + 1
+
+    total = len(records)
+    finished = sum(counts.get(status, 0) for status in ("done", "error", "cancelled", "expired"))
+    if finished < total:
+        status = "queued" if counts.get("queued", 0) == total else "building"
+    elif counts.get("done", 0) == total:
+        status = "done"
+    elif counts.get("cancelled", 0) == total:
+        status = "cancelled"
+    elif counts.get("expired", 0) == total:
+        status = "expired"
+    elif counts.get("done", 0) == 0 and counts.get("cancelled", 0) == 0:
+        status = "error"
+    else:
+        status = "partial"
+
+    return {
+        "batch_id": batch.id,
+        "status": status,
+        "progress": round(sum(job.get("progress", 0) for job in records) / total) if total else 100,
+        "counts": counts,
+        "created_at": batch.created_at,
+        "jobs": [
+            {
+                "job_id": job_id,
+                "title": job.get("title"),
+                "render_profile": job.get("render_profile"),
+                "status": job.get("status"),
+                "progress": job.get("progress", 0),
+                "status_message": job.get("status_message"),
+                "eta": job.get("eta"),
+                "error": job.get("error"),
+            }
+            for job_id, job in zip(batch.job_ids, records)
+        ],
+    }
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the VideoGPT build pipeline
+Builds videos from synthetic scenes (generated stills and clips, stubbed LLM
+and TTS) and records end-to-end time, per-stage time, peak memory and render
+fps for each scene count / resolution. Results are written as JSON and can be
+checked against a previous run for regressions.
+
+    python benchmark.py --scenes 3,6 --resolutions 540x960,1080x1920
+    python benchmark.py --baseline benchmarks/last.json --threshold 0.15
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+import numpy as np
+from PIL import Image
+
+import video_engine
+from audio_mixer import _ffmpeg
+from metrics import PeakRSS
+from music_library import get_music_library
+
+DEFAULT_SCENES = "3,6"
+DEFAULT_RESOLUTIONS = "540x960,1080x1920"
+DEFAULT_OUTPUT = os.path.join("benchmarks", "latest.json")
+CLIP_EVERY = 3            # every Nth scene is a video clip, the rest are stills
+CLIP_SECONDS = 2
+TTS_WORDS_PER_SECOND = 2.5
+
+LLM_ANSWERS = {
+    "subtitle_style": "modern_minimal",
+    "narration_style": "storyteller_female",
+    "mood": "calm",
+}
+EMOTIONS = ["dramatic", "intense", "calm", "excited", "sad", "neutral"]
+NARRATION = ("Every frame of this synthetic scene exists only to measure "
+             "how fast the pipeline can turn words and pictures into video")
+
+
+# -------------------------
+# STUBS
+# -------------------------
+def stub_ask_llm(call, system, user_prompt, temperature=0.3):
+    message = types.SimpleNamespace(content=LLM_ANSWERS.get(call, ""))
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+def stub_tts(text, output_file, voice_profile, emotion="neutral"):
+    """
+    A tone as long as the narration would take to read, encoded as MP3 like
+    edge-tts output.
+    """
+    seconds = max(len(text.split()) / TTS_WORDS_PER_SECOND, 0.5)
+    subprocess.run([
+        _ffmpeg(), "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds:.2f}",
+        "-ac", "1", "-f", "mp3", output_file,
+    ], check=True)
+    return output_file
+
+def install_stubs():
+    video_engine.ask_llm = stub_ask_llm
+    video_engine.make_expressive_tts = stub_tts
+
+
+# -------------------------
+# FIXTURES
+# -------------------------
+def make_still(path, width, height, seed):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = rng.integers(0, 255, size=3)
+    image = np.stack([
+        (x * 255 // max(width - 1, 1) + base[0]) % 256,
+        (y * 255 // max(height - 1, 1) + base[1]) % 256,
+        ((x + y) * 255 // max(width + height - 2, 1) + base[2]) % 256,
+    ], axis=-1).astype(np.uint8)
+    Image.fromarray(image).save(path, quality=90)
+
+def make_clip(path, width, height, seconds=CLIP_SECONDS):
+    subprocess.run([
+        _ffmpeg(), "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=30:duration={seconds}",
+        "-pix_fmt", "yuv420p", "-c:v", "libx264", "-preset", "ultrafast", path,
+    ], check=True)
+
+def make_fixtures(folder, num_scenes, width, height):
+    """
+    Writes prompts.json into the current directory and scene_N media into
+    `folder` (media sized like typical phone uploads at this resolution).
+    """
+    os.makedirs(folder, exist_ok=True)
+    scenes = []
+    for i in range(num_scenes):
+        scenes.append({
+            "narration": f"Scene {i + 1}. {NARRATION}",
+            "image_prompt": f"synthetic scene {i}",
+            "emotion": EMOTIONS[i % len(EMOTIONS)],
+        })
+        if (i + 1) % CLIP_EVERY == 0:
+            make_clip(os.path.join(folder, f"scene_{i}.mp4"), width, height)
+        else:
+            make_still(os.path.join(folder, f"scene_{i}.jpg"), width, height, seed=i)
+
+    with open(video_engine.PROMPTS_FILE, "w") as f:
+        json.dump({"scenes": scenes}, f, indent=2)
+
+
+# -------------------------
+# RUNS
+# -------------------------
+def run_case(num_scenes, width, height, repeat):
+    """
+    One build in a fresh workspace (cold TTS cache). Returns the result row.
+    """
+    workspace = tempfile.mkdtemp(prefix="videogpt_bench_")
+    cwd = os.getcwd()
+    os.chdir(workspace)
+    try:
+        make_fixtures("media", num_scenes, width, height)
+
+        stages = {}
+        render = {}
+        def progress(event):
+            if event["type"] == "stage_end":
+                stages[event["stage"]] = event["duration"]
+            elif event["type"] == "render":
+                render.update(event)
+
+        started = time.perf_counter()
+        with PeakRSS() as rss:
+            output = video_engine.build_video_from_user_images(
+                "media", style="cinematic", title="Benchmark",
+                work_dir="work", progress=progress, width=width, height=height,
+            )
+        total = time.perf_counter() - started
+
+        frames = render.get("frames", 0)
+        return {
+            "scenes": num_scenes,
+            "width": width,
+            "height": height,
+            "repeat": repeat,
+            "total_seconds": round(total, 3),
+            "stages": stages,
+            "frames": frames,
+            "render_fps": round(frames / stages["render"], 2) if stages.get("render") else None,
+            "peak_rss": rss.peak,
+            "output_bytes": os.path.getsize(output),
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+def summarize(results):
+    """
+    Median total time / render fps / peak RSS per (scenes, resolution) case.
+    """
+    cases = {}
+    for row in results:
+        key = f"{row['scenes']}x{row['width']}x{row['height']}"
+        cases.setdefault(key, []).append(row)
+
+    summary = {}
+    for key, rows in cases.items():
+        fps = [r["render_fps"] for r in rows if r["render_fps"]]
+        summary[key] = {
+            "runs": len(rows),
+            "total_seconds": round(statistics.median(r["total_seconds"] for r in rows), 3),
+            "render_fps": round(statistics.median(fps), 2) if fps else None,
+            "peak_rss": int(statistics.median(r["peak_rss"] for r in rows)),
+        }
+    return summary
+
+def check_regressions(summary, baseline, threshold):
+    """
+    Cases that got slower (total time up, render fps down) or heavier (peak
+    RSS up) by more than `threshold` versus the baseline summary.
+    """
+    regressions = []
+    for key, current in summary.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        checks = [
+            ("total_seconds", current["total_seconds"], previous["total_seconds"], 1),
+            ("render_fps", current["render_fps"], previous["render_fps"], -1),
+            ("peak_rss", current["peak_rss"], previous["peak_rss"], 1),
+        ]
+        for metric, now, before, direction in checks:
+            if not now or not before:
+                continue
+            change = (now - before) / before * direction
+            if change > threshold:
+                regressions.append(f"{key} {metric}: {before} -> {now} ({change:+.0%})")
+    return regressions
+
+def parse_resolutions(value):
+    resolutions = []
+    for item in value.split(","):
+        width, height = (int(v) for v in item.lower().split("x"))
+        resolutions.append((width, height))
+    return resolutions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the VideoGPT build pipeline")
+    parser.add_argument("--scenes", default=DEFAULT_SCENES, help="comma-separated scene counts")
+    parser.add_argument("--resolutions", default=DEFAULT_RESOLUTIONS, help="comma-separated WxH")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write results JSON")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed relative slowdown before a case counts as a regression")
+    args = parser.parse_args()
+
+    install_stubs()
+    scene_counts = [int(n) for n in args.scenes.split(",")]
+    resolutions = parse_resolutions(args.resolutions)
+
+    # Decode the music library once, outside the timed builds
+    get_music_library()
+
+    print("=" * 80)
+    print("⏱️  VideoGPT Benchmark")
+    print("=" * 80)
+
+    results = []
+    for num_scenes in scene_counts:
+        for width, height in resolutions:
+            for repeat in range(args.repeat):
+                print(f"\n▶️  {num_scenes} scenes @ {width}x{height} (run {repeat + 1}/{args.repeat})")
+                row = run_case(num_scenes, width, height, repeat)
+                results.append(row)
+                print(f"   ✓ {row['total_seconds']:.2f}s total, {row['render_fps']} fps, "
+                      f"peak {row['peak_rss'] / 2**20:.0f} MB")
+
+    summary = summarize(results)
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "summary": summary,
+        "results": results,
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "=" * 80)
+    for key, case in summary.items():
+        print(f"   {key:<16} {case['total_seconds']:8.2f}s  {case['render_fps']} fps  "
+              f"{case['peak_rss'] / 2**20:.0f} MB")
+    print(f"\n📄 Results: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["summary"]
+        regressions = check_regressions(summary, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions over {args.threshold:.0%} vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,566 @@
+"""
+Distributed rendering for VideoGPT
+A job broker and a shared media store. The API enqueues builds; render
+workers lease them, keep the lease alive with heartbeats and upload the
+outputs back. A job whose worker stops heartbeating is put back in the queue
+when its lease expires, up to a retry limit.
+
+Across several nodes the broker is Redis (RedisJobBroker): its Lua scripts
+make every lease, heartbeat and expiry atomic on the server. The SQLite
+broker (JobBroker) is for workers on the API's own host, and for tests:
+SQLite's locking and WAL need shared memory, which network filesystems
+(NFS, SMB) don't provide, so a database file mounted on several nodes can
+hand one job to two workers or corrupt.
+
+    VIDEOGPT_BROKER=redis://broker-host:6379/0     several render nodes
+    VIDEOGPT_BROKER=/var/lib/videogpt/broker.db    workers on this host only
+    VIDEOGPT_MEDIA_STORE=/shared/videogpt/media    required with a Redis broker
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+from urllib.parse import urlsplit, urlunsplit
+
+from cancellation import JobCancelled
+
+BROKER_ENV = "VIDEOGPT_BROKER"
+STORE_ENV = "VIDEOGPT_MEDIA_STORE"
+LEASE_SECONDS = int(os.getenv("VIDEOGPT_LEASE_SECONDS", "60"))
+MAX_ATTEMPTS = int(os.getenv("VIDEOGPT_MAX_ATTEMPTS", "3"))
+POLL_INTERVAL = 0.5   # seconds between broker polls of a waiting API thread
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,             -- queued | leased | done | failed | cancelled
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    event TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_job ON events (job_id, seq);
+"""
+
+
+class JobBroker:
+    """
+    Job queue with leases in a local SQLite file (one host; see the module
+    docstring). Every call opens its own connection, so one broker object
+    can be shared between threads.
+    """
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return _Connection(db)
+
+    def enqueue(self, job_id, payload):
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, payload, status, max_attempts, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(payload), self.max_attempts, now, now),
+            )
+
+    def _expire_leases(self, db, now):
+        """Requeues jobs whose lease ran out, or fails them once out of attempts"""
+        expired = db.execute(
+            "SELECT id, attempts, max_attempts, worker FROM jobs "
+            "WHERE status = 'leased' AND lease_expires < ?", (now,)).fetchall()
+        for job in expired:
+            if job["attempts"] >= job["max_attempts"]:
+                db.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, worker = NULL, updated_at = ? "
+                    "WHERE id = ?",
+                    (f"Render worker lost {job['attempts']} time(s) (lease expired)", now, job["id"]))
+            else:
+                db.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL, updated_at = ? WHERE id = ?",
+                    (now, job["id"]))
+                self._publish(db, job["id"], {"type": "retry", "attempt": job["attempts"] + 1,
+                                              "lost_worker": job["worker"]})
+
+    def reap(self):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire_leases(db, time.time())
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def lease(self, worker_id):
+        """
+        Claims the oldest queued job for `worker_id`. Returns (job_id,
+        payload, attempt) or None when the queue is empty.
+        """
+
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire_leases(db, now)
+                job = db.execute(
+                    "SELECT id, payload, attempts FROM jobs WHERE status = 'queued' "
+                    "ORDER BY created_at LIMIT 1").fetchone()
+                if job is not None:
+                    db.execute(
+                        "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (worker_id, now + self.lease_seconds, now, job["id"]))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        if job is None:
+            return None
+        return job["id"], json.loads(job["payload"]), job["attempts"] + 1
+
+    def heartbeat(self, job_id, worker_id):
+        """Extends the lease; False if the worker no longer holds it"""
+        now = time.time()
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result):
+        return self._finish(job_id, worker_id, "done", result=json.dumps(result))
+
+    def fail(self, job_id, worker_id, error):
+        return self._finish(job_id, worker_id, "failed", error=error)
+
+    def _finish(self, job_id, worker_id, status, result=None, error=None):
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, worker = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (status, result, error, time.time(), job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued or leased job. Its worker finds out at the next
+        heartbeat (the lease is gone) and stops building.
+        """
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'cancelled', worker = NULL, updated_at = ? "
+                "WHERE id = ? AND status IN ('queued', 'leased')", (time.time(), job_id))
+            return cursor.rowcount == 1
+
+    def get(self, job_id):
+        with self._connect() as db:
+            job = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None:
+            return None
+        job = dict(job)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def _publish(self, db, job_id, event):
+        db.execute("INSERT INTO events (job_id, event) VALUES (?, ?)", (job_id, json.dumps(event)))
+
+    def publish(self, job_id, event):
+        with self._connect() as db:
+            self._publish(db, job_id, event)
+
+    def events(self, job_id, after_seq=0):
+        """[(seq, event)] published for a job after `after_seq`"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT seq, event FROM events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after_seq)).fetchall()
+        return [(row["seq"], json.loads(row["event"])) for row in rows]
+
+    def forget(self, job_id):
+        with self._connect() as db:
+            db.execute("DELETE FROM events WHERE job_id = ?", (job_id,))
+            db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+
+class _Connection:
+    """sqlite3 connection that closes on exit (sqlite3's own only ends a transaction)"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, *exc):
+        self.db.close()
+
+
+REDIS_SCHEMES = ("redis://", "rediss://", "unix://")
+
+# Shared by reap and lease: requeues jobs whose lease ran out (score < now),
+# or fails them once out of attempts. ARGV[1] = now, ARGV[2] = key prefix.
+_REDIS_EXPIRE = """
+local function expire_leases(now, prefix)
+    local queued, leased = prefix .. 'queued', prefix .. 'leased'
+    for _, id in ipairs(redis.call('ZRANGEBYSCORE', leased, '-inf', '(' .. now)) do
+        local job = prefix .. 'job:' .. id
+        local attempts = tonumber(redis.call('HGET', job, 'attempts'))
+        local worker = redis.call('HGET', job, 'worker')
+        redis.call('ZREM', leased, id)
+        if attempts >= tonumber(redis.call('HGET', job, 'max_attempts')) then
+            redis.call('HSET', job, 'status', 'failed', 'worker', '', 'updated_at', now,
+                       'error', 'Render worker lost ' .. attempts .. ' time(s) (lease expired)')
+        else
+            redis.call('HSET', job, 'status', 'queued', 'worker', '', 'updated_at', now)
+            redis.call('ZADD', queued, redis.call('HGET', job, 'created_at'), id)
+            redis.call('RPUSH', prefix .. 'events:' .. id, cjson.encode(
+                {type = 'retry', attempt = attempts + 1, lost_worker = worker}))
+        end
+    end
+end
+"""
+_REDIS_REAP = _REDIS_EXPIRE + "expire_leases(ARGV[1], ARGV[2])"
+# ARGV[3] = worker id, ARGV[4] = lease expiry. Returns {id, payload, attempt} or nil
+_REDIS_LEASE = _REDIS_EXPIRE + """
+expire_leases(ARGV[1], ARGV[2])
+local prefix = ARGV[2]
+local id = redis.call('ZRANGE', prefix .. 'queued', 0, 0)[1]
+if not id then return nil end
+local job = prefix .. 'job:' .. id
+redis.call('ZREM', prefix .. 'queued', id)
+local attempt = redis.call('HINCRBY', job, 'attempts', 1)
+redis.call('HSET', job, 'status', 'leased', 'worker', ARGV[3], 'lease_expires', ARGV[4],
+           'updated_at', ARGV[1])
+redis.call('ZADD', prefix .. 'leased', ARGV[4], id)
+return {id, redis.call('HGET', job, 'payload'), attempt}
+"""
+# KEYS[1] = job, ARGV: prefix, id, worker, lease expiry, now
+_REDIS_HEARTBEAT = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'leased'
+        or redis.call('HGET', KEYS[1], 'worker') ~= ARGV[3] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'lease_expires', ARGV[4], 'updated_at', ARGV[5])
+redis.call('ZADD', ARGV[1] .. 'leased', ARGV[4], ARGV[2])
+return 1
+"""
+# KEYS[1] = job, ARGV: prefix, id, worker, status, result, error, now
+_REDIS_FINISH = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'leased'
+        or redis.call('HGET', KEYS[1], 'worker') ~= ARGV[3] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'status', ARGV[4], 'result', ARGV[5], 'error', ARGV[6],
+           'worker', '', 'updated_at', ARGV[7])
+redis.call('ZREM', ARGV[1] .. 'leased', ARGV[2])
+return 1
+"""
+# KEYS[1] = job, ARGV: prefix, id, now
+_REDIS_CANCEL = """
+local status = redis.call('HGET', KEYS[1], 'status')
+if status ~= 'queued' and status ~= 'leased' then return 0 end
+redis.call('HSET', KEYS[1], 'status', 'cancelled', 'worker', '', 'updated_at', ARGV[3])
+redis.call('ZREM', ARGV[1] .. 'queued', ARGV[2])
+redis.call('ZREM', ARGV[1] .. 'leased', ARGV[2])
+return 1
+"""
+
+
+def redact_url(url):
+    """`url` without its userinfo (redis://:password@host -> redis://host), for logs"""
+    parts = urlsplit(url)
+    if not parts.netloc:
+        return url   # unix:///path/to/socket
+    host = parts.hostname or ""
+    if parts.port is not None:
+        host = f"{host}:{parts.port}"
+    return urlunsplit(parts._replace(netloc=host))
+
+
+class RedisJobBroker:
+    """
+    The JobBroker interface on a Redis server, for render workers on several
+    nodes. A job is a hash; queued and leased job ids sit in sorted sets
+    (by creation time and lease expiry) and each job's events in a list.
+    State changes run as Lua scripts, so they are atomic across nodes.
+    """
+
+    def __init__(self, url, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS,
+                 prefix="videogpt:", client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError(f"A Redis broker ({redact_url(url)}) needs the redis package: "
+                                   "pip install redis")
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.path = redact_url(url)   # for logs: no credentials
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.prefix = prefix
+        self.redis = client
+        self._reap = client.register_script(_REDIS_REAP)
+        self._lease = client.register_script(_REDIS_LEASE)
+        self._heartbeat = client.register_script(_REDIS_HEARTBEAT)
+        self._finish_script = client.register_script(_REDIS_FINISH)
+        self._cancel = client.register_script(_REDIS_CANCEL)
+
+    def _job_key(self, job_id):
+        return f"{self.prefix}job:{job_id}"
+
+    def _events_key(self, job_id):
+        return f"{self.prefix}events:{job_id}"
+
+    def enqueue(self, job_id, payload):
+        now = repr(time.time())
+        pipe = self.redis.pipeline()
+        pipe.hset(self._job_key(job_id), mapping={
+            "payload": json.dumps(payload), "status": "queued", "attempts": 0,
+            "max_attempts": self.max_attempts, "worker": "", "lease_expires": "",
+            "result": "", "error": "", "created_at": now, "updated_at": now,
+        })
+        pipe.zadd(f"{self.prefix}queued", {job_id: float(now)})
+        pipe.execute()
+
+    def reap(self):
+        self._reap(args=[repr(time.time()), self.prefix])
+
+    def lease(self, worker_id):
+        """
+        Claims the oldest queued job for `worker_id`. Returns (job_id,
+        payload, attempt) or None when the queue is empty.
+        """
+
+        now = time.time()
+        job = self._lease(args=[repr(now), self.prefix, worker_id, repr(now + self.lease_seconds)])
+        if not job:
+            return None
+        job_id, payload, attempt = job
+        return job_id, json.loads(payload), int(attempt)
+
+    def heartbeat(self, job_id, worker_id):
+        """Extends the lease; False if the worker no longer holds it"""
+        now = time.time()
+        return self._heartbeat(keys=[self._job_key(job_id)],
+                               args=[self.prefix, job_id, worker_id,
+                                     repr(now + self.lease_seconds), repr(now)]) == 1
+
+    def complete(self, job_id, worker_id, result):
+        return self._finish(job_id, worker_id, "done", result=json.dumps(result))
+
+    def fail(self, job_id, worker_id, error):
+        return self._finish(job_id, worker_id, "failed", error=error)
+
+    def _finish(self, job_id, worker_id, status, result=None, error=None):
+        return self._finish_script(keys=[self._job_key(job_id)],
+                                   args=[self.prefix, job_id, worker_id, status, result or "",
+                                         error or "", repr(time.time())]) == 1
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued or leased job. Its worker finds out at the next
+        heartbeat (the lease is gone) and stops building.
+        """
+        return self._cancel(keys=[self._job_key(job_id)],
+                            args=[self.prefix, job_id, repr(time.time())]) == 1
+
+    def get(self, job_id):
+        job = self.redis.hgetall(self._job_key(job_id))
+        if not job:
+            return None
+        job = {key: value if value != "" else None for key, value in job.items()}
+        job.update(
+            id=job_id,
+            payload=json.loads(job["payload"]),
+            result=json.loads(job["result"]) if job["result"] else None,
+            attempts=int(job["attempts"]),
+            max_attempts=int(job["max_attempts"]),
+            lease_expires=float(job["lease_expires"]) if job["lease_expires"] else None,
+            created_at=float(job["created_at"]),
+            updated_at=float(job["updated_at"]),
+        )
+        return job
+
+    def publish(self, job_id, event):
+        self.redis.rpush(self._events_key(job_id), json.dumps(event))
+
+    def events(self, job_id, after_seq=0):
+        """[(seq, event)] published for a job after `after_seq`"""
+        rows = self.redis.lrange(self._events_key(job_id), after_seq, -1)
+        return [(after_seq + i + 1, json.loads(row)) for i, row in enumerate(rows)]
+
+    def forget(self, job_id):
+        pipe = self.redis.pipeline()
+        pipe.delete(self._job_key(job_id), self._events_key(job_id))
+        pipe.zrem(f"{self.prefix}queued", job_id)
+        pipe.zrem(f"{self.prefix}leased", job_id)
+        pipe.execute()
+
+
+def open_broker(location, **options):
+    """A RedisJobBroker for a redis:// URL, else a JobBroker on the SQLite file at `location`"""
+    if location.startswith(REDIS_SCHEMES):
+        return RedisJobBroker(location, **options)
+    return JobBroker(location, **options)
+
+
+def default_store_root(location):
+    """Media store beside a SQLite broker file; a Redis broker has no directory to share"""
+    if location.startswith(REDIS_SCHEMES):
+        raise ValueError(f"{STORE_ENV} (or --store) is required with a Redis broker")
+    return os.path.join(os.path.dirname(os.path.abspath(location)), "media")
+
+
+class MediaStore:
+    """
+    Shared directory for job inputs and outputs, keyed by relative paths
+    such as inputs/<job_id> and outputs/<job_id>. Files are written under a
+    temporary name and renamed, so readers never see partial files.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise ValueError(f"Media store key outside the store: {key!r}")
+        return path
+
+    def put_file(self, local_file, key):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_file = f"{target}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(local_file, tmp_file)
+        os.replace(tmp_file, target)
+        return key
+
+    def put_dir(self, local_dir, key, names=None):
+        """Copies the files of `local_dir` (or just `names`) under `key`"""
+        names = names if names is not None else sorted(os.listdir(local_dir))
+        for name in names:
+            local_file = os.path.join(local_dir, name)
+            if os.path.isfile(local_file):
+                self.put_file(local_file, f"{key}/{name}")
+        return key
+
+    def get_dir(self, key, local_dir):
+        """Copies every file under `key` into `local_dir`; returns the names"""
+        source = self.path(key)
+        os.makedirs(local_dir, exist_ok=True)
+        names = []
+        for name in sorted(os.listdir(source)) if os.path.isdir(source) else []:
+            if os.path.isfile(os.path.join(source, name)) and not name.endswith(".tmp"):
+                shutil.copyfile(os.path.join(source, name), os.path.join(local_dir, name))
+                names.append(name)
+        return names
+
+    def delete(self, key):
+        shutil.rmtree(self.path(key), ignore_errors=True)
+
+
+def broker_from_env():
+    """(broker, store) when VIDEOGPT_BROKER is set, else (None, None)"""
+    location = os.getenv(BROKER_ENV)
+    if not location:
+        return None, None
+    store_root = os.getenv(STORE_ENV) or default_store_root(location)
+    return open_broker(location), MediaStore(store_root)
+
+
+def remote_build(broker, store, job_id, build_kwargs, progress=None, profile_dir=None,
+                 cancel=None):
+    """
+    Runs a build on a remote render worker: publishes the input media,
+    enqueues the job, relays its events to `progress` and downloads the
+    outputs into build_kwargs["work_dir"]. Scenes and the LLM analysis are
+    resolved here and sent with the job, so the render node never falls
+    back to its own prompts.json or LLM picks. Returns the same dict as
+    execute_build; raises RuntimeError if the job failed and JobCancelled
+    once `cancel` fires or the job is cancelled at the broker.
+    """
+
+    work_dir = build_kwargs["work_dir"]
+    if build_kwargs.get("stream_dir"):
+        # /api/build rejects stream=true when a broker is configured
+        raise ValueError("Progressive streaming isn't available on remote workers")
+
+    from video_engine import analyze_build, load_scenes
+
+    scenes = build_kwargs.get("scenes") or load_scenes()
+    analysis = analyze_build(build_kwargs.get("title", ""), scenes, build_kwargs.get("analysis"))
+
+    inputs_key, outputs_key = f"inputs/{job_id}", f"outputs/{job_id}"
+    store.put_dir(build_kwargs["image_folder"], inputs_key)
+    remote_kwargs = {key: value for key, value in build_kwargs.items()
+                     if key not in ("image_folder", "work_dir", "stream_dir", "media")}
+    remote_kwargs.update(scenes=scenes, analysis=analysis)
+    broker.enqueue(job_id, {
+        "build_kwargs": remote_kwargs,
+        "inputs": inputs_key,
+        "outputs": outputs_key,
+        "profile": profile_dir is not None,
+    })
+
+    seq = 0
+    def relay_events():
+        nonlocal seq
+        for seq, event in broker.events(job_id, seq):
+            if progress is not None:
+                progress(event)
+
+    try:
+        while True:
+            job = broker.get(job_id)
+            relay_events()
+            if job is None or job["status"] == "cancelled":
+                # Cancelled (or removed) at the broker by another API instance or an operator
+                raise JobCancelled("cancelled at the broker")
+            if job["status"] in ("done", "failed"):
+                break
+            if cancel is not None and cancel.cancelled:
+                broker.cancel(job_id)
+                raise JobCancelled(cancel.reason)
+            broker.reap()
+            time.sleep(POLL_INTERVAL)
+
+        if job["status"] == "failed":
+            raise RuntimeError(job["error"] or "Remote build failed")
+
+        result = job["result"]
+        store.get_dir(outputs_key, work_dir)
+        if profile_dir is not None:
+            store.get_dir(f"{outputs_key}/profile", profile_dir)
+        return {"output": os.path.join(work_dir, result["output"]), "peak_rss": result["peak_rss"],
+                "worker": result.get("worker")}
+    finally:
+        store.delete(inputs_key)
+        store.delete(outputs_key)
+        broker.forget(job_id)
@@ -0,0 +1,72 @@
+"""
+Cooperative cancellation for VideoGPT
+A CancelToken is checked by the build between stages and scenes and by the
+renderer every frame; once set, the next check raises JobCancelled and the
+renderer kills its ffmpeg child. Renders register with a priority so a build
+can preempt the preview renders running beside it.
+"""
+
+import threading
+
+PRIORITY_PREVIEW = 0
+PRIORITY_BUILD = 10
+
+
+class JobCancelled(Exception):
+    def __init__(self, reason="cancelled"):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    """
+    Wraps an Event: a threading.Event in-process, or a multiprocessing one
+    shared with a worker process.
+    """
+
+    def __init__(self, event=None):
+        self.event = event if event is not None else threading.Event()
+        self.reason = "cancelled"
+
+    def cancel(self, reason="cancelled"):
+        self.reason = reason
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def check(self):
+        if self.event.is_set():
+            raise JobCancelled(self.reason)
+
+
+def check_cancelled(token):
+    if token is not None:
+        token.check()
+
+
+class RenderRegistry:
+    """
+    Tokens of the renders running in this process, with their priority.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = {}   # token -> priority
+
+    def register(self, token, priority):
+        with self.lock:
+            self.running[token] = priority
+
+    def unregister(self, token):
+        with self.lock:
+            self.running.pop(token, None)
+
+    def preempt(self, priority):
+        """Cancels every render below `priority`; returns how many"""
+        with self.lock:
+            victims = [token for token, p in self.running.items() if p < priority]
+        for token in victims:
+            token.cancel("preempted")
+        return len(victims)
@@ -0,0 +1,199 @@
+"""
+Media delivery for VideoGPT
+Serves rendered files with byte ranges (so <video> can seek without
+re-downloading), ETag / Last-Modified validators and conditional GETs, and
+zero-copy sendfile when the ASGI server offers it
+"""
+
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from hashlib import md5
+from urllib.parse import quote
+
+import anyio
+from starlette.responses import Response
+
+# Rendered outputs never change under the same URL (a rebuild is a new job,
+# previews carry their timeline key), so clients may keep them; they still
+# revalidate cheaply through the ETag once max-age runs out
+MEDIA_CACHE_CONTROL = "private, max-age=86400"
+CHUNK_SIZE = 256 * 1024
+ZERO_COPY_SEND = "http.response.zerocopysend"
+
+
+def file_validators(stat_result):
+    """
+    (etag, last_modified) for a file, computed like Starlette's FileResponse.
+    """
+
+    etag_base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+    etag = f'"{md5(etag_base.encode(), usedforsecurity=False).hexdigest()}"'
+    return etag, formatdate(stat_result.st_mtime, usegmt=True)
+
+
+def _etags(header):
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+def _http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def is_not_modified(headers, etag, mtime):
+    """
+    Conditional GET: If-None-Match wins over If-Modified-Since (RFC 9110).
+    """
+
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = _etags(if_none_match)
+        return "*" in tags or etag in tags
+
+    since = _http_date(headers.get("if-modified-since"))
+    return since is not None and int(mtime) <= since
+
+
+def parse_range(header, size):
+    """
+    Parses a single "bytes=" range. Returns (start, end) inclusive, None to
+    serve the whole file (no / malformed / multi-range header), or False if
+    the range can't be satisfied.
+    """
+
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    if size == 0:
+        return False
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        return False
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def range_applies(headers, etag, last_modified):
+    """
+    If-Range: only honour Range when the client's copy is still current.
+    """
+
+    if_range = headers.get("if-range")
+    if if_range is None:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    return if_range == last_modified
+
+
+class FileRangeResponse(Response):
+    """
+    Sends bytes [start, end] of a file, via zero-copy send if the server
+    supports it, otherwise in chunks read off the event loop.
+    """
+
+    def __init__(self, path, start, end, status_code=200, headers=None,
+                 media_type=None, filename=None):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers["content-length"] = str(max(end - start + 1, 0))
+        if filename is not None:
+            quoted = quote(filename)
+            disposition = (f'attachment; filename="{filename}"' if quoted == filename
+                           else f"attachment; filename*=utf-8''{quoted}")
+            self.headers.setdefault("content-disposition", disposition)
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+
+        remaining = self.end - self.start + 1
+        if scope["method"].upper() == "HEAD" or remaining <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if ZERO_COPY_SEND in scope.get("extensions", {}):
+            file = await anyio.to_thread.run_sync(open, self.path, "rb")
+            try:
+                await send({
+                    "type": ZERO_COPY_SEND,
+                    "file": file.fileno(),
+                    "offset": self.start,
+                    "count": remaining,
+                    "more_body": False,
+                })
+            finally:
+                await anyio.to_thread.run_sync(file.close)
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+            if remaining > 0:
+                # File shrank under us; close the body rather than hang
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def serve_file(request, path, media_type, filename=None, cache_control=MEDIA_CACHE_CONTROL):
+    """
+    Response for GET/HEAD of `path` honouring Range, If-Range, If-None-Match
+    and If-Modified-Since. Returns 200, 206, 304 or 416.
+    """
+
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    etag, last_modified = file_validators(stat_result)
+    headers = {
+        "etag": etag,
+        "last-modified": last_modified,
+        "accept-ranges": "bytes",
+        "cache-control": cache_control,
+    }
+
+    if is_not_modified(request.headers, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if range_applies(request.headers, etag, last_modified):
+        byte_range = parse_range(request.headers.get("range"), size)
+
+    if byte_range is False:
+        return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+
+    if byte_range is None:
+        return FileRangeResponse(path, 0, size - 1, 200, headers, media_type, filename)
+
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return FileRangeResponse(path, start, end, 206, headers, media_type, filename)
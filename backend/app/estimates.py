@@ -0,0 +1,122 @@
+"""
+Build time and size estimates for VideoGPT
+Learns per-stage throughput from finished builds (seconds per unit of work:
+per scene for TTS, per megapixel-frame for the render, ...) as moving
+averages kept on disk, and turns a job's cost estimate (admission.JobCost)
+into expected stage times, build time and output size.
+"""
+
+import os
+import json
+import uuid
+import threading
+
+THROUGHPUT_FILE = os.path.join("cache", "throughput.json")
+SMOOTHING = 0.2     # weight of the newest build in the moving averages
+DEFAULT_BUILD_SECONDS = 60
+
+# Units of work each stage scales with
+STAGE_UNITS = {
+    "analysis": lambda cost: 1,
+    "media": lambda cost: cost.media,
+    "tts": lambda cost: cost.scenes,
+    "audio": lambda cost: cost.duration,
+    "render": lambda cost: cost.frames * cost.out_pixels / 1e6,
+    "mux": lambda cost: cost.duration * cost.outputs,
+}
+# Stages whose speed depends on the render profile's preset
+PROFILE_STAGES = ("render", "mux")
+# Seconds per unit of a stage with no history yet
+DEFAULT_RATES = {"analysis": 3.0, "media": 0.2, "tts": 1.5, "audio": 0.05, "render": 0.05,
+                 "mux": 0.02}
+
+
+def bitrate_bits(bitrate):
+    """ffmpeg bitrate strings ("8000k", "192k", "2M") in bits per second"""
+    multiplier = {"k": 1e3, "m": 1e6}.get(bitrate[-1:].lower(), 1)
+    return float(bitrate.rstrip("kKmM")) * multiplier
+
+
+def default_output_rate(profile):
+    """Bytes per second of one output at the profile's video + audio bitrates"""
+    from renderer import RENDER_PROFILES
+    from audio_mixer import AUDIO_BITRATE
+
+    return (bitrate_bits(RENDER_PROFILES[profile]["bitrate"]) + bitrate_bits(AUDIO_BITRATE)) / 8
+
+
+class ThroughputHistory:
+    """
+    Moving averages of seconds per unit of work per stage (render and mux
+    per render profile) and of output bytes per second, saved to `path`
+    after every recorded build
+    """
+
+    def __init__(self, path=THROUGHPUT_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.rates = json.load(f)
+        except (OSError, ValueError):
+            self.rates = {}   # key -> {"rate", "samples"}
+
+    @staticmethod
+    def _key(stage, profile):
+        return f"{stage}:{profile}" if stage in PROFILE_STAGES else stage
+
+    def _update(self, key, value):
+        entry = self.rates.get(key)
+        if entry is None:
+            self.rates[key] = {"rate": value, "samples": 1}
+        else:
+            entry["rate"] += SMOOTHING * (value - entry["rate"])
+            entry["samples"] += 1
+
+    def record(self, profile, cost, stages, output_bytes=None):
+        """Folds a finished build's stage durations (and total output bytes) into the averages"""
+        with self.lock:
+            for stage, seconds in stages.items():
+                units = STAGE_UNITS[stage](cost) if stage in STAGE_UNITS else 0
+                if units > 0:
+                    self._update(self._key(stage, profile), seconds / units)
+            if stages:
+                self._update("build", sum(stages.values()))
+            if output_bytes and cost.duration > 0:
+                self._update(f"bytes:{profile}", output_bytes / (cost.duration * cost.outputs))
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_file = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.rates, f, indent=2)
+        os.replace(tmp_file, self.path)
+
+    def rate(self, key, default):
+        entry = self.rates.get(key)
+        return (entry["rate"], entry["samples"]) if entry else (default, 0)
+
+    def typical_build_seconds(self):
+        """Average total build time, for queued jobs with no estimate of their own"""
+        return self.rate("build", DEFAULT_BUILD_SECONDS)[0]
+
+    def estimate(self, cost, profile):
+        """
+        {"stages": {stage: seconds}, "build_seconds", "output_bytes", "samples"}:
+        expected time per stage for `cost` at `profile`, the output size, and
+        the fewest builds any stage rate is based on (0: defaults only)
+        """
+
+        stages, samples = {}, []
+        for stage, units in STAGE_UNITS.items():
+            rate, count = self.rate(self._key(stage, profile), DEFAULT_RATES[stage])
+            stages[stage] = round(rate * units(cost), 1)
+            samples.append(count)
+        bytes_rate, _ = self.rate(f"bytes:{profile}", default_output_rate(profile))
+        return {
+            "stages": stages,
+            "build_seconds": round(sum(stages.values()), 1),
+            "output_bytes": int(bytes_rate * cost.duration * cost.outputs),
+            "samples": min(samples),
+        }
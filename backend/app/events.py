@@ -0,0 +1,72 @@
+"""
+Job event bus for VideoGPT
+Build threads publish progress events; Server-Sent Events subscribers
+on the asyncio loop receive them as they happen
+"""
+
+import asyncio
+import threading
+import time
+
+HISTORY_LIMIT = 200   # events kept per job for replay on (re)connect
+TERMINAL_STATUSES = ("done", "error", "cancelled")
+
+
+class JobEventBus:
+    """
+    Thread-safe publish side (any thread), asyncio subscribe side.
+    Every event gets a per-job sequence number so reconnecting clients
+    can resume with Last-Event-ID.
+    """
+
+    def __init__(self, history_limit=HISTORY_LIMIT):
+        self.history_limit = history_limit
+        self._lock = threading.Lock()
+        self._history = {}
+        self._seq = {}
+        self._subscribers = {}
+
+    def publish(self, job_id, event):
+        with self._lock:
+            seq = self._seq.get(job_id, 0) + 1
+            self._seq[job_id] = seq
+            event = {**event, "seq": seq, "time": round(time.time(), 3)}
+
+            history = self._history.setdefault(job_id, [])
+            history.append(event)
+            if len(history) > self.history_limit:
+                del history[:len(history) - self.history_limit]
+
+            subscribers = list(self._subscribers.get(job_id, ()))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # Subscriber's loop is gone; it'll be dropped on unsubscribe
+                pass
+        return event
+
+    def subscribe(self, job_id, after_seq=0):
+        """
+        Must be called from the event loop. Returns (queue, missed_events).
+        """
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append((loop, queue))
+            missed = [e for e in self._history.get(job_id, []) if e["seq"] > after_seq]
+        return queue, missed
+
+    def unsubscribe(self, job_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(job_id, [])
+            self._subscribers[job_id] = [s for s in subscribers if s[1] is not queue]
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    def forget(self, job_id):
+        with self._lock:
+            self._history.pop(job_id, None)
+            self._seq.pop(job_id, None)
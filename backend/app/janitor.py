@@ -0,0 +1,205 @@
+"""
+Disk retention for VideoGPT
+A background janitor over the directories that grow with use (uploads,
+outputs, previews and the TTS / music / scene caches). Each top-level entry
+of an area expires after the area's TTL; when the disk crosses its high
+watermark, or the areas together outgrow the storage budget, the least
+recently used entries are evicted until usage is back under the low
+watermark. Idle time is divided by the area's weight (what an entry costs to
+recreate), so a cached TTS clip goes before a rendered video of the same age.
+
+    VIDEOGPT_RETENTION_<AREA>_HOURS=72   TTL of one area, 0 keeps entries until evicted
+    VIDEOGPT_DISK_HIGH_WATERMARK=0.90    fraction of the filesystem that triggers eviction
+    VIDEOGPT_DISK_LOW_WATERMARK=0.80     ... and where eviction stops
+    VIDEOGPT_STORAGE_BUDGET_MB=0         all areas together, 0 for no budget
+    VIDEOGPT_JANITOR_INTERVAL=600        seconds between sweeps, 0 disables the janitor
+"""
+
+import os
+import time
+import shutil
+import threading
+from dataclasses import dataclass
+
+from metrics import log_event
+
+# name: (TTL hours, weight)
+DEFAULT_RETENTION = {
+    "uploads": (72, 8),       # the user's originals
+    "outputs": (72, 4),       # a full render
+    "scenes": (24 * 30, 4),   # an LLM completion
+    "tts": (24 * 30, 2),      # one TTS request per scene
+    "previews": (24, 1),
+    "music": (24 * 30, 1),    # a local decode
+}
+HIGH_WATERMARK = float(os.getenv("VIDEOGPT_DISK_HIGH_WATERMARK", "0.90"))
+LOW_WATERMARK = float(os.getenv("VIDEOGPT_DISK_LOW_WATERMARK", "0.80"))
+STORAGE_BUDGET = int(float(os.getenv("VIDEOGPT_STORAGE_BUDGET_MB", "0")) * 1024 * 1024)
+JANITOR_INTERVAL = float(os.getenv("VIDEOGPT_JANITOR_INTERVAL", "600"))
+GRACE_SECONDS = 300  # entries used this recently may still be being written
+
+
+@dataclass
+class RetentionArea:
+    name: str
+    root: str
+    ttl: float      # seconds, 0 for no TTL
+    weight: float
+
+    @classmethod
+    def from_env(cls, name, root):
+        hours, weight = DEFAULT_RETENTION[name]
+        hours = float(os.getenv(f"VIDEOGPT_RETENTION_{name.upper()}_HOURS", hours))
+        return cls(name, os.path.abspath(root), hours * 3600, weight)
+
+
+@dataclass
+class Entry:
+    area: RetentionArea
+    path: str
+    size: int
+    last_used: float
+
+    def score(self, now):
+        """Higher goes first: idle time discounted by what the entry is worth"""
+        return (now - self.last_used) / self.area.weight
+
+
+def touch(path):
+    """Marks an entry as used (its mtime is the janitor's LRU clock)"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def entry_usage(path):
+    """(bytes, newest mtime) of a file or of everything under a directory"""
+    stat = os.stat(path)
+    if not os.path.isdir(path):
+        return stat.st_size, stat.st_mtime
+    size, last_used = 0, stat.st_mtime
+    for folder, _, names in os.walk(path):
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(folder, name))
+            except OSError:
+                continue
+            size += stat.st_size
+            last_used = max(last_used, stat.st_mtime)
+    return size, last_used
+
+
+def remove_entry(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class Janitor:
+    """
+    Sweeps `areas` every `interval` seconds in a daemon thread.
+    `protected()` returns the paths in use (running jobs) that must stay;
+    `on_evict(area_name, path)` runs after an entry is removed.
+    """
+
+    def __init__(self, areas, protected=None, on_evict=None, interval=JANITOR_INTERVAL,
+                 high_watermark=HIGH_WATERMARK, low_watermark=LOW_WATERMARK,
+                 budget=STORAGE_BUDGET):
+        self.areas = areas
+        self.protected = protected or (lambda: ())
+        self.on_evict = on_evict
+        self.interval = interval
+        self.high_watermark = high_watermark
+        self.low_watermark = min(low_watermark, high_watermark)
+        self.budget = budget
+        self._stop = threading.Event()
+        self._thread = None
+
+    def scan(self):
+        entries = []
+        for area in self.areas:
+            if not os.path.isdir(area.root):
+                continue
+            for name in os.listdir(area.root):
+                path = os.path.join(area.root, name)
+                try:
+                    size, last_used = entry_usage(path)
+                except OSError:
+                    continue  # removed meanwhile
+                entries.append(Entry(area, path, size, last_used))
+        return entries
+
+    def bytes_to_free(self, entries):
+        """What eviction has to reclaim to get under the low watermark (0 if not over the high one)"""
+        needed = 0
+        roots = [area.root for area in self.areas if os.path.isdir(area.root)]
+        disk = shutil.disk_usage(roots[0] if roots else ".")
+        if disk.used > self.high_watermark * disk.total:
+            needed = disk.used - self.low_watermark * disk.total
+        managed = sum(entry.size for entry in entries)
+        if self.budget and managed > self.budget * self.high_watermark:
+            needed = max(needed, managed - self.budget * self.low_watermark)
+        return int(needed)
+
+    def sweep(self):
+        """One pass: TTL expiry, then LRU eviction if over a watermark. Returns a summary."""
+        now = time.time()
+        protected = {os.path.abspath(path) for path in self.protected()}
+        entries = self.scan()
+        evictable = [entry for entry in entries
+                     if entry.path not in protected and now - entry.last_used > GRACE_SECONDS]
+
+        expired = [entry for entry in evictable
+                   if entry.area.ttl and now - entry.last_used > entry.area.ttl]
+        for entry in expired:
+            self._evict(entry, "expired")
+
+        gone = {entry.path for entry in expired}
+        needed = self.bytes_to_free([entry for entry in entries if entry.path not in gone])
+        evicted, freed = [], 0
+        if needed > 0:
+            candidates = sorted((entry for entry in evictable if entry.path not in gone),
+                                key=lambda entry: entry.score(now), reverse=True)
+            for entry in candidates:
+                if freed >= needed:
+                    break
+                self._evict(entry, "evicted")
+                evicted.append(entry)
+                freed += entry.size
+            if freed < needed:
+                print(f"⚠️  Janitor freed {freed} of {needed} bytes; the rest is in use or too recent")
+
+        summary = {"expired": len(expired), "evicted": len(evicted),
+                   "freed": freed + sum(entry.size for entry in expired)}
+        if expired or evicted:
+            log_event("janitor_sweep", **summary)
+        return summary
+
+    def _evict(self, entry, reason):
+        remove_entry(entry.path)
+        log_event("janitor_remove", area=entry.area.name, path=entry.path, bytes=entry.size,
+                  reason=reason)
+        if self.on_evict is not None:
+            self.on_evict(entry.area.name, entry.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️  Janitor sweep failed: {e}")
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
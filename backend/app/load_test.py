@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Load test for the VideoGPT API
+Polls /api/status while other clients upload large files and start builds,
+then reports status latency percentiles. A handler that blocks the event
+loop shows up as a p99 spike here.
+
+    python main.py &
+    python load_test.py --url http://localhost:8000 --duration 30 --max-p99-ms 100
+"""
+
+import io
+import sys
+import time
+import argparse
+import threading
+import statistics
+
+import numpy as np
+import requests
+from PIL import Image
+
+UPLOAD_MB = 20           # size of the filler file sent by each upload client
+STATUS_INTERVAL = 0.02   # seconds between status polls per poller
+
+
+def synthetic_image(seed, size=(540, 960)):
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 255, size=(size[1], size[0], 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+
+def upload(url, scenes=3, filler_mb=0):
+    files = [("files", (f"scene_{i}.jpg", synthetic_image(i), "image/jpeg")) for i in range(scenes)]
+    if filler_mb:
+        files.append(("files", ("filler.bin", b"\0" * (filler_mb * 1024 * 1024), "application/octet-stream")))
+    resp = requests.post(f"{url}/api/upload", files=files, timeout=300)
+    resp.raise_for_status()
+    return resp.json()["upload_id"]
+
+
+def start_build(url, upload_id):
+    resp = requests.post(f"{url}/api/build", timeout=60,
+                         data={"upload_id": upload_id, "title": "Load test", "style": "cinematic"})
+    resp.raise_for_status()
+    return resp.json()["job_id"]
+
+
+def poll_status(url, job_id, stop, latencies, errors):
+    session = requests.Session()
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            session.get(f"{url}/api/status/{job_id}", timeout=30).raise_for_status()
+            latencies.append(time.perf_counter() - started)
+        except requests.RequestException:
+            errors.append(time.perf_counter() - started)
+        time.sleep(STATUS_INTERVAL)
+
+
+def keep_uploading(url, stop, counts, filler_mb):
+    while not stop.is_set():
+        try:
+            upload(url, scenes=1, filler_mb=filler_mb)
+            counts["uploads"] += 1
+        except requests.RequestException:
+            counts["upload_errors"] += 1
+
+
+def keep_building(url, upload_id, stop, counts):
+    while not stop.is_set():
+        try:
+            start_build(url, upload_id)
+            counts["builds"] += 1
+        except requests.RequestException:
+            counts["build_errors"] += 1
+        stop.wait(2.0)
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Status latency under upload/build load")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--pollers", type=int, default=4, help="concurrent /api/status clients")
+    parser.add_argument("--uploaders", type=int, default=2, help="concurrent upload clients")
+    parser.add_argument("--builders", type=int, default=1, help="clients starting builds")
+    parser.add_argument("--upload-mb", type=int, default=UPLOAD_MB)
+    parser.add_argument("--max-p99-ms", type=float, help="fail if status p99 exceeds this")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"🔨 VideoGPT load test against {args.url}")
+    print("=" * 60)
+
+    upload_id = upload(args.url)
+    job_id = start_build(args.url, upload_id)
+    print(f"   Job for status polling: {job_id}")
+
+    stop = threading.Event()
+    latencies, errors = [], []
+    counts = {"uploads": 0, "upload_errors": 0, "builds": 0, "build_errors": 0}
+    threads = (
+        [threading.Thread(target=poll_status, args=(args.url, job_id, stop, latencies, errors))
+         for _ in range(args.pollers)]
+        + [threading.Thread(target=keep_uploading, args=(args.url, stop, counts, args.upload_mb))
+           for _ in range(args.uploaders)]
+        + [threading.Thread(target=keep_building, args=(args.url, upload_id, stop, counts))
+           for _ in range(args.builders)]
+    )
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=60)
+
+    p99 = percentile(latencies, 99)
+    print(f"\n📊 /api/status over {args.duration:.0f}s ({len(latencies)} requests, {len(errors)} errors)")
+    print(f"   p50 {percentile(latencies, 50):7.1f} ms")
+    print(f"   p95 {percentile(latencies, 95):7.1f} ms")
+    print(f"   p99 {p99:7.1f} ms")
+    print(f"   max {max(latencies) * 1000 if latencies else float('nan'):7.1f} ms")
+    if latencies:
+        print(f"   mean {statistics.mean(latencies) * 1000:6.1f} ms")
+    print(f"   Background: {counts['uploads']} uploads ({args.upload_mb} MB), "
+          f"{counts['builds']} builds, "
+          f"{counts['upload_errors'] + counts['build_errors']} errors")
+
+    if args.max_p99_ms is not None and not p99 <= args.max_p99_ms:
+        print(f"\n❌ p99 {p99:.1f} ms is over {args.max_p99_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,10 @@ FastAPI Backend for VideoGPT
 Handles video generation requests
 """
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 import os
 import uuid
 import shutil
@@ -13,8 +14,33 @@ import json
 from pathlib import Path
 import subprocess
 import threading
-from typing import List
+import asyncio
+from typing import List, Optional
 import traceback
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pydantic import BaseModel
+
+from events import JobEventBus, TERMINAL_STATUSES
+from batch import Batch, batch_concurrency, summarize_batch
+from manifest import (
+    ManifestError, create_manifest, load_manifest, pin_analysis, update_manifest, verify_media,
+)
+from delivery import MEDIA_CACHE_CONTROL, serve_file
+from progress import overall_progress, estimate_eta
+from profiler import PROFILE_DIR, PROFILE_FILES, profiling_requested
+from metrics import (
+    JOBS, JOBS_RUNNING, QUEUE_WAIT, job_context, log_event, render_metrics,
+)
+from workers import WorkerPool, execute_build, worker_count
+from broker import broker_from_env, remote_build
+from janitor import Janitor, RetentionArea, touch
+from admission import admission_from_env, estimate_build
+from estimates import ThroughputHistory
+from cancellation import (
+    PRIORITY_BUILD, PRIORITY_PREVIEW, CancelToken, JobCancelled, RenderRegistry,
+)
 
 app = FastAPI()
 
@@ -36,16 +62,209 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 # Job status storage (in production, use Redis or database)
 jobs = {}
 
+# Push channel for job progress (Server-Sent Events)
+event_bus = JobEventBus()
+SSE_KEEPALIVE = 15  # seconds between keep-alive comments on idle streams
+
+def update_job(job_id, **fields):
+    """Update a job record and push the new state to SSE subscribers"""
+    job = jobs.get(job_id)
+    if job is None:
+        return
+    job.update(fields)
+    event_bus.publish(job_id, {"type": "status", **job})
+
+def drop_job(job_id, reason="deleted"):
+    """
+    Remove a job record; its SSE subscribers get a final "deleted" event and
+    disconnect. Its batch goes too once none of the batch's jobs are left.
+    """
+    job = jobs.pop(job_id, None) or {}
+    event_bus.publish(job_id, {"type": "deleted", "reason": reason})
+    event_bus.forget(job_id)
+    batch = batches.get(job.get("batch_id"))
+    if batch is not None and not any(member in jobs for member in batch.job_ids):
+        batches.pop(batch.id, None)
+
+# Build progress runs 5% -> 95%; the rest is queueing and moving the output
+BUILD_PROGRESS_START, BUILD_PROGRESS_END = 5, 95
+STAGE_MESSAGES = {
+    "analysis": "Analyzing content...",
+    "media": "Preparing media...",
+    "tts": "Generating voiceovers...",
+    "audio": "Mixing narration and music...",
+    "render": "Rendering video...",
+    "mux": "Muxing audio and video...",
+}
+
+def on_engine_event(job_id, event):
+    """Fold fine-grained engine events into the job record and push them"""
+    job = jobs.get(job_id)
+    if job is None:
+        return
+    
+    stage_eta = None
+    if event["type"] == "stage_start":
+        job["stage"] = event["stage"]
+        job["stage_progress"] = 0.0
+        job["stage_started"] = time.time()
+        job["status_message"] = STAGE_MESSAGES.get(event["stage"], job["status_message"])
+    elif event["type"] == "stage_end":
+        job.setdefault("stages", {})[event["stage"]] = event["duration"]
+        job["stage_progress"] = 1.0
+    elif event["type"] == "tts":
+        done = event["scene"] + 1
+        job["stage_progress"] = done / event["scenes"]
+        job["status_message"] = f"Voiceover {done}/{event['scenes']} ready"
+    elif event["type"] == "retry":
+        # The remote worker building this job was lost; another one starts over
+        job["stages"] = {}
+        job["status_message"] = f"Render worker lost, retrying (attempt {event['attempt']})..."
+    elif event["type"] == "stream":
+        job["stream_url"] = f"/api/stream/{job_id}/{os.path.basename(event['playlist'])}"
+    elif event["type"] == "render":
+        job["stage_progress"] = event["percent"] / 100
+        job["status_message"] = (f"Rendering scene {event['scene'] + 1}: {event['percent']:.0f}% "
+                                 f"({event['fps']:.0f} fps)")
+        job["fps"] = event["fps"]
+        stage_eta = event["eta"]
+    
+    stage = job.get("stage")
+    if stage is not None:
+        fraction = job.get("stage_progress", 0.0)
+        span = BUILD_PROGRESS_END - BUILD_PROGRESS_START
+        job["progress"] = BUILD_PROGRESS_START + int(span * overall_progress(stage, fraction))
+        job["eta"] = estimate_eta(stage, fraction, time.time() - job["stage_started"],
+                                  job.get("stages", {}), stage_eta)
+    
+    event_bus.publish(job_id, {
+        **event,
+        "status": job["status"],
+        "progress": job["progress"],
+        "status_message": job["status_message"],
+        "eta": job.get("eta"),
+    })
+
+def format_sse(event, with_id=True):
+    lines = []
+    if with_id and "seq" in event:
+        lines.append(f"id: {event['seq']}")
+    lines.append(f"data: {json.dumps(event)}")
+    return "\n".join(lines) + "\n\n"
+
+# Progressive HLS output of jobs built with stream=true (outputs/<job>/stream)
+STREAM_DIR = "stream"
+STREAM_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".mp4": "video/mp4",
+    ".m4s": "video/iso.segment",
+}
+
+# Remote render workers (VIDEOGPT_BROKER set), else warm local workers
+# (VIDEOGPT_WORKERS > 0); otherwise builds run in-process
+job_broker, media_store = None, None
+worker_pool = None
+admission = None    # set at startup unless VIDEOGPT_ADMISSION=0
+throughput = ThroughputHistory()
+
+def warm_engine():
+    """Import the engine and pre-decode background music once per process, then start the janitor"""
+    import video_engine
+    from music_library import get_music_library
+    get_music_library()
+    start_janitor()
+
+janitor = None
+
+def retention_protected():
+    """Outputs and uploads of the jobs still queued or building"""
+    paths = []
+    for job_id, job in list(jobs.items()):
+        if job["status"] not in TERMINAL_STATUSES:
+            paths.append(OUTPUT_DIR / job_id)
+            if job.get("upload_id"):
+                paths.append(UPLOAD_DIR / job["upload_id"])
+    return paths
+
+def on_retention_evict(area, path):
+    # An evicted output takes its finished job with it
+    if area == "outputs":
+        job_id = os.path.basename(path)
+        if jobs.get(job_id, {}).get("status") in TERMINAL_STATUSES:
+            drop_job(job_id, reason="expired")
+
+def start_janitor():
+    """Background retention over uploads, outputs, previews and the engine caches"""
+    global janitor
+    from video_engine import SCENES_CACHE_DIR, TTS_CACHE_DIR
+    from music_library import MUSIC_CACHE_DIR
+    from preview import PREVIEW_DIR
+    
+    roots = {"uploads": UPLOAD_DIR, "outputs": OUTPUT_DIR, "previews": PREVIEW_DIR,
+             "tts": TTS_CACHE_DIR, "scenes": SCENES_CACHE_DIR, "music": MUSIC_CACHE_DIR}
+    areas = [RetentionArea.from_env(name, root) for name, root in roots.items()]
+    janitor = Janitor(areas, protected=retention_protected, on_evict=on_retention_evict).start()
+
+def run_engine_build(job_id, build_kwargs, progress=None, profile_dir=None, cancel=None):
+    """Run one build on a remote worker, a warm local worker, or in this thread"""
+    if job_broker is not None:
+        return remote_build(job_broker, media_store, job_id, build_kwargs, progress, profile_dir,
+                            cancel)
+    if worker_pool is not None:
+        # Cancelled through worker_pool.cancel (see cancel_job)
+        return worker_pool.run(job_id, build_kwargs, progress, profile_dir)
+    return execute_build(job_id, build_kwargs, progress, profile_dir, cancel)
+
+# Cancel tokens of queued / running jobs, and the renders a build may preempt
+cancel_tokens = {}
+render_registry = RenderRegistry()
+
+def cancel_token(job_id):
+    return cancel_tokens.setdefault(job_id, CancelToken())
+
+def cancel_job(job_id, reason="cancelled"):
+    """Ask a queued or running build to stop; its thread then marks it cancelled"""
+    cancel_token(job_id).cancel(reason)
+    if worker_pool is not None:
+        worker_pool.cancel(job_id, reason)
+
+@app.on_event("startup")
+def warm_up():
+    """Warm the engine off the request path so the API starts instantly"""
+    global job_broker, media_store, worker_pool, admission
+    job_broker, media_store = broker_from_env()
+    workers = worker_count()
+    if job_broker is not None:
+        print(f"🌐 Builds go to remote render workers via {job_broker.path}")
+    else:
+        # Remote nodes run one build per worker process; local builds are admitted by cost
+        admission = admission_from_env()
+        if workers > 0:
+            worker_pool = WorkerPool(workers)
+    threading.Thread(target=warm_engine, daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_workers():
+    if worker_pool is not None:
+        worker_pool.close()
+    if janitor is not None:
+        janitor.stop()
+
 @app.get("/")
 def read_root():
     return {"status": "VideoGPT API Running", "version": "2.0"}
 
 @app.post("/api/generate")
 async def generate_prompts(data: dict):
-    """Generate scene prompts using AI"""
+    """
+    Generate scene prompts using AI (cached per title + style; "fresh": true
+    regenerates). Saves a project manifest, and prompts.json for legacy
+    builds and previews that don't pass a project_id.
+    """
     try:
         title = data.get("title", "")
         style = data.get("style", "cinematic")
+        fresh = bool(data.get("fresh", False))
         
         if not title:
             raise HTTPException(status_code=400, detail="Title is required")
@@ -53,33 +272,132 @@ async def generate_prompts(data: dict):
         # Import here to avoid circular imports
         from video_engine import generate_scenes_from_title
         
-        scenes = generate_scenes_from_title(title, style)
+        # Blocking OpenAI call (unless cached): keep it off the event loop
+        scenes = await run_in_threadpool(generate_scenes_from_title, title, style, fresh=fresh)
+        project = await run_in_threadpool(create_manifest, title=title, style=style, scenes=scenes)
         
-        return {"success": True, "scenes": scenes}
+        return {"success": True, "scenes": scenes, "project_id": project.project_id,
+                "revision": project.revision}
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in /api/generate: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/generate/stream")
+async def generate_prompts_stream(data: dict):
+    """Generate scene prompts, streaming each scene as Server-Sent Events as soon as it's written"""
+    title = data.get("title", "")
+    style = data.get("style", "cinematic")
+    fresh = bool(data.get("fresh", False))
+    
+    if not title:
+        raise HTTPException(status_code=400, detail="Title is required")
+    
+    from video_engine import stream_scenes_from_title
+    
+    def stream():
+        # Sync generator: Starlette iterates it in the threadpool, off the event loop
+        scenes = []
+        try:
+            for scene in stream_scenes_from_title(title, style, fresh=fresh):
+                yield format_sse({"type": "scene", "index": len(scenes), "scene": scene})
+                scenes.append(scene)
+            project = create_manifest(title=title, style=style, scenes=scenes)
+            yield format_sse({"type": "done", "success": True, "scenes": scenes,
+                              "project_id": project.project_id, "revision": project.revision})
+        except Exception as e:
+            print(f"Error in /api/generate/stream: {e}")
+            traceback.print_exc()
+            yield format_sse({"type": "error", "detail": str(e)})
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def get_project(project_id, revision=None):
+    """A project manifest (latest revision unless pinned), as HTTP errors if missing"""
+    try:
+        return load_manifest(project_id, revision)
+    except ManifestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Project {project_id} not found"
+                            + (f" at revision {revision}" if revision is not None else ""))
+
+def project_media_folder(fields):
+    """Upload folder to hash when a manifest change sets upload_id"""
+    upload_id = fields.get("upload_id")
+    if upload_id is None:
+        return None
+    upload_path = UPLOAD_DIR / upload_id
+    if not upload_path.exists():
+        raise HTTPException(status_code=404, detail=f"Upload {upload_id} not found")
+    return str(upload_path)
+
+@app.post("/api/projects")
+async def create_project(data: dict):
+    """Create a project manifest (title, style, scenes, picks, upload_id, render settings)"""
+    try:
+        project = await run_in_threadpool(create_manifest, project_media_folder(data), **data)
+    except ManifestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return project.to_dict()
+
+@app.get("/api/projects/{project_id}")
+async def get_project_manifest(project_id: str, revision: Optional[int] = None):
+    """A project manifest, latest revision unless `revision` is given"""
+    project = await run_in_threadpool(get_project, project_id, revision)
+    return project.to_dict()
+
+@app.patch("/api/projects/{project_id}")
+async def update_project(project_id: str, data: dict):
+    """Change manifest fields; writes a new revision (unless nothing changed)"""
+    await run_in_threadpool(get_project, project_id)
+    try:
+        project = await run_in_threadpool(update_manifest, project_id,
+                                          project_media_folder(data), **data)
+    except ManifestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return project.to_dict()
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # bytes read / written per step while saving uploads
+
+async def save_upload(file: UploadFile, destination: Path):
+    """Stream an upload to disk in chunks, with every write off the event loop"""
+    f = await run_in_threadpool(open, destination, "wb")
+    size = 0
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            await run_in_threadpool(f.write, chunk)
+            size += len(chunk)
+    finally:
+        await run_in_threadpool(f.close)
+    return size
+
 @app.post("/api/upload")
 async def upload_files(files: List[UploadFile] = File(...)):
     """Upload media files (images/videos)"""
     try:
         upload_id = str(uuid.uuid4())
         upload_path = UPLOAD_DIR / upload_id
-        upload_path.mkdir(exist_ok=True)
+        await run_in_threadpool(upload_path.mkdir, exist_ok=True)
         
         print(f"\n📤 Uploading {len(files)} files to {upload_path}")
         
         for idx, file in enumerate(files):
-            # Save file
-            file_location = upload_path / file.filename
-            with open(file_location, "wb") as f:
-                content = await file.read()
-                f.write(content)
+            # Save file (basename only, so a crafted filename can't escape the upload folder)
+            file_location = upload_path / Path(file.filename).name
+            size = await save_upload(file, file_location)
             
-            print(f"   ✓ Saved: {file.filename} ({len(content)} bytes)")
+            print(f"   ✓ Saved: {file.filename} ({size} bytes)")
         
         return {
             "success": True,
@@ -92,126 +410,319 @@ async def upload_files(files: List[UploadFile] = File(...)):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+def stage_upload_media(upload_path: Path, images_user_path: Path):
+    """Replace images_user with a copy of the upload (blocking; run in a thread)"""
+    if images_user_path.exists():
+        shutil.rmtree(images_user_path)
+    images_user_path.mkdir(exist_ok=True)
+    
+    for file in upload_path.glob("*"):
+        shutil.copy(file, images_user_path / file.name)
+        print(f"   ✓ Copied: {file.name}")
+
+def run_build(job_id, output_path, build_kwargs, profile=False, stream=False, prepare=None,
+              project_id=None):
+    """
+    Build one job into output_path and move the video and timeline there.
+    `prepare`, if given, returns extra build kwargs computed on this thread
+    (a batch uses it for scenes / analysis shared between its jobs). For a
+    project build, the LLM picks it made are pinned in the manifest.
+    """
+    cancel = cancel_token(job_id)
+    work_dir = output_path / "work"
+    try:
+        cancel.check()
+        print(f"\n{'='*80}")
+        print(f"🎬 BUILD THREAD STARTED - Job {job_id}")
+        print(f"{'='*80}\n")
+        
+        update_job(job_id, status="building", progress=BUILD_PROGRESS_START,
+                   status_message="Starting build...", stages={})
+        
+        # Builds outrank previews: stop preview renders competing for the CPU
+        preempted = render_registry.preempt(PRIORITY_BUILD)
+        if preempted:
+            print(f"⏸️  Preempted {preempted} preview render(s)")
+        
+        if prepare is not None:
+            build_kwargs = {**build_kwargs, **prepare()}
+        
+        render_profile = build_kwargs.get("render_profile", "final")
+        cost = estimate_build(build_kwargs)
+        update_job(job_id, cost=cost.to_dict(), estimate=throughput.estimate(cost, render_profile))
+        if admission is not None:
+            threads = admission.acquire(
+                job_id, cost, cancel,
+                on_wait=lambda: update_job(job_id, status_message="Waiting for capacity..."),
+            )
+            build_kwargs = dict(build_kwargs, threads=threads)
+            update_job(job_id, status_message="Starting build...")
+        
+        print("🎬 Step 1: Starting video build...")
+        print(f"   Images folder: {build_kwargs['image_folder']}")
+        print(f"   Style: {build_kwargs['style']}")
+        print(f"   Title: {build_kwargs['title']}\n")
+        
+        # Call with explicit keyword arguments to avoid any confusion
+        profile_dir = str(output_path / PROFILE_DIR) if profiling_requested(profile) else None
+        result = run_engine_build(
+            job_id,
+            dict(build_kwargs, work_dir=str(work_dir.resolve()),
+                 stream_dir=str((output_path / STREAM_DIR).resolve()) if stream else None),
+            progress=lambda event: on_engine_event(job_id, event),
+            profile_dir=profile_dir,
+            cancel=cancel,
+        )
+        output_video = result["output"]
+        cancel.check()
+        update_job(job_id, peak_rss=result["peak_rss"])
+        if profile_dir:
+            update_job(job_id, profile=f"/api/profile/{job_id}")
+        
+        print(f"\n✓ Video build completed!")
+        print(f"   Output file: {output_video}\n")
+        
+        update_job(job_id, progress=BUILD_PROGRESS_END, status_message="Finalizing video...",
+                   stage=None, eta=None)
+        
+        # Move output video to job output folder
+        print("📦 Step 2: Moving output file...")
+        final_output = output_path / "final_video.mp4"
+        if os.path.exists(output_video):
+            shutil.move(output_video, final_output)
+            print(f"✓ Video saved: {final_output}\n")
+        else:
+            raise Exception(f"Output video not found: {output_video}")
+        if build_kwargs.get("formats"):
+            from renderer import format_output_file
+            outputs = {}
+            for name in build_kwargs["formats"]:
+                extra_video = format_output_file(output_video, name)
+                if os.path.exists(extra_video):
+                    outputs[name] = str(output_path / os.path.basename(extra_video))
+                    shutil.move(extra_video, outputs[name])
+            update_job(job_id, outputs=outputs)
+            print(f"✓ Extra formats: {', '.join(outputs) or 'none'}\n")
+        timeline_file = work_dir / "timeline.json"
+        if timeline_file.exists():
+            shutil.move(str(timeline_file), output_path / "timeline.json")
+            update_job(job_id, timeline_file=str(output_path / "timeline.json"))
+            if project_id is not None:
+                try:
+                    pin_build_analysis(project_id, output_path / "timeline.json")
+                except Exception as e:
+                    print(f"⚠️  Could not pin analysis in project {project_id}: {e}")
+        shutil.rmtree(work_dir, ignore_errors=True)
+        
+        try:
+            output_bytes = sum(os.path.getsize(path) for path in
+                               [final_output, *jobs.get(job_id, {}).get("outputs", {}).values()])
+            throughput.record(render_profile, cost, jobs.get(job_id, {}).get("stages", {}),
+                              output_bytes)
+        except Exception as e:
+            print(f"⚠️  Could not record build throughput: {e}")
+        
+        update_job(job_id, status="done", progress=100,
+                   status_message="Complete!", output_file=str(final_output))
+        
+        print(f"\n{'='*80}")
+        print(f"✅ JOB {job_id} COMPLETED SUCCESSFULLY!")
+        print(f"{'='*80}\n")
+        
+    except JobCancelled as e:
+        print(f"\n🛑 JOB {job_id} CANCELLED ({e.reason})\n")
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if job_id not in jobs:
+            # Deleted while building: drop whatever the build left behind
+            shutil.rmtree(output_path, ignore_errors=True)
+        update_job(job_id, status="cancelled", status_message="Cancelled", stage=None, eta=None)
+    
+    except Exception as e:
+        error_msg = str(e)
+        print(f"\n{'='*80}")
+        print(f"❌ JOB {job_id} FAILED")
+        print(f"{'='*80}")
+        print(f"Error: {error_msg}\n")
+        print("Full traceback:")
+        traceback.print_exc()
+        print(f"\n{'='*80}\n")
+        
+        update_job(job_id, status="error", error=error_msg,
+                   status_message=f"Error: {error_msg}")
+    
+    finally:
+        cancel_tokens.pop(job_id, None)
+        if admission is not None:
+            admission.release(job_id)
+
+def run_job(job_id, output_path, build_kwargs, **options):
+    """Background thread body of a build job: metrics and job-tagged logs around run_build"""
+    with job_context(job_id):
+        job = jobs.get(job_id)
+        if job is None:
+            # Deleted while still queued (e.g. behind a batch's concurrency limit)
+            cancel_tokens.pop(job_id, None)
+            log_event("job_skipped", reason="deleted before it started")
+            return
+        queue_wait = time.time() - job["created_at"]
+        QUEUE_WAIT.observe(queue_wait)
+        log_event("job_started", queue_wait=round(queue_wait, 3),
+                  title=build_kwargs["title"], style=build_kwargs["style"])
+        JOBS_RUNNING.inc()
+        try:
+            run_build(job_id, output_path, build_kwargs, **options)
+        finally:
+            JOBS_RUNNING.dec()
+        job = jobs.get(job_id, {"status": "cancelled"})
+        JOBS.labels(status=job["status"]).inc()
+        log_event("job_finished", status=job["status"], stages=job.get("stages"),
+                  peak_rss=job.get("peak_rss"), error=job.get("error"))
+
+def parse_formats(names):
+    """Validated extra output formats (OUTPUT_FORMATS names), duplicates dropped"""
+    from renderer import OUTPUT_FORMATS
+    
+    formats = []
+    for name in names:
+        name = name.strip()
+        if not name or name in formats:
+            continue
+        if name not in OUTPUT_FORMATS:
+            raise HTTPException(status_code=400,
+                                detail=f"formats must be among {list(OUTPUT_FORMATS)}")
+        formats.append(name)
+    return formats
+
+def resolve_build_project(project_id, revision, fields):
+    """
+    The manifest a build reads. Form fields that differ from it are saved as a
+    new revision first (not allowed with a pinned revision); the upload must
+    still match the media hashes recorded in the manifest.
+    """
+    project = get_project(project_id, revision)
+    changes = {key: value for key, value in fields.items()
+               if value is not None and value != getattr(project, key)}
+    if changes:
+        if revision is not None:
+            raise HTTPException(status_code=409, detail=f"Revision {revision} is pinned; "
+                                                        f"can't change {sorted(changes)}")
+        project = update_manifest(project_id, project_media_folder(changes), **changes)
+    elif project.upload_id is not None:
+        try:
+            verify_media(project, project_media_folder({"upload_id": project.upload_id}))
+        except ManifestError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    if project.upload_id is None:
+        raise HTTPException(status_code=400, detail=f"Project {project_id} has no upload_id")
+    return project
+
+def pin_build_analysis(project_id, timeline_file):
+    """Save the voice / subtitle style / mood a project build picked into its manifest"""
+    from timeline import Timeline
+    
+    timeline = Timeline.load(timeline_file)
+    pin_analysis(project_id, {
+        "voice_profile": timeline.meta.get("voice"),
+        "subtitle_style": timeline.scenes[0].subtitle.get("style") if timeline.scenes else None,
+        "mood": timeline.meta.get("mood"),
+    })
+
 @app.post("/api/build")
 async def build_video(
-    upload_id: str = Form(...),
-    title: str = Form(...),
-    style: str = Form(...)
+    upload_id: Optional[str] = Form(None),
+    title: Optional[str] = Form(None),
+    style: Optional[str] = Form(None),
+    profile: bool = Form(False),
+    stream: Optional[bool] = Form(None),
+    formats: Optional[str] = Form(None),
+    project_id: Optional[str] = Form(None),
+    revision: Optional[int] = Form(None)
 ):
-    """Start video build process"""
+    """
+    Start video build process. With `project_id` the build reads the project
+    manifest (at `revision` if given); upload_id / title / style, if sent,
+    update the manifest first. Without it, upload_id, title and style are
+    required and scenes are read from prompts.json when the build is submitted.
+    `formats`: extra aspect ratios, e.g. "1:1,16:9"
+    `stream`: progressive HLS while encoding (not with remote render workers)
+    """
     try:
-        job_id = str(uuid.uuid4())
+        project = None
+        if project_id is not None:
+            project = await run_in_threadpool(
+                resolve_build_project, project_id, revision,
+                {"upload_id": upload_id, "title": title, "style": style},
+            )
+            upload_id, title, style = project.upload_id, project.title, project.style
+        elif upload_id is None or title is None or style is None:
+            raise HTTPException(status_code=400,
+                                detail="upload_id, title and style are required without a project_id")
+        
+        render = project.render if project is not None else {}
+        formats = parse_formats(formats.split(",") if formats is not None else render.get("formats", []))
+        if stream is None:
+            stream = bool(render.get("stream", False))
+        if stream and job_broker is not None:
+            raise HTTPException(status_code=400,
+                                detail="stream isn't available with remote render workers")
+        if project is not None:
+            from renderer import RENDER_PROFILES
+            if render["profile"] not in RENDER_PROFILES:
+                raise HTTPException(status_code=400,
+                                    detail=f"render profile must be one of {list(RENDER_PROFILES)}")
+            scenes = project.scenes
+        else:
+            # Snapshot prompts.json now, so a later /api/generate can't change this build
+            from video_engine import load_scenes
+            try:
+                scenes = await run_in_threadpool(load_scenes)
+            except FileNotFoundError:
+                raise HTTPException(status_code=400,
+                                    detail="No generated scenes; call /api/generate or pass a project_id")
+        
+        # Check if upload exists
         upload_path = UPLOAD_DIR / upload_id
+        if not upload_path.exists():
+            raise HTTPException(status_code=404, detail=f"Upload {upload_id} not found")
+        
+        job_id = str(uuid.uuid4())
         output_path = OUTPUT_DIR / job_id
-        output_path.mkdir(exist_ok=True)
+        await run_in_threadpool(output_path.mkdir, exist_ok=True)
         
         print(f"\n🎬 Starting build job: {job_id}")
         print(f"   Upload ID: {upload_id}")
         print(f"   Title: {title}")
         print(f"   Style: {style}")
         
-        # Check if upload exists
-        if not upload_path.exists():
-            raise HTTPException(status_code=404, detail=f"Upload {upload_id} not found")
-        
         # Initialize job status
         jobs[job_id] = {
             "status": "queued",
             "progress": 0,
             "status_message": "Job queued",
-            "error": None
+            "error": None,
+            "created_at": time.time(),
+            "upload_id": upload_id,
         }
+        touch(upload_path)
         
-        # Create images_user folder and copy files
-        images_user_path = Path("images_user")
-        if images_user_path.exists():
-            shutil.rmtree(images_user_path)
-        images_user_path.mkdir(exist_ok=True)
-        
-        # Copy uploaded files to images_user
-        for file in upload_path.glob("*"):
-            shutil.copy(file, images_user_path / file.name)
-            print(f"   ✓ Copied: {file.name}")
+        if project is not None:
+            # Fixed inputs from the manifest; the upload is read in place
+            jobs[job_id].update(project_id=project.project_id, revision=project.revision,
+                                manifest_digest=project.digest())
+            build_kwargs = dict(image_folder=str(upload_path.resolve()), style=style, title=title,
+                                scenes=scenes, analysis=project.analysis,
+                                render_profile=render["profile"], formats=formats)
+        else:
+            # Create images_user folder and copy uploaded files into it
+            images_user_path = Path("images_user")
+            await run_in_threadpool(stage_upload_media, upload_path, images_user_path)
+            build_kwargs = dict(image_folder=str(images_user_path.resolve()), style=style, title=title,
+                                scenes=scenes, formats=formats)
         
         # Start build in background thread
-        def build_thread():
-            try:
-                print(f"\n{'='*80}")
-                print(f"🎬 BUILD THREAD STARTED - Job {job_id}")
-                print(f"{'='*80}\n")
-                
-                jobs[job_id]["status"] = "building"
-                jobs[job_id]["progress"] = 10
-                jobs[job_id]["status_message"] = "Analyzing content..."
-                
-                print("📦 Step 1: Importing video_engine module...")
-                # Force reload the module to get latest version
-                import importlib
-                import sys
-                
-                # Remove cached module if it exists
-                if 'video_engine' in sys.modules:
-                    del sys.modules['video_engine']
-                
-                # Import fresh version
-                from video_engine import build_video_from_user_images
-                print("✓ Module imported successfully (fresh reload)\n")
-                
-                jobs[job_id]["progress"] = 30
-                jobs[job_id]["status_message"] = "Generating voiceovers..."
-                
-                print("🎬 Step 2: Starting video build...")
-                print(f"   Images folder: {images_user_path}")
-                print(f"   Style: {style}")
-                print(f"   Title: {title}\n")
-                
-                # Call with explicit keyword arguments to avoid any confusion
-                output_video = build_video_from_user_images(
-                    image_folder=str(images_user_path),
-                    style=style,
-                    title=title
-                )
-                
-                print(f"\n✓ Video build completed!")
-                print(f"   Output file: {output_video}\n")
-                
-                jobs[job_id]["progress"] = 90
-                jobs[job_id]["status_message"] = "Finalizing video..."
-                
-                # Move output video to job output folder
-                print("📦 Step 3: Moving output file...")
-                final_output = output_path / "final_video.mp4"
-                if os.path.exists(output_video):
-                    shutil.move(output_video, final_output)
-                    print(f"✓ Video saved: {final_output}\n")
-                else:
-                    raise Exception(f"Output video not found: {output_video}")
-                
-                jobs[job_id]["status"] = "done"
-                jobs[job_id]["progress"] = 100
-                jobs[job_id]["status_message"] = "Complete!"
-                jobs[job_id]["output_file"] = str(final_output)
-                
-                print(f"\n{'='*80}")
-                print(f"✅ JOB {job_id} COMPLETED SUCCESSFULLY!")
-                print(f"{'='*80}\n")
-                
-            except Exception as e:
-                error_msg = str(e)
-                print(f"\n{'='*80}")
-                print(f"❌ JOB {job_id} FAILED")
-                print(f"{'='*80}")
-                print(f"Error: {error_msg}\n")
-                print("Full traceback:")
-                traceback.print_exc()
-                print(f"\n{'='*80}\n")
-                
-                jobs[job_id]["status"] = "error"
-                jobs[job_id]["error"] = error_msg
-                jobs[job_id]["status_message"] = f"Error: {error_msg}"
-        
-        # Start background thread
-        thread = threading.Thread(target=build_thread, daemon=True)
+        thread = threading.Thread(target=run_job, args=(job_id, output_path, build_kwargs),
+                                  kwargs=dict(profile=profile, stream=stream, project_id=project_id),
+                                  daemon=True)
         thread.start()
         
         return {
@@ -220,11 +731,271 @@ async def build_video(
             "message": "Build started"
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in /api/build: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+class BatchSpec(BaseModel):
+    title: str
+    upload_id: str
+    style: str = "cinematic"
+    render_profile: str = "final"
+    formats: List[str] = []
+    scenes: Optional[List[dict]] = None
+
+class BatchRequest(BaseModel):
+    specs: List[BatchSpec]
+    profile: bool = False
+
+batches = {}
+batch_executor = None  # bounded pool so a big batch doesn't start every build at once
+
+def submit_batch_job(job_id, output_path, build_kwargs, **options):
+    global batch_executor
+    if batch_executor is None:
+        batch_executor = ThreadPoolExecutor(max_workers=batch_concurrency(worker_count()),
+                                            thread_name_prefix="videogpt-batch")
+    batch_executor.submit(run_job, job_id, output_path, build_kwargs, **options)
+
+def batch_preparer(batch, spec):
+    """
+    Scenes (generated once per title/style), LLM analysis (once per
+    title/scenes) and the upload's media list and probe (once per upload)
+    """
+    def prepare():
+        from video_engine import (analyze_build, generate_scenes_from_title, probe_media,
+                                  read_user_media)
+        
+        def read_media():
+            media_paths = read_user_media(str((UPLOAD_DIR / spec.upload_id).resolve()))
+            return media_paths, probe_media(media_paths)
+        
+        scenes = spec.scenes
+        if scenes is None:
+            scenes = batch.shared(("scenes", spec.title, spec.style),
+                                  lambda: generate_scenes_from_title(spec.title, spec.style,
+                                                                     prompts_file=None))
+        analysis = batch.shared(("analysis", spec.title, json.dumps(scenes, sort_keys=True)),
+                                lambda: analyze_build(spec.title, scenes))
+        media = batch.shared(("media", spec.upload_id), read_media)
+        return {"scenes": scenes, "analysis": analysis, "media": media}
+    return prepare
+
+@app.post("/api/batch")
+async def build_batch(request: BatchRequest):
+    """Start several builds at once; jobs share scene generation, LLM analysis and media probes"""
+    if not request.specs:
+        raise HTTPException(status_code=400, detail="At least one spec is required")
+    
+    from renderer import RENDER_PROFILES
+    
+    for spec in request.specs:
+        if spec.render_profile not in RENDER_PROFILES:
+            raise HTTPException(status_code=400,
+                                detail=f"render_profile must be one of {list(RENDER_PROFILES)}")
+        if not (UPLOAD_DIR / spec.upload_id).exists():
+            raise HTTPException(status_code=404, detail=f"Upload {spec.upload_id} not found")
+        spec.formats = parse_formats(spec.formats)
+    
+    batch = Batch(str(uuid.uuid4()))
+    batches[batch.id] = batch
+    print(f"\n📚 Starting batch {batch.id} ({len(request.specs)} builds)")
+    
+    for spec in request.specs:
+        job_id = str(uuid.uuid4())
+        output_path = OUTPUT_DIR / job_id
+        await run_in_threadpool(output_path.mkdir, exist_ok=True)
+        jobs[job_id] = {
+            "status": "queued",
+            "progress": 0,
+            "status_message": "Job queued",
+            "error": None,
+            "created_at": time.time(),
+            "batch_id": batch.id,
+            "upload_id": spec.upload_id,
+            "title": spec.title,
+            "render_profile": spec.render_profile,
+        }
+        batch.job_ids.append(job_id)
+        touch(UPLOAD_DIR / spec.upload_id)
+        
+        # Builds read the upload in place, so batch jobs never race over images_user
+        build_kwargs = dict(image_folder=str((UPLOAD_DIR / spec.upload_id).resolve()),
+                            style=spec.style, title=spec.title,
+                            render_profile=spec.render_profile,
+                            formats=spec.formats)
+        submit_batch_job(job_id, output_path, build_kwargs, profile=request.profile,
+                         prepare=batch_preparer(batch, spec))
+    
+    return {"success": True, "batch_id": batch.id, "job_ids": batch.job_ids}
+
+@app.get("/api/batch/{batch_id}")
+async def get_batch(batch_id: str):
+    """Aggregate status of a batch and its jobs"""
+    batch = batches.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    
+    return summarize_batch(batch, jobs)
+
+def _load_preview_timeline(upload_id, voice, subtitle_style, project_id=None, still=False):
+    """The voiced preview timeline, or with `still` one that doesn't wait for TTS"""
+    upload_path = UPLOAD_DIR / upload_id
+    if not upload_path.exists():
+        raise HTTPException(status_code=404, detail=f"Upload {upload_id} not found")
+    
+    from video_engine import load_scenes
+    from preview import get_preview_timeline, get_still_timeline
+    
+    if project_id is not None:
+        project = get_project(project_id)
+        scenes = project.scenes
+        voice = voice or project.voice_profile
+        subtitle_style = subtitle_style or project.subtitle_style
+    else:
+        scenes = load_scenes()
+    
+    get_timeline = get_still_timeline if still else get_preview_timeline
+    return get_timeline(upload_id, str(upload_path), scenes,
+                        voice_profile=voice, subtitle_style=subtitle_style)
+
+@app.get("/api/preview/{upload_id}/frame")
+def preview_frame(upload_id: str, t: float = 0.0, voice: Optional[str] = None,
+                  subtitle_style: Optional[str] = None, project_id: Optional[str] = None):
+    """
+    Render a single preview still at `t` seconds (JPEG). Before the scenes are
+    voiced, `t` maps to a scene by estimated narration durations.
+    """
+    try:
+        timeline = _load_preview_timeline(upload_id, voice, subtitle_style, project_id, still=True)
+        
+        from preview import render_preview_frame
+        
+        return Response(content=render_preview_frame(timeline, t), media_type="image/jpeg")
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in /api/preview/frame: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/preview/{upload_id}/scene/{scene_index}")
+def preview_scene(upload_id: str, scene_index: int, request: Request, voice: Optional[str] = None,
+                  subtitle_style: Optional[str] = None, project_id: Optional[str] = None):
+    """Render a single scene at preview resolution (MP4)"""
+    try:
+        timeline = _load_preview_timeline(upload_id, voice, subtitle_style, project_id)
+        if not 0 <= scene_index < len(timeline.scenes):
+            raise HTTPException(status_code=404, detail=f"Scene {scene_index} not found")
+        
+        from preview import render_preview_scene
+        
+        # Low priority: a build starting meanwhile cancels this render
+        token = CancelToken()
+        render_registry.register(token, PRIORITY_PREVIEW)
+        try:
+            preview_file = render_preview_scene(timeline, scene_index, upload_id, cancel=token)
+        finally:
+            render_registry.unregister(token)
+        return serve_file(request, preview_file, media_type="video/mp4")
+    
+    except JobCancelled:
+        raise HTTPException(status_code=503, detail="Preview preempted by a build; retry shortly",
+                            headers={"Retry-After": "5"})
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in /api/preview/scene: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+def queue_estimate(cost):
+    """
+    Builds ahead of a new one and the seconds until it would start: the
+    remaining estimated work of queued / building jobs spread over the
+    build slots (None with remote workers, whose capacity isn't known here)
+    """
+    active = [job for job in list(jobs.values()) if job["status"] in ("queued", "building")]
+    remaining = sum(job.get("estimate", {}).get("build_seconds", throughput.typical_build_seconds())
+                    * (1 - job.get("progress", 0) / 100) for job in active)
+    
+    if job_broker is not None:
+        return {"depth": len(active), "wait_seconds": None}
+    slots = len(active) + 1
+    if worker_pool is not None:
+        slots = worker_pool.size
+    if admission is not None:
+        slots = min(slots, max(1, int(admission.cores * admission.cpu_target // max(cost.cores, 1))))
+    wait = remaining / slots if len(active) >= slots else 0.0
+    return {"depth": len(active), "slots": slots, "wait_seconds": round(wait, 1)}
+
+@app.get("/api/estimate")
+def estimate_build_time(upload_id: Optional[str] = None, render_profile: str = "final",
+                        formats: Optional[str] = None, project_id: Optional[str] = None):
+    """
+    Expected build time, output size and queue wait before submitting a build.
+    Scenes come from the project (whose upload is used) or prompts.json.
+    Other render profiles are estimated too, so a client can pick a cheaper one.
+    """
+    from renderer import RENDER_PROFILES
+    
+    scenes = None
+    if project_id is not None:
+        project = get_project(project_id)
+        upload_id, scenes = upload_id or project.upload_id, project.scenes
+    if upload_id is None:
+        raise HTTPException(status_code=400, detail="upload_id or project_id is required")
+    if render_profile not in RENDER_PROFILES:
+        raise HTTPException(status_code=400,
+                            detail=f"render_profile must be one of {list(RENDER_PROFILES)}")
+    formats = parse_formats(formats.split(",")) if formats else []
+    upload_path = UPLOAD_DIR / upload_id
+    if not upload_path.exists():
+        raise HTTPException(status_code=404, detail=f"Upload {upload_id} not found")
+    
+    try:
+        costs = {name: estimate_build(dict(image_folder=str(upload_path), scenes=scenes,
+                                           render_profile=name, formats=formats))
+                 for name in RENDER_PROFILES}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not estimate build: {e}")
+    
+    cost = costs[render_profile]
+    estimate = throughput.estimate(cost, render_profile)
+    queue = queue_estimate(cost)
+    wait = queue["wait_seconds"]
+    return {
+        "upload_id": upload_id,
+        "render_profile": render_profile,
+        "duration": round(cost.duration, 1),
+        "cost": cost.to_dict(),
+        **estimate,
+        "queue": queue,
+        "eta_seconds": round(estimate["build_seconds"] + wait, 1) if wait is not None else None,
+        "profiles": {
+            name: {key: value for key, value in throughput.estimate(other, name).items()
+                   if key in ("build_seconds", "output_bytes")}
+            for name, other in costs.items()
+        },
+    }
+
+@app.get("/api/capacity")
+def get_capacity():
+    """Host capacity the admission controller is working with, and what's reserved of it"""
+    if admission is None:
+        return {"admission": False}
+    return {"admission": True, **admission.snapshot()}
+
 @app.get("/api/status/{job_id}")
 async def get_status(job_id: str):
     """Get job status"""
@@ -233,9 +1004,69 @@ async def get_status(job_id: str):
     
     return jobs[job_id]
 
-@app.get("/api/video/{job_id}")
-async def get_video(job_id: str):
-    """Download completed video"""
+@app.get("/api/profile/{job_id}")
+async def get_profile(job_id: str, kind: str = "cpu"):
+    """Profile of a job built with profile=true (cpu, memory or collapsed stacks)"""
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if kind not in PROFILE_FILES:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {list(PROFILE_FILES)}")
+    
+    profile_file = OUTPUT_DIR / job_id / PROFILE_DIR / PROFILE_FILES[kind]
+    if not profile_file.exists():
+        raise HTTPException(status_code=404, detail="No profile for this job")
+    
+    return FileResponse(profile_file, media_type="text/plain",
+                        filename=f"{job_id}_{PROFILE_FILES[kind]}")
+
+@app.get("/api/events/{job_id}")
+async def job_events(job_id: str, request: Request):
+    """Stream job progress as Server-Sent Events (replaces status polling)"""
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    last_event_id = request.headers.get("last-event-id", "")
+    after_seq = int(last_event_id) if last_event_id.isdigit() else 0
+    queue, missed = event_bus.subscribe(job_id, after_seq)
+    
+    async def stream():
+        try:
+            # Anything the client missed, then the current state
+            for event in missed:
+                yield format_sse(event)
+            yield format_sse({"type": "status", **jobs.get(job_id, {})}, with_id=False)
+            if jobs.get(job_id, {}).get("status") in TERMINAL_STATUSES:
+                return
+            
+            while True:
+                if await request.is_disconnected():
+                    break
+                if job_id not in jobs:
+                    # Deleted or expired without a "deleted" event reaching this subscriber
+                    yield format_sse({"type": "deleted", "reason": "gone"}, with_id=False)
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+                if event["type"] == "deleted":
+                    break
+                if event["type"] == "status" and event.get("status") in TERMINAL_STATUSES:
+                    break
+        finally:
+            event_bus.unsubscribe(job_id, queue)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.api_route("/api/video/{job_id}", methods=["GET", "HEAD"])
+async def get_video(job_id: str, request: Request, format: Optional[str] = None):
+    """Download completed video (`format`: one of the extra aspect ratios it was built with)"""
     if job_id not in jobs:
         raise HTTPException(status_code=404, detail="Job not found")
     
@@ -243,23 +1074,65 @@ async def get_video(job_id: str):
         raise HTTPException(status_code=400, detail="Video not ready")
     
     output_file = jobs[job_id].get("output_file")
+    if format is not None:
+        output_file = jobs[job_id].get("outputs", {}).get(format)
     if not output_file or not os.path.exists(output_file):
         raise HTTPException(status_code=404, detail="Video file not found")
+    touch(OUTPUT_DIR / job_id)
     
-    return FileResponse(
-        output_file,
-        media_type="video/mp4",
-        filename="video.mp4"
-    )
+    # Range / conditional requests so <video> can seek and reuse its cache
+    return serve_file(request, output_file, media_type="video/mp4", filename="video.mp4")
+
+@app.api_route("/api/stream/{job_id}/{name}", methods=["GET", "HEAD"])
+async def get_stream(job_id: str, name: str, request: Request):
+    """HLS playlist / segments of a job built with stream=true, available while it renders"""
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    media_type = STREAM_MEDIA_TYPES.get(os.path.splitext(name)[1])
+    stream_file = OUTPUT_DIR / job_id / STREAM_DIR / Path(name).name
+    if media_type is None or not stream_file.exists():
+        raise HTTPException(status_code=404, detail="Stream file not found")
+    
+    # The playlist grows while encoding; segments never change once written
+    cache_control = "no-cache" if name.endswith(".m3u8") else MEDIA_CACHE_CONTROL
+    return serve_file(request, stream_file, media_type=media_type, cache_control=cache_control)
+
+@app.post("/api/job/{job_id}/cancel")
+async def cancel_build(job_id: str):
+    """Stop a queued or running build; its status becomes "cancelled" once it has stopped"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    
+    cancel_job(job_id)
+    update_job(job_id, status_message="Cancelling...")
+    return {"success": True, "message": "Cancellation requested"}
+
+@app.post("/api/batch/{batch_id}/cancel")
+async def cancel_batch(batch_id: str):
+    """Cancel every unfinished build of a batch"""
+    batch = batches.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    
+    cancelled = [job_id for job_id in batch.job_ids
+                 if jobs.get(job_id, {}).get("status") not in TERMINAL_STATUSES]
+    for job_id in cancelled:
+        cancel_job(job_id)
+    return {"success": True, "cancelled": cancelled}
 
 @app.delete("/api/job/{job_id}")
 async def delete_job(job_id: str):
-    """Clean up job files"""
+    """Stop the job if it's still building and clean up its files"""
     if job_id in jobs:
+        if jobs[job_id]["status"] not in TERMINAL_STATUSES:
+            cancel_job(job_id)
         output_path = OUTPUT_DIR / job_id
-        if output_path.exists():
-            shutil.rmtree(output_path)
-        del jobs[job_id]
+        drop_job(job_id)
+        await run_in_threadpool(shutil.rmtree, output_path, ignore_errors=True)
         return {"success": True, "message": "Job deleted"}
     
     raise HTTPException(status_code=404, detail="Job not found")
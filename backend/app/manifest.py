@@ -0,0 +1,180 @@
+"""
+Project manifests for VideoGPT
+Everything a build depends on — scenes, voice / subtitle style / mood, the
+uploaded media (by content hash) and render settings — stored per project
+as numbered revisions, so a build reads a fixed input instead of whatever
+the global prompts.json holds at the time
+"""
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from dataclasses import dataclass, field, asdict, replace
+
+MANIFEST_VERSION = 1
+PROJECTS_DIR = "projects"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Fields clients may set; everything else is managed here
+EDITABLE_FIELDS = ("title", "style", "scenes", "voice_profile", "subtitle_style",
+                   "mood", "upload_id", "render")
+DEFAULT_RENDER = {"profile": "final", "formats": [], "stream": False}
+
+_lock = threading.RLock()  # serializes revision numbering
+
+
+class ManifestError(ValueError):
+    pass
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_media(folder):
+    """[{"name", "sha256", "size"}] for every file in an upload folder, by name"""
+    media = []
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            media.append({"name": name, "sha256": file_sha256(path), "size": os.path.getsize(path)})
+    return media
+
+
+@dataclass
+class ProjectManifest:
+    project_id: str
+    revision: int = 1
+    title: str = ""
+    style: str = "cinematic"
+    scenes: list = field(default_factory=list)
+    voice_profile: str = None     # None: picked by the LLM at build time
+    subtitle_style: str = None
+    mood: str = None
+    upload_id: str = None
+    media: list = field(default_factory=list)   # hash_media() of the upload
+    render: dict = field(default_factory=lambda: dict(DEFAULT_RENDER))
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    version: int = MANIFEST_VERSION
+
+    @property
+    def analysis(self):
+        """The LLM picks already pinned in the manifest"""
+        picks = {"voice_profile": self.voice_profile, "subtitle_style": self.subtitle_style,
+                 "mood": self.mood}
+        return {key: value for key, value in picks.items() if value is not None}
+
+    def digest(self):
+        """Content hash of the build inputs (stable across revisions that don't change them)"""
+        inputs = {key: value for key, value in asdict(self).items()
+                  if key not in ("project_id", "revision", "created_at", "updated_at")}
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
+    # -------------------------
+    # SERIALIZATION
+    # -------------------------
+    def to_dict(self):
+        return {**asdict(self), "digest": self.digest()}
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        data.pop("digest", None)
+        return cls(**data)
+
+
+def _project_dir(project_id):
+    # Ids are generated here as uuid4 hex; refuse anything that could leave PROJECTS_DIR
+    if not project_id or os.path.basename(project_id) != project_id:
+        raise ManifestError(f"Invalid project id: {project_id!r}")
+    return os.path.join(PROJECTS_DIR, project_id)
+
+def _revision_file(project_id, revision):
+    return os.path.join(_project_dir(project_id), f"r{revision:04d}.json")
+
+def _latest_revision(project_id):
+    folder = _project_dir(project_id)
+    if not os.path.isdir(folder):
+        return None
+    revisions = [int(name[1:5]) for name in os.listdir(folder)
+                 if name.startswith("r") and name.endswith(".json")]
+    return max(revisions, default=None)
+
+def _write(manifest):
+    path = _revision_file(manifest.project_id, manifest.revision)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_file = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(manifest.to_dict(), f, indent=2)
+    os.replace(tmp_file, path)
+    return manifest
+
+def _validate(fields):
+    unknown = set(fields) - set(EDITABLE_FIELDS)
+    if unknown:
+        raise ManifestError(f"Unknown manifest fields: {sorted(unknown)}")
+    scenes = fields.get("scenes")
+    if scenes is not None and (not isinstance(scenes, list)
+                               or not all(isinstance(s, dict) and "narration" in s for s in scenes)):
+        raise ManifestError("scenes must be a list of objects with a narration")
+    if "render" in fields:
+        fields["render"] = {**DEFAULT_RENDER, **(fields["render"] or {})}
+    return fields
+
+
+def load_manifest(project_id, revision=None):
+    """The given revision of a project (latest if None); raises FileNotFoundError"""
+    if revision is None:
+        revision = _latest_revision(project_id)
+        if revision is None:
+            raise FileNotFoundError(f"Project {project_id} not found")
+    with open(_revision_file(project_id, revision), "r", encoding="utf-8") as f:
+        return ProjectManifest.from_dict(json.load(f))
+
+def create_manifest(media_folder=None, **fields):
+    """New project at revision 1; `media_folder` is the upload to hash"""
+    manifest = ProjectManifest(project_id=uuid.uuid4().hex, **_validate(fields))
+    if media_folder is not None:
+        manifest.media = hash_media(media_folder)
+    with _lock:
+        return _write(manifest)
+
+def update_manifest(project_id, media_folder=None, **fields):
+    """
+    Writes a new revision with `fields` changed. Earlier revisions stay on
+    disk, so a build pinned to one keeps its inputs.
+    """
+    fields = _validate(fields)
+    with _lock:
+        current = load_manifest(project_id)
+        manifest = replace(current, **fields, revision=current.revision + 1,
+                           updated_at=time.time())
+        if media_folder is not None:
+            manifest.media = hash_media(media_folder)
+        if manifest.digest() == current.digest():
+            return current
+        return _write(manifest)
+
+def verify_media(manifest, media_folder):
+    """Raises ManifestError if the upload no longer matches the hashed media"""
+    if hash_media(media_folder) != manifest.media:
+        raise ManifestError(f"Media of upload {manifest.upload_id} changed since "
+                            f"revision {manifest.revision} of project {manifest.project_id}")
+
+def pin_analysis(project_id, picks):
+    """
+    Records the LLM picks a build made for fields the project left open, so
+    later builds of the project reuse them. Picks set meanwhile are kept.
+    """
+    with _lock:
+        current = load_manifest(project_id)
+        missing = {key: value for key, value in picks.items()
+                   if value is not None and getattr(current, key) is None}
+        return update_manifest(project_id, **missing) if missing else current
@@ -0,0 +1,193 @@
+"""
+Metrics and structured logs for VideoGPT
+Prometheus instruments for the hot paths (LLM, TTS, media decode, render,
+encode, queueing, caches, memory) plus one-line JSON logs that carry the
+job_id of the build they belong to
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+import psutil
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess,
+)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+STAGE_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600)
+FPS_BUCKETS = (1, 5, 10, 15, 20, 30, 45, 60, 90, 120)
+RSS_BUCKETS = tuple(mb * 1024 * 1024 for mb in (128, 256, 512, 768, 1024, 1536, 2048, 4096))
+RSS_SAMPLE_INTERVAL = 0.5  # seconds between RSS samples while a job runs
+
+LLM_LATENCY = Histogram(
+    "videogpt_llm_request_seconds", "LLM request latency", ["call"], buckets=LATENCY_BUCKETS)
+LLM_TOKENS = Counter(
+    "videogpt_llm_tokens_total", "LLM tokens used", ["call", "kind"])
+TTS_LATENCY = Histogram(
+    "videogpt_tts_seconds", "TTS synthesis latency per scene (cache misses)", buckets=LATENCY_BUCKETS)
+CACHE_REQUESTS = Counter(
+    "videogpt_cache_requests_total", "Cache lookups", ["cache", "result"])
+MEDIA_DECODE = Histogram(
+    "videogpt_media_decode_seconds", "Media decode + composite time per scene", ["type"],
+    buckets=LATENCY_BUCKETS)
+RENDER_FPS = Histogram(
+    "videogpt_render_fps", "Frames per second handed to the encoder per render", buckets=FPS_BUCKETS)
+ENCODE_SECONDS = Histogram(
+    "videogpt_encode_seconds", "Wall time of a render (decode + composite + encode)",
+    buckets=STAGE_BUCKETS)
+STAGE_SECONDS = Histogram(
+    "videogpt_stage_seconds", "Build stage duration", ["stage"], buckets=STAGE_BUCKETS)
+QUEUE_WAIT = Histogram(
+    "videogpt_queue_wait_seconds", "Time from job submission to build start", buckets=STAGE_BUCKETS)
+JOB_PEAK_RSS = Histogram(
+    "videogpt_job_peak_rss_bytes", "Peak resident memory of the process during a job",
+    buckets=RSS_BUCKETS)
+JOBS = Counter(
+    "videogpt_jobs_total", "Finished jobs", ["status"])
+JOBS_RUNNING = Gauge(
+    "videogpt_jobs_running", "Jobs currently building", multiprocess_mode="livesum")
+
+# job_id of the build running in the current thread / task
+current_job = contextvars.ContextVar("current_job", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        return json.dumps(entry, default=str)
+
+
+logger = logging.getLogger("videogpt")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(JsonFormatter())
+    logger.addHandler(_handler)
+    logger.setLevel(os.getenv("VIDEOGPT_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+
+def log_event(event, level=logging.INFO, **fields):
+    """
+    Writes one JSON log line, tagged with the current job_id (if any).
+    """
+
+    job_id = current_job.get()
+    if job_id is not None:
+        fields = {"job_id": job_id, **fields}
+    logger.log(level, event, extra={"fields": fields})
+
+
+@contextmanager
+def job_context(job_id):
+    token = current_job.set(job_id)
+    try:
+        yield
+    finally:
+        current_job.reset(token)
+
+
+@contextmanager
+def timed(histogram, event, **labels):
+    """
+    Times the block into `histogram` (with `labels`) and logs it as `event`.
+    """
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        (histogram.labels(**labels) if labels else histogram).observe(seconds)
+        log_event(event, seconds=round(seconds, 4), **labels)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_stage(stage, seconds):
+    STAGE_SECONDS.labels(stage=stage).observe(seconds)
+    log_event("stage", stage=stage, seconds=seconds)
+
+
+def record_render(frames, seconds, decode_seconds):
+    fps = frames / seconds if seconds > 0 else 0.0
+    ENCODE_SECONDS.observe(seconds)
+    RENDER_FPS.observe(fps)
+    log_event("render", frames=frames, seconds=round(seconds, 3),
+              decode_seconds=round(decode_seconds, 3), fps=round(fps, 1))
+
+
+class PeakRSS:
+    """
+    Samples this process's resident memory in a background thread while a
+    job runs; `peak` is the highest value seen. RSS is per process, so the
+    peak is only the job's own when no other job ran in the process
+    meanwhile: `shared` turns True if one did (in-process builds admitted
+    side by side), and the peak isn't recorded as the job's.
+    """
+
+    _active = set()
+    _active_lock = threading.Lock()
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = self.process.memory_info().rss
+        self.shared = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        with self._active_lock:
+            if self._active:
+                self.shared = True
+                for other in self._active:
+                    other.shared = True
+            self._active.add(self)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        with self._active_lock:
+            self._active.discard(self)
+        self.peak = max(self.peak, self.process.memory_info().rss)
+        if not self.shared:
+            JOB_PEAK_RSS.observe(self.peak)
+        log_event("peak_rss", bytes=self.peak, shared=self.shared)
+
+    @property
+    def job_peak(self):
+        """The peak if it is this job's alone, else None"""
+        return None if self.shared else self.peak
+
+
+def render_metrics():
+    """
+    Returns (body, content_type) for the /metrics endpoint. With render
+    workers, set PROMETHEUS_MULTIPROC_DIR so their samples are included.
+    """
+
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,225 @@
+"""
+Background music library for VideoGPT
+Indexes backend/app/music once, keeps every track as cached PCM and
+records duration + integrated loudness so mixing levels are consistent
+"""
+
+import os
+import re
+import json
+import uuid
+import hashlib
+import threading
+import zlib
+import numpy as np
+
+from audio_mixer import SAMPLE_RATE, CHANNELS, decode_audio, integrated_loudness
+from janitor import touch
+from metrics import record_cache
+
+# -------------------------
+# CONFIG
+# -------------------------
+MUSIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "music")
+MUSIC_CACHE_DIR = os.path.join("cache", "music")
+MUSIC_EXTENSIONS = ('.mp3', '.wav', '.m4a')
+
+# Every track is levelled to this loudness before MUSIC_VOLUME is applied
+# (about the average of the bundled tracks, so MUSIC_VOLUME keeps its meaning)
+REFERENCE_LOUDNESS = -10.0
+
+# Where to look when a mood has no track of its own (checked in order)
+MOOD_FALLBACKS = {
+    "uplifting": ["energetic", "adventure", "calm"],
+    "dramatic": ["adventure", "dark", "energetic"],
+    "calm": ["emotional", "mysterious"],
+    "dark": ["mysterious", "dramatic"],
+    "energetic": ["uplifting", "adventure"],
+    "emotional": ["calm", "dramatic"],
+    "mysterious": ["dark", "calm"],
+    "adventure": ["dramatic", "energetic"],
+}
+
+# music_dark.mp3, music_dark_2.mp3, music_dark-night.mp3 ...
+TRACK_NAME_PATTERN = re.compile(r'^music_([a-z]+)(?:[_\-].*)?$', re.IGNORECASE)
+
+
+def decode_track(path, cache_file):
+    """Decodes `path` into the PCM cache file; returns the samples"""
+    pcm = decode_audio(path)
+    tmp_file = f"{cache_file}.{uuid.uuid4().hex}.tmp"
+    pcm.tofile(tmp_file)
+    os.replace(tmp_file, cache_file)
+    return pcm
+
+
+class MusicTrack:
+    """
+    One decoded track. `pcm` is a read-only memory-mapped float32 array of
+    shape (samples, CHANNELS), so loading it costs nothing until it's mixed.
+    Each use touches the cache file (the janitor's LRU clock); if the janitor
+    evicted it anyway, the track is decoded again.
+    """
+
+    def __init__(self, path, mood, cache_file, duration, loudness):
+        self.path = path
+        self.mood = mood
+        self.cache_file = cache_file
+        self.duration = duration
+        self.loudness = loudness
+        self._pcm = None
+        self._lock = threading.Lock()
+
+    @property
+    def pcm(self):
+        with self._lock:
+            if not os.path.exists(self.cache_file):
+                print(f"   ♻️  Music cache of {os.path.basename(self.path)} was evicted, decoding again")
+                decode_track(self.path, self.cache_file)
+                self._pcm = None   # the old mapping pins the deleted file's space
+            touch(self.cache_file)
+            if self._pcm is None:
+                self._pcm = np.memmap(self.cache_file, dtype=np.float32,
+                                      mode="r").reshape(-1, CHANNELS)
+            return self._pcm
+
+    @property
+    def gain(self):
+        """
+        Linear gain that brings this track to REFERENCE_LOUDNESS.
+        """
+        if not np.isfinite(self.loudness):
+            return 1.0
+        return float(10 ** ((REFERENCE_LOUDNESS - self.loudness) / 20))
+
+    def to_dict(self):
+        return {
+            "file": os.path.basename(self.path),
+            "mood": self.mood,
+            "duration": round(self.duration, 3),
+            "loudness": round(self.loudness, 2) if np.isfinite(self.loudness) else None,
+            "gain": round(self.gain, 4),
+        }
+
+
+class MusicLibrary:
+    """
+    Index of all background tracks grouped by mood.
+    """
+
+    def __init__(self, music_dir=MUSIC_DIR, cache_dir=MUSIC_CACHE_DIR):
+        self.music_dir = music_dir
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.tracks = {}
+
+    def load(self):
+        """
+        Scans the music folder and decodes any track that isn't cached yet.
+        Supports music_{mood}.mp3, music_{mood}_2.mp3 ... and music/{mood}/*.mp3
+        """
+
+        self.tracks = {}
+        if not os.path.exists(self.music_dir):
+            print(f"\n⚠️  Music folder not found: {self.music_dir}")
+            print(f"   Download from: https://pixabay.com/music/ (royalty-free)")
+            return self
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        for mood, path in self._discover():
+            try:
+                track = self._load_track(path, mood)
+            except Exception as e:
+                print(f"⚠️  Skipping music track {path}: {e}")
+                continue
+            self.tracks.setdefault(mood, []).append(track)
+
+        count = sum(len(t) for t in self.tracks.values())
+        print(f"🎵 Music library ready: {count} track(s) for moods {sorted(self.tracks)}")
+        return self
+
+    def _discover(self):
+        for entry in sorted(os.listdir(self.music_dir)):
+            full = os.path.join(self.music_dir, entry)
+
+            if os.path.isdir(full):
+                for name in sorted(os.listdir(full)):
+                    if name.lower().endswith(MUSIC_EXTENSIONS):
+                        yield entry.lower(), os.path.join(full, name)
+                continue
+
+            if not entry.lower().endswith(MUSIC_EXTENSIONS):
+                continue
+            match = TRACK_NAME_PATTERN.match(os.path.splitext(entry)[0])
+            if match:
+                yield match.group(1).lower(), full
+
+    def _load_track(self, path, mood):
+        stat = os.stat(path)
+        key = hashlib.sha1(
+            f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{SAMPLE_RATE}".encode()
+        ).hexdigest()[:16]
+        cache_file = os.path.join(self.cache_dir, f"{key}.f32")
+        meta_file = os.path.join(self.cache_dir, f"{key}.json")
+
+        hit = os.path.exists(cache_file) and os.path.exists(meta_file)
+        record_cache("music", hit)
+        if hit:
+            touch(cache_file)
+            touch(meta_file)
+            with open(meta_file, "r") as f:
+                meta = json.load(f)
+        else:
+            pcm = decode_track(path, cache_file)
+            loudness = integrated_loudness(pcm)
+            meta = {
+                "source": path,
+                "duration": len(pcm) / SAMPLE_RATE,
+                "loudness": loudness if np.isfinite(loudness) else None,
+            }
+            with open(meta_file, "w") as f:
+                json.dump(meta, f, indent=2)
+            print(f"   ✓ Decoded {os.path.basename(path)} ({meta['duration']:.1f}s, {loudness:.1f} LUFS)")
+
+        loudness = meta["loudness"] if meta["loudness"] is not None else float("-inf")
+        return MusicTrack(path, mood, cache_file, meta["duration"], loudness)
+
+    def select(self, mood, seed=None):
+        """
+        Picks a track for `mood`, walking MOOD_FALLBACKS if the mood has none.
+        With several tracks per mood the choice is stable for a given seed.
+        """
+
+        for candidate in [mood] + MOOD_FALLBACKS.get(mood, []):
+            tracks = self.tracks.get(candidate)
+            if not tracks:
+                continue
+            if candidate != mood:
+                print(f"⚠️  No '{mood}' music, using '{candidate}' instead")
+            index = zlib.crc32(str(seed).encode()) % len(tracks) if seed is not None else 0
+            return tracks[index]
+
+        if self.tracks:
+            fallback = sorted(self.tracks)[0]
+            print(f"⚠️  No music related to '{mood}', using '{fallback}' instead")
+            return self.tracks[fallback][0]
+
+        return None
+
+    def to_dict(self):
+        return {mood: [t.to_dict() for t in tracks] for mood, tracks in sorted(self.tracks.items())}
+
+
+_library = None
+_library_lock = threading.Lock()
+
+def get_music_library():
+    """
+    Process-wide music library, built on first use (or at API startup).
+    """
+
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = MusicLibrary().load()
+        return _library
@@ -0,0 +1,116 @@
+"""
+Narration audio intermediates for VideoGPT
+Scene voiceovers are decoded once, back to back, into a single raw PCM
+file in the job workspace and read through a memory map
+"""
+
+import os
+import json
+import numpy as np
+
+from audio_mixer import SAMPLE_RATE, CHANNELS, decode_audio_into
+
+NARRATION_PCM = "narration.f32"
+NARRATION_INDEX = "narration.json"
+
+
+class NarrationTrack:
+    """
+    Raw float32 PCM (interleaved, CHANNELS wide) for every scene of a job.
+
+    Scenes are appended in order, so the full narration is already
+    "concatenated" on disk; `scene(i)` and `pcm` are views into one
+    memory map and never copy samples.
+    """
+
+    def __init__(self, work_dir, sample_rate=SAMPLE_RATE):
+        self.work_dir = work_dir
+        self.sample_rate = sample_rate
+        self.path = os.path.join(work_dir, NARRATION_PCM)
+        self.index_path = os.path.join(work_dir, NARRATION_INDEX)
+        self.spans = []
+        self._file = None
+        self._pcm = None
+
+    # -------------------------
+    # WRITING
+    # -------------------------
+    def _writer(self):
+        if self._file is None:
+            os.makedirs(self.work_dir, exist_ok=True)
+            self._file = open(self.path, "wb")
+            self.spans = []
+            self._pcm = None
+        return self._file
+
+    @property
+    def num_samples(self):
+        return self.spans[-1][1] if self.spans else 0
+
+    def append(self, audio_file):
+        """
+        Decodes `audio_file` straight onto the end of the track.
+        Returns the new scene's (start, end) sample span.
+        """
+
+        start = self.num_samples
+        written = decode_audio_into(audio_file, self._writer(), self.sample_rate)
+        self.spans.append((start, start + written))
+        return self.spans[-1]
+
+    def pad(self, num_samples):
+        """
+        Appends silence to the last scene (e.g. to land on a frame boundary).
+        """
+
+        if num_samples <= 0 or not self.spans:
+            return
+        self._writer().write(np.zeros((num_samples, CHANNELS), dtype=np.float32).tobytes())
+        start, end = self.spans[-1]
+        self.spans[-1] = (start, end + num_samples)
+
+    def close(self):
+        """
+        Finishes writing and stores the scene index next to the PCM file.
+        """
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        with open(self.index_path, "w") as f:
+            json.dump({"sample_rate": self.sample_rate, "channels": CHANNELS,
+                       "spans": self.spans}, f)
+        return self
+
+    @classmethod
+    def open(cls, work_dir):
+        """
+        Re-opens a finished track from a job workspace without decoding anything.
+        """
+
+        track = cls(work_dir)
+        with open(track.index_path, "r") as f:
+            index = json.load(f)
+        track.sample_rate = index["sample_rate"]
+        track.spans = [tuple(span) for span in index["spans"]]
+        return track
+
+    # -------------------------
+    # READING (zero-copy)
+    # -------------------------
+    @property
+    def pcm(self):
+        if self._pcm is None:
+            if self.num_samples == 0:
+                return np.zeros((0, CHANNELS), dtype=np.float32)
+            self._pcm = np.memmap(self.path, dtype=np.float32, mode="r",
+                                  shape=(self.num_samples, CHANNELS))
+        return self._pcm
+
+    def scene(self, index):
+        start, end = self.spans[index]
+        return self.pcm[start:end]
+
+    def duration(self, index):
+        start, end = self.spans[index]
+        return (end - start) / self.sample_rate
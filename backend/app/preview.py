@@ -0,0 +1,180 @@
+"""
+Live previews for VideoGPT
+Renders a single still or a single scene from the current project without
+running a full build; TTS comes from the shared cache and each timeline is
+kept in its own folder per upload and inputs (scenes, media, voice and
+subtitle style), so previews with different inputs never share files.
+A still doesn't wait for narration: until the voiced timeline exists it is
+placed on scene durations estimated from the narration's word count, while
+the voiced timeline is prepared in the background.
+"""
+
+import io
+import os
+import json
+import uuid
+import hashlib
+import threading
+from PIL import Image
+
+from video_engine import (
+    FPS, OUT_H, OUT_W, VOICE_PROFILES, VIRAL_SUBTITLE_STYLES,
+    read_user_media, prepare_timeline, scene_media_layers,
+)
+from admission import narration_seconds
+from audio_mixer import SAMPLE_RATE
+from renderer import FASTSTART_PARAMS, RENDER_PROFILES, SceneFrames, render_range
+from timeline import TIMELINE_FILE, Timeline, build_timeline, frame_aligned_padding
+from janitor import touch
+
+PREVIEW_DIR = "previews"
+PREVIEW_VOICE = "storyteller_female"
+PREVIEW_SUBTITLE_STYLE = "modern_minimal"
+PREVIEW_JPEG_QUALITY = 85
+
+_locks = {}
+_locks_guard = threading.Lock()
+_preparing = set()  # preview keys whose voiced timeline is being prepared in the background
+
+
+def _upload_lock(upload_id):
+    with _locks_guard:
+        return _locks.setdefault(upload_id, threading.Lock())
+
+def _preview_key(scenes, media_paths, voice_profile, subtitle_style):
+    media = [(os.path.basename(p), os.path.getsize(p), os.path.getmtime(p)) for p in media_paths]
+    payload = json.dumps([scenes, media, voice_profile, subtitle_style], sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def _preview_dir(upload_id, key):
+    # One folder per preview key: a request with another voice / style / scenes
+    # never rewrites the narration an earlier request is still rendering from
+    return os.path.join(PREVIEW_DIR, upload_id, key[:16])
+
+def _preview_inputs(media_folder, scenes, voice_profile, subtitle_style):
+    """(media_paths, voice_profile, subtitle_style, key) with the preview defaults applied"""
+    voice_profile = voice_profile if voice_profile in VOICE_PROFILES else PREVIEW_VOICE
+    if subtitle_style not in VIRAL_SUBTITLE_STYLES:
+        subtitle_style = PREVIEW_SUBTITLE_STYLE
+    media_paths = read_user_media(media_folder)
+    return media_paths, voice_profile, subtitle_style, _preview_key(
+        scenes, media_paths, voice_profile, subtitle_style)
+
+def _cached_timeline(upload_id, key):
+    timeline_file = os.path.join(_preview_dir(upload_id, key), TIMELINE_FILE)
+    if os.path.exists(timeline_file):
+        timeline = Timeline.load(timeline_file)
+        if timeline.meta.get("preview_key") == key:
+            touch(os.path.join(PREVIEW_DIR, upload_id))
+            return timeline
+    return None
+
+def get_preview_timeline(upload_id, media_folder, scenes,
+                         voice_profile=None, subtitle_style=None):
+    """
+    Returns the voiced preview timeline for an upload, rebuilding it only
+    when its inputs changed. Previews skip the LLM picks and use fixed
+    defaults unless a voice / subtitle style is given.
+    """
+
+    media_paths, voice_profile, subtitle_style, key = _preview_inputs(
+        media_folder, scenes, voice_profile, subtitle_style)
+
+    with _upload_lock(upload_id):
+        timeline = _cached_timeline(upload_id, key)
+        if timeline is not None:
+            return timeline
+
+        print(f"\n👀 Building preview timeline for {upload_id}")
+        work_dir = _preview_dir(upload_id, key)
+        timeline, narration_track = prepare_timeline(
+            scenes, media_paths, work_dir, voice_profile, subtitle_style,
+            preview_key=key,
+        )
+        # Previews play the narration on its own (no music bed)
+        timeline.audio["mix_pcm"] = narration_track.path
+        timeline.save(os.path.join(work_dir, TIMELINE_FILE))
+        return timeline
+
+def get_still_timeline(upload_id, media_folder, scenes, voice_profile=None, subtitle_style=None):
+    """
+    Timeline to place a still on, without waiting for TTS: the voiced preview
+    timeline if it exists, else one with estimated scene durations (meta
+    "estimated": True) while the voiced one is prepared in the background.
+    """
+
+    media_paths, voice_profile, subtitle_style, key = _preview_inputs(
+        media_folder, scenes, voice_profile, subtitle_style)
+    timeline = _cached_timeline(upload_id, key)
+    if timeline is not None:
+        return timeline
+
+    with _locks_guard:
+        start = key not in _preparing
+        _preparing.add(key)
+    if start:
+        def prepare():
+            try:
+                get_preview_timeline(upload_id, media_folder, scenes, voice_profile, subtitle_style)
+            except Exception as e:
+                print(f"⚠️  Preview timeline for {upload_id} failed: {e}")
+            finally:
+                with _locks_guard:
+                    _preparing.discard(key)
+        threading.Thread(target=prepare, daemon=True).start()
+
+    spans, end = [], 0
+    for scene in scenes:
+        begin, end = end, end + int(narration_seconds(scene["narration"]) * SAMPLE_RATE)
+        end += frame_aligned_padding(end, FPS, SAMPLE_RATE)
+        spans.append((begin, end))
+    return build_timeline(scenes, scene_media_layers(scenes, media_paths), spans, subtitle_style,
+                          FPS, SAMPLE_RATE, OUT_W, OUT_H, voice=voice_profile, preview_key=key,
+                          estimated=True)
+
+def render_preview_frame(timeline, t, profile="preview"):
+    """
+    Renders the frame at `t` seconds and returns it as JPEG bytes.
+    """
+
+    timeline = timeline.resized(RENDER_PROFILES[profile]["scale"])
+    frame_index = timeline.time_to_frame(t)
+    scene = timeline.scene_at_frame(frame_index)
+
+    frames = SceneFrames(scene, timeline.width, timeline.height, timeline.fps)
+    try:
+        frame = frames.frame(frame_index - scene.start_frame)
+    finally:
+        frames.close()
+
+    buffer = io.BytesIO()
+    Image.fromarray(frame).save(buffer, format="JPEG", quality=PREVIEW_JPEG_QUALITY)
+    return buffer.getvalue()
+
+def render_preview_scene(timeline, scene_index, upload_id, profile="preview", cancel=None):
+    """
+    Renders one scene (with its narration) to a small MP4 and returns the path.
+    Finished scene previews are reused until the timeline changes. Raises
+    JobCancelled if `cancel` fires (e.g. a build preempted the preview).
+    """
+
+    scene = timeline.scenes[scene_index]
+    settings = RENDER_PROFILES[profile]
+    work_dir = _preview_dir(upload_id, timeline.meta.get("preview_key", ""))
+    output_file = os.path.join(work_dir, f"scene_{scene_index}_{profile}.mp4")
+
+    if os.path.exists(output_file):
+        return output_file
+
+    tmp_file = output_file.replace(".mp4", f".{uuid.uuid4().hex}.tmp.mp4")
+    try:
+        render_range(timeline.resized(settings["scale"]), tmp_file,
+                     start_frame=scene.start_frame, end_frame=scene.end_frame,
+                     preset=settings["preset"], bitrate=settings["bitrate"],
+                     ffmpeg_params=FASTSTART_PARAMS, cancel=cancel)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    os.replace(tmp_file, output_file)
+    return output_file
@@ -0,0 +1,154 @@
+"""
+Per-job profiling for VideoGPT
+A sampling CPU profiler for the build thread (collapsed stacks, readable by
+flamegraph.pl / speedscope) and a tracemalloc allocation snapshot, written
+next to the job output
+"""
+
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+
+PROFILE_ENV = "VIDEOGPT_PROFILE"
+PROFILE_DIR = "profile"
+SAMPLE_INTERVAL = 0.005     # seconds between stack samples
+TRACEMALLOC_FRAMES = 25     # stack depth kept per allocation
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 40
+
+# Files written per job, by the `kind` used in the API
+PROFILE_FILES = {
+    "collapsed": "cpu.collapsed",
+    "cpu": "cpu_top.txt",
+    "memory": "memory_top.txt",
+}
+
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False  # started here (not by someone else), so ours to stop
+
+
+def profiling_requested(flag=False):
+    return flag or os.getenv(PROFILE_ENV, "").lower() in ("1", "true", "yes")
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0:
+            _tracemalloc_owned = not tracemalloc.is_tracing()
+            if _tracemalloc_owned:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+class JobProfiler:
+    """
+    Context manager around one build. Samples the stack of the thread that
+    entered it every SAMPLE_INTERVAL and takes an allocation snapshot at the
+    end; results land in `output_dir`.
+
+    Time spent in ffmpeg shows up as waits in write_frame / subprocess calls,
+    which is where encoder backpressure becomes visible.
+    """
+
+    def __init__(self, output_dir, interval=SAMPLE_INTERVAL):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def __enter__(self):
+        self._target = threading.get_ident()
+        self.started = time.monotonic()
+        _start_tracemalloc()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.wall = time.monotonic() - self.started
+        snapshot, self.traced_peak = None, 0
+        try:
+            # Tracing may have been stopped by code outside the profiler
+            if tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+                self.traced_peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            _stop_tracemalloc()
+        self.write(snapshot)
+
+    def write(self, snapshot):
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        with open(os.path.join(self.output_dir, PROFILE_FILES["collapsed"]), "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        # Self time = samples where the function is the leaf; total = on the stack at all
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+
+        samples = max(self.samples, 1)
+        with open(os.path.join(self.output_dir, PROFILE_FILES["cpu"]), "w") as f:
+            f.write(f"{self.samples} samples over {self.wall:.1f}s "
+                    f"(every {self.interval * 1000:.0f} ms)\n\n")
+            f.write(f"{'self %':>7} {'total %':>8}  function\n")
+            for label, count in own.most_common(TOP_FUNCTIONS):
+                f.write(f"{100 * count / samples:7.1f} {100 * total[label] / samples:8.1f}  {label}\n")
+
+        if snapshot is None:
+            with open(os.path.join(self.output_dir, PROFILE_FILES["memory"]), "w") as f:
+                f.write("No allocation snapshot: tracemalloc wasn't tracing at job end\n")
+            return
+
+        stats = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]).statistics("lineno")
+        with open(os.path.join(self.output_dir, PROFILE_FILES["memory"]), "w") as f:
+            f.write(f"Live Python allocations at job end: "
+                    f"{sum(s.size for s in stats) / 2**20:.1f} MB in {sum(s.count for s in stats)} blocks\n")
+            f.write(f"Peak traced Python memory: {self.traced_peak / 2**20:.1f} MB\n\n")
+            for stat in stats[:TOP_ALLOCATIONS]:
+                frame = stat.traceback[0]
+                f.write(f"{stat.size / 2**20:9.2f} MB {stat.count:8d} blocks  "
+                        f"{frame.filename}:{frame.lineno}\n")
+
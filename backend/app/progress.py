@@ -0,0 +1,153 @@
+"""
+Progress reporting for VideoGPT builds
+The engine calls a plain `progress(event_dict)` callback; these helpers
+keep that cheap and safe to call from the render loop
+"""
+
+import time
+from contextlib import contextmanager
+
+from cancellation import check_cancelled
+from metrics import record_stage
+
+RENDER_REPORT_INTERVAL = 0.5  # seconds between render progress events
+
+
+def report(progress, event_type, **fields):
+    """
+    Sends one event to the progress callback (if any). A failing callback
+    never breaks the build.
+    """
+
+    if progress is None:
+        return
+    try:
+        progress({"type": event_type, **fields})
+    except Exception as e:
+        print(f"⚠️  Progress callback failed: {e}")
+
+
+class RenderProgress:
+    """
+    Tracks frames handed to the encoder and reports overall / per-scene
+    percentage, encode fps and ETA, throttled to RENDER_REPORT_INTERVAL.
+    """
+
+    def __init__(self, progress, total_frames, interval=RENDER_REPORT_INTERVAL):
+        self.progress = progress
+        self.total_frames = max(total_frames, 1)
+        self.interval = interval
+        self.started = time.monotonic()
+        self.last_report = 0.0
+        self.frames_done = 0
+
+    def update(self, scene_index, scene_frame, scene_frames, force=False):
+        self.frames_done += 1
+        if self.progress is None:
+            return
+
+        now = time.monotonic()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+
+        elapsed = max(now - self.started, 1e-6)
+        fps = self.frames_done / elapsed
+        remaining = self.total_frames - self.frames_done
+        report(
+            self.progress, "render",
+            frame=self.frames_done,
+            frames=self.total_frames,
+            percent=round(100.0 * self.frames_done / self.total_frames, 1),
+            scene=scene_index,
+            scene_percent=round(100.0 * (scene_frame + 1) / max(scene_frames, 1), 1),
+            fps=round(fps, 1),
+            eta=round(remaining / fps, 1) if fps > 0 else None,
+        )
+
+
+# -------------------------
+# BUILD STAGES
+# -------------------------
+# Stages of a build in order, with their rough share of total build time
+# (used to turn stage-local progress into one overall percentage)
+BUILD_STAGES = [
+    ("analysis", 0.10),
+    ("media", 0.05),
+    ("tts", 0.20),
+    ("audio", 0.03),
+    ("render", 0.60),
+    ("mux", 0.02),
+]
+
+
+def overall_progress(stage, fraction=0.0):
+    """
+    Overall build completion (0..1) when `stage` is `fraction` done.
+    """
+
+    done = 0.0
+    for name, weight in BUILD_STAGES:
+        if name == stage:
+            return done + weight * min(max(fraction, 0.0), 1.0)
+        done += weight
+    return done
+
+
+class StageTimer:
+    """
+    Times named build stages and reports stage_start / stage_end events.
+    A cancelled `cancel` token stops the build before the next stage.
+    """
+
+    def __init__(self, progress=None, cancel=None):
+        self.progress = progress
+        self.cancel = cancel
+        self.durations = {}
+
+    @contextmanager
+    def stage(self, name):
+        check_cancelled(self.cancel)
+        report(self.progress, "stage_start", stage=name)
+        started = time.monotonic()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            duration = round(time.monotonic() - started, 3)
+            self.durations[name] = duration
+            record_stage(name, duration)
+            report(self.progress, "stage_end", stage=name, duration=duration, failed=failed)
+
+    def summary(self):
+        total = sum(self.durations.values())
+        lines = [f"   {name:<10} {seconds:7.2f}s" for name, seconds in self.durations.items()]
+        return "\n".join(lines + [f"   {'total':<10} {total:7.2f}s"])
+
+
+
+def estimate_eta(stage, fraction, stage_elapsed, durations, stage_eta=None):
+    """
+    Seconds left in the whole build: the current stage's own ETA (if it has
+    one) plus the rest, paced by how long the work so far took relative to
+    the stage weights. None until any progress has been made.
+    """
+
+    weights = dict(BUILD_STAGES)
+    names = [name for name, _ in BUILD_STAGES]
+    later = names[names.index(stage) + 1:] if stage in weights else []
+    if stage in durations:
+        # Stage just finished; only the later ones are left
+        stage_elapsed, fraction, stage_eta = 0.0, 0.0, 0.0
+
+    # Seconds per unit of stage weight, from finished stages + the current one
+    spent = sum(durations.values()) + stage_elapsed
+    covered = sum(weights.get(name, 0.0) for name in durations) + weights.get(stage, 0.0) * fraction
+    if covered <= 0:
+        return None
+    pace = spent / covered
+
+    if stage_eta is None:
+        stage_eta = pace * weights.get(stage, 0.0) * (1.0 - fraction)
+    return round(stage_eta + pace * sum(weights[name] for name in later), 1)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Remote render worker for VideoGPT
+Leases build jobs from the shared broker, fetches their media from the
+shared store, builds them here and uploads the outputs back. Run one
+process per build slot on every render node.
+
+    VIDEOGPT_BROKER=redis://broker-host:6379/0 VIDEOGPT_MEDIA_STORE=/shared/videogpt/media \
+        python remote_worker.py
+    python remote_worker.py --broker /var/lib/videogpt/broker.db   (SQLite: this host only)
+"""
+
+import os
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import traceback
+
+from broker import BROKER_ENV, STORE_ENV, MediaStore, default_store_root, open_broker
+from cancellation import CancelToken, JobCancelled
+from workers import execute_build, preload
+
+IDLE_POLL = 1.0   # seconds between lease attempts while the queue is empty
+
+
+class Heartbeat:
+    """
+    Renews a job lease in the background. If the lease is gone (the job was
+    cancelled, or given to another worker after it expired) `lost` turns
+    True and the build's cancel token fires.
+    """
+
+    def __init__(self, broker, job_id, worker_id, cancel):
+        self.broker = broker
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.cancel = cancel
+        self.interval = broker.lease_seconds / 3
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.broker.heartbeat(self.job_id, self.worker_id):
+                    self.lost = True
+                    self.cancel.cancel("lease lost")
+                    return
+            except Exception as e:
+                # Broker briefly unreachable; the lease has slack for a missed beat
+                print(f"⚠️  Heartbeat for {self.job_id} failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def output_names(output, build_kwargs):
+    """Files of a finished build to upload: the video, its extra formats, the timeline"""
+    from renderer import format_output_file
+    from timeline import TIMELINE_FILE
+
+    names = [os.path.basename(output), TIMELINE_FILE]
+    names += [os.path.basename(format_output_file(output, name))
+              for name in build_kwargs.get("formats") or ()]
+    return names
+
+
+def process_job(broker, store, worker_id, job_id, payload, attempt):
+    print(f"\n🎬 Job {job_id} leased by {worker_id} (attempt {attempt})")
+    job_root = tempfile.mkdtemp(prefix=f"videogpt_{job_id}_")
+    media_dir = os.path.join(job_root, "media")
+    work_dir = os.path.join(job_root, "work")
+    try:
+        store.get_dir(payload["inputs"], media_dir)
+        profile_dir = os.path.join(work_dir, "profile") if payload.get("profile") else None
+
+        cancel = CancelToken()
+        with Heartbeat(broker, job_id, worker_id, cancel) as heartbeat:
+            try:
+                result = execute_build(
+                    job_id, dict(payload["build_kwargs"], image_folder=media_dir, work_dir=work_dir),
+                    progress=lambda event: broker.publish(job_id, event),
+                    profile_dir=profile_dir,
+                    cancel=cancel,
+                )
+            except JobCancelled:
+                print(f"🛑 Job {job_id} stopped: lease lost (cancelled or reassigned)")
+                return
+            except Exception as e:
+                traceback.print_exc()
+                broker.fail(job_id, worker_id, str(e))
+                print(f"❌ Job {job_id} failed: {e}")
+                return
+
+        if heartbeat.lost:
+            print(f"⚠️  Lost the lease on {job_id} (cancelled or reassigned); dropping this result")
+            return
+
+        output = result["output"]
+        store.put_dir(work_dir, payload["outputs"], output_names(output, payload["build_kwargs"]))
+        if profile_dir is not None and os.path.isdir(profile_dir):
+            store.put_dir(profile_dir, f"{payload['outputs']}/profile")
+        if broker.complete(job_id, worker_id, {"output": os.path.basename(output),
+                                               "peak_rss": result["peak_rss"],
+                                               "worker": worker_id}):
+            print(f"✅ Job {job_id} done")
+        else:
+            store.delete(payload["outputs"])
+            print(f"⚠️  Job {job_id} finished after its lease moved on; result discarded")
+    finally:
+        shutil.rmtree(job_root, ignore_errors=True)
+
+
+def run_worker(broker, store, worker_id, once=False):
+    """Lease and build jobs until interrupted (or, with `once`, until the queue is empty)"""
+    preload()
+    print(f"🧰 Remote render worker {worker_id} ready ({broker.path})")
+    while True:
+        leased = broker.lease(worker_id)
+        if leased is None:
+            if once:
+                return
+            time.sleep(IDLE_POLL)
+            continue
+        process_job(broker, store, worker_id, *leased)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VideoGPT remote render worker")
+    parser.add_argument("--broker", default=os.getenv(BROKER_ENV), help="broker: redis:// URL, or a local SQLite file")
+    parser.add_argument("--store", default=os.getenv(STORE_ENV), help="shared media store directory")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    if not args.broker:
+        parser.error(f"--broker or {BROKER_ENV} is required")
+    try:
+        store_root = args.store or default_store_root(args.broker)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        run_worker(open_broker(args.broker), MediaStore(store_root), args.worker_id, once=args.once)
+    except KeyboardInterrupt:
+        print(f"\n👋 Worker {args.worker_id} stopped")
+
+
+if __name__ == "__main__":
+    main()
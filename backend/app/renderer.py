@@ -0,0 +1,296 @@
+"""
+Timeline renderer for VideoGPT
+Composites every frame straight from the timeline (media + subtitle overlay)
+and pipes it to ffmpeg, replacing chained moviepy clips
+"""
+
+import os
+import time
+import subprocess
+from contextlib import suppress
+import numpy as np
+from PIL import Image
+from moviepy.video.io.VideoFileClip import VideoFileClip
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+from audio_mixer import CHANNELS, _ffmpeg, encode_audio
+from subtitles import create_viral_subtitle
+from timeline import frame_to_sample
+from progress import RenderProgress
+from cancellation import JobCancelled, check_cancelled
+from metrics import MEDIA_DECODE, record_render
+
+VIDEO_CODEC = "libx264"
+
+# moov atom up front so playback starts before the whole file has downloaded
+FASTSTART_PARAMS = ["-movflags", "+faststart"]
+
+# Progressive (HLS, fragmented MP4) output written while encoding
+STREAM_PLAYLIST = "playlist.m3u8"
+STREAM_INIT = "init.mp4"
+STREAM_SEGMENT_SECONDS = 2
+
+# Output quality presets; "scale" is relative to the timeline's resolution
+RENDER_PROFILES = {
+    "final": {"scale": 1.0, "preset": "medium", "bitrate": "8000k"},
+    "preview": {"scale": 1 / 3, "preset": "ultrafast", "bitrate": "1500k"},
+}
+
+# Extra output geometries a build can render in the same pass as its main
+# (timeline-sized) output; scaled by the render profile like the main one
+OUTPUT_FORMATS = {
+    "9:16": (1080, 1920),
+    "1:1": (1080, 1080),
+    "16:9": (1920, 1080),
+}
+
+
+def format_output_file(output_file, name):
+    """final_video.mp4 -> final_video_16x9.mp4"""
+    root, ext = os.path.splitext(output_file)
+    return f"{root}_{name.replace(':', 'x')}{ext}"
+
+
+def fit_frame(image, width, height, resample=Image.LANCZOS, pad=False):
+    """
+    Scales `image` (PIL image or HxWx3 array) to the output width and centers
+    it on a black `width` x `height` canvas, cropping any overflow. With
+    `pad`, scales it to fit inside the canvas instead (no cropping).
+    """
+
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(image)
+    image = image.convert("RGB")
+
+    scale = width / image.width
+    if pad:
+        scale = min(scale, height / image.height)
+    new_w = max(1, round(image.width * scale))
+    new_h = max(1, round(image.height * scale))
+    image = image.resize((new_w, new_h), resample)
+
+    canvas = Image.new("RGB", (width, height), (0, 0, 0))
+    canvas.paste(image, ((width - new_w) // 2, (height - new_h) // 2))
+    return np.asarray(canvas)
+
+
+class SceneFrames:
+    """
+    Produces the composited frames of one timeline scene. Stills are
+    composited once; videos are decoded, looped and scaled per frame.
+    `extra_sizes` are further (width, height) outputs built from the same
+    decoded frame, padded to fit and with their own subtitle layout.
+    """
+
+    def __init__(self, scene, width, height, fps, extra_sizes=()):
+        self.scene = scene
+        self.fps = fps
+        self.layouts = [(width, height, False)] + [(w, h, True) for w, h in extra_sizes]
+        self.overlays = [
+            create_viral_subtitle(scene.subtitle["text"], scene.subtitle["style"], w, h)
+            for w, h, _ in self.layouts
+        ]
+        self.clip = None
+        self.stills = None
+
+        if scene.media["type"] == "video":
+            self.clip = VideoFileClip(scene.media["path"], audio=False)
+        else:
+            image = Image.open(scene.media["path"])
+            self.stills = [
+                overlay.apply(fit_frame(image, w, h, pad=pad))
+                for overlay, (w, h, pad) in zip(self.overlays, self.layouts)
+            ]
+
+    def frames(self, local_frame):
+        """The frame at `local_frame` for every output, main output first"""
+        if self.stills is not None:
+            return self.stills
+
+        # Loop short clips, same as concatenating copies and trimming
+        t = (local_frame / self.fps) % self.clip.duration
+        decoded = self.clip.get_frame(t)
+        return [
+            overlay.apply(fit_frame(decoded, w, h, Image.BILINEAR, pad=pad))
+            for overlay, (w, h, pad) in zip(self.overlays, self.layouts)
+        ]
+
+    def frame(self, local_frame):
+        return self.frames(local_frame)[0]
+
+    def close(self):
+        if self.clip is not None:
+            self.clip.close()
+            self.clip = None
+
+
+def render_timeline(timeline, output_file, audio_file=None, start_frame=0,
+                    end_frame=None, preset="medium", bitrate="8000k",
+                    ffmpeg_params=None, progress=None, extra_outputs=(), cancel=None,
+                    threads=None):
+    """
+    Encodes frames [start_frame, end_frame) of the timeline to `output_file`,
+    muxing `audio_file` as-is when given. Render progress (per scene %,
+    encode fps, ETA) goes to the `progress` callback.
+
+    `extra_outputs` are (width, height, output_file) renditions at other
+    geometries, encoded in the same pass from the same decoded frames as
+    fast-start MP4s (with `audio_file` too, if given).
+
+    `cancel` is checked every frame; on JobCancelled the ffmpeg processes are
+    killed instead of being left to finish the encode.
+
+    `threads` caps the encoder threads of the whole render (split between
+    the outputs); ffmpeg picks its own count when it's None.
+    """
+
+    if end_frame is None:
+        end_frame = timeline.num_frames
+    tracker = RenderProgress(progress, end_frame - start_frame)
+    extra_sizes = [(width, height) for width, height, _ in extra_outputs]
+    thread_params = []
+    if threads:
+        thread_params = ["-threads", str(max(1, threads // (1 + len(extra_outputs))))]
+
+    writers = [FFMPEG_VideoWriter(
+        output_file, (timeline.width, timeline.height), timeline.fps,
+        codec=VIDEO_CODEC, audiofile=audio_file, preset=preset,
+        bitrate=bitrate, ffmpeg_params=[*(ffmpeg_params or []), *thread_params],
+    )]
+    for width, height, extra_file in extra_outputs:
+        writers.append(FFMPEG_VideoWriter(
+            extra_file, (width, height), timeline.fps,
+            codec=VIDEO_CODEC, audiofile=audio_file, preset=preset,
+            bitrate=bitrate, ffmpeg_params=[*FASTSTART_PARAMS, *thread_params],
+        ))
+
+    started = time.perf_counter()
+    decode_seconds = 0.0
+    cancelled = False
+    try:
+        for scene, lo, hi in timeline.frame_ranges(start_frame, end_frame):
+            # Decode + composite time per scene; the rest of the wall time is encoding
+            scene_started = time.perf_counter()
+            frames = SceneFrames(scene, timeline.width, timeline.height, timeline.fps, extra_sizes)
+            scene_decode = time.perf_counter() - scene_started
+            try:
+                for k in range(lo, hi):
+                    check_cancelled(cancel)
+                    frame_started = time.perf_counter()
+                    outputs = frames.frames(k)
+                    scene_decode += time.perf_counter() - frame_started
+                    for writer, frame in zip(writers, outputs):
+                        writer.write_frame(frame)
+                    tracker.update(scene.index, k, scene.num_frames, force=(k == hi - 1))
+            finally:
+                frames.close()
+            MEDIA_DECODE.labels(type=scene.media["type"]).observe(scene_decode)
+            decode_seconds += scene_decode
+    except JobCancelled:
+        cancelled = True
+        raise
+    finally:
+        for writer in writers:
+            if cancelled:
+                writer.proc.kill()
+                with suppress(OSError):
+                    writer.close()
+            else:
+                writer.close()
+
+    record_render(end_frame - start_frame, time.perf_counter() - started, decode_seconds)
+
+    return output_file
+
+def _run_ffmpeg(cmd, output_file, action):
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg {action} failed for {output_file}: "
+                           f"{result.stderr.decode(errors='replace').strip()}")
+    return output_file
+
+def mux_audio(video_file, audio_file, output_file, ffmpeg_params=FASTSTART_PARAMS):
+    """
+    Puts the encoded video and audio streams into one (fast-start) MP4
+    without re-encoding.
+    """
+
+    cmd = [
+        _ffmpeg(), "-y", "-v", "error",
+        "-i", video_file, "-i", audio_file,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c", "copy", "-shortest",
+        *(ffmpeg_params or []),
+        output_file,
+    ]
+    return _run_ffmpeg(cmd, output_file, "mux")
+
+def stream_params(stream_dir, fps, segment_seconds=STREAM_SEGMENT_SECONDS):
+    """
+    ffmpeg output options for an HLS event playlist of fMP4 segments. A fixed
+    GOP makes every segment start on a keyframe and be exactly
+    `segment_seconds` long.
+    """
+
+    gop = str(round(fps * segment_seconds))
+    return [
+        "-g", gop, "-keyint_min", gop, "-sc_threshold", "0",
+        "-f", "hls",
+        "-hls_time", str(segment_seconds),
+        "-hls_playlist_type", "event",
+        "-hls_segment_type", "fmp4",
+        "-hls_fmp4_init_filename", STREAM_INIT,
+        "-hls_segment_filename", os.path.join(stream_dir, "segment_%05d.m4s"),
+        "-hls_flags", "independent_segments",
+    ]
+
+def render_stream(timeline, stream_dir, audio_file, **kwargs):
+    """
+    Renders the timeline straight into an HLS playlist in `stream_dir`; each
+    segment is playable as soon as ffmpeg finishes it. Returns the playlist.
+    """
+
+    os.makedirs(stream_dir, exist_ok=True)
+    playlist = os.path.join(stream_dir, STREAM_PLAYLIST)
+    render_timeline(timeline, playlist, audio_file=audio_file,
+                    ffmpeg_params=stream_params(stream_dir, timeline.fps), **kwargs)
+    return playlist
+
+def stream_to_mp4(playlist, output_file):
+    """
+    Joins a finished HLS stream into a single fast-start MP4 (stream copy).
+    """
+
+    cmd = [
+        _ffmpeg(), "-y", "-v", "error",
+        "-i", playlist,
+        "-c", "copy",
+        *FASTSTART_PARAMS,
+        output_file,
+    ]
+    return _run_ffmpeg(cmd, output_file, "remux")
+
+def render_range(timeline, output_file, start_frame=0, end_frame=None, **kwargs):
+    """
+    Partial render: cuts the matching sample range out of the memory-mapped
+    mix and encodes only the requested frames.
+    """
+
+    if end_frame is None:
+        end_frame = timeline.num_frames
+
+    audio_file = None
+    mix_pcm = timeline.audio.get("mix_pcm")
+    if mix_pcm and os.path.exists(mix_pcm):
+        mix = np.memmap(mix_pcm, dtype=np.float32, mode="r").reshape(-1, CHANNELS)
+        first = frame_to_sample(start_frame, timeline.fps, timeline.sample_rate)
+        last = frame_to_sample(end_frame, timeline.fps, timeline.sample_rate)
+        audio_file = os.path.splitext(output_file)[0] + "_audio.m4a"
+        encode_audio(mix[first:last], audio_file, timeline.sample_rate)
+
+    try:
+        return render_timeline(timeline, output_file, audio_file=audio_file,
+                               start_frame=start_frame, end_frame=end_frame, **kwargs)
+    finally:
+        if audio_file and os.path.exists(audio_file):
+            os.remove(audio_file)
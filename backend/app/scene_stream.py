@@ -0,0 +1,72 @@
+"""
+Incremental scene parser for VideoGPT
+Reads a streamed LLM completion of {"scenes": [{...}, ...]} chunk by chunk
+and hands back each scene object as soon as its closing brace arrives, so
+scene prompts can be shown before the completion has finished
+"""
+
+import json
+
+
+class SceneStreamParser:
+    """
+    Tracks JSON nesting (skipping over strings) across `feed` calls. Every
+    object that sits directly inside the first array of the document is
+    decoded and returned once complete. Text before the first "{" or "["
+    (such as a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0            # next character of `buffer` to scan
+        self.stack = []         # open containers: "{" / "["
+        self.in_string = False
+        self.escaped = False
+        self.item_start = None  # buffer offset of the scene object being read
+        self.array_depth = None # stack depth of the scenes array, once seen
+        self.scenes = []
+
+    def feed(self, text):
+        """
+        Adds a chunk of the completion; returns the scenes it completed.
+        """
+
+        self.buffer += text
+        completed = []
+        for i in range(self.pos, len(self.buffer)):
+            char = self.buffer[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char == '"':
+                if self.stack:
+                    self.in_string = True
+            elif char in "{[":
+                if char == "[" and self.array_depth is None:
+                    self.array_depth = len(self.stack) + 1
+                if char == "{" and len(self.stack) == self.array_depth and self.stack[-1] == "[":
+                    self.item_start = i
+                self.stack.append(char)
+            elif char in "}]" and self.stack:
+                self.stack.pop()
+                if (char == "}" and self.item_start is not None
+                        and len(self.stack) == self.array_depth):
+                    scene = json.loads(self.buffer[self.item_start:i + 1])
+                    self.item_start = None
+                    self.scenes.append(scene)
+                    completed.append(scene)
+
+        self.pos = len(self.buffer)
+        # Drop text that no pending scene needs, so long completions don't rescan
+        keep = self.item_start if self.item_start is not None else self.pos
+        self.buffer = self.buffer[keep:]
+        self.pos -= keep
+        if self.item_start is not None:
+            self.item_start = 0
+        return completed
@@ -0,0 +1,117 @@
+"""
+Request coalescing for VideoGPT
+Concurrent calls for the same key share one execution: the first caller
+runs the function, the others wait for its result (or its exception).
+StreamFlight does the same for iterators, replaying items as they arrive.
+"""
+
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}   # key -> _Call in flight
+
+    def do(self, key, fn):
+        """
+        Returns (value, shared): `shared` is True when the value came from
+        another caller's in-flight execution.
+        """
+
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.value, False
+
+
+class _Stream:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.items = []
+        self.done = False
+        self.error = None
+
+
+class StreamFlight:
+    """
+    Concurrent streams for the same key share one iterator. A background
+    thread drains it, so the stream runs to completion even if the caller
+    that started it goes away; every caller replays the items from the
+    first one, as they arrive.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.streams = {}   # key -> _Stream in flight
+
+    def do(self, key, make_iter):
+        """
+        Returns (items, shared): an iterator over the stream's items, and
+        True when it joined another caller's stream.
+        """
+
+        with self.lock:
+            stream = self.streams.get(key)
+            shared = stream is not None
+            if not shared:
+                stream = self.streams[key] = _Stream()
+                threading.Thread(target=self._drain, args=(key, stream, make_iter),
+                                 daemon=True).start()
+        return self._replay(stream), shared
+
+    def _drain(self, key, stream, make_iter):
+        try:
+            for item in make_iter():
+                with stream.cond:
+                    stream.items.append(item)
+                    stream.cond.notify_all()
+        except BaseException as e:
+            stream.error = e
+        finally:
+            with self.lock:
+                del self.streams[key]
+            with stream.cond:
+                stream.done = True
+                stream.cond.notify_all()
+
+    @staticmethod
+    def _replay(stream):
+        index = 0
+        while True:
+            with stream.cond:
+                while index >= len(stream.items) and not stream.done:
+                    stream.cond.wait()
+                if index < len(stream.items):
+                    item = stream.items[index]
+                    index += 1
+                elif stream.error is not None:
+                    raise stream.error
+                else:
+                    return
+            yield item
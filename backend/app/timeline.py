@@ -0,0 +1,156 @@
+"""
+Frame-exact timeline for VideoGPT
+Every scene gets integer frame and audio-sample boundaries before anything
+is rendered, so renders, previews and partial renders all agree on timing
+"""
+
+import json
+from bisect import bisect_right
+from dataclasses import dataclass, field, asdict, replace
+
+TIMELINE_VERSION = 1
+TIMELINE_FILE = "timeline.json"
+
+
+def frame_to_sample(frame, fps, sample_rate):
+    return frame * sample_rate // fps
+
+def samples_to_frames(num_samples, fps, sample_rate):
+    """
+    Number of whole frames needed to cover `num_samples` (rounded up).
+    """
+    return -(-num_samples * fps // sample_rate)
+
+def frame_aligned_padding(end_sample, fps, sample_rate):
+    """
+    Silence (in samples) needed after `end_sample` so the audio ends
+    exactly on a frame boundary.
+    """
+    frame = samples_to_frames(end_sample, fps, sample_rate)
+    return frame_to_sample(frame, fps, sample_rate) - end_sample
+
+
+@dataclass
+class TimelineScene:
+    index: int
+    start_frame: int
+    end_frame: int
+    start_sample: int
+    end_sample: int
+    media: dict = field(default_factory=dict)       # {"path", "type": image|video}
+    subtitle: dict = field(default_factory=dict)    # {"text", "style"}
+    narration: dict = field(default_factory=dict)   # {"emotion", "voice"}
+
+    @property
+    def num_frames(self):
+        return self.end_frame - self.start_frame
+
+
+@dataclass
+class Timeline:
+    fps: int
+    sample_rate: int
+    width: int
+    height: int
+    scenes: list = field(default_factory=list)
+    music: dict = field(default_factory=dict)       # {"path", "mood", "volume"}
+    audio: dict = field(default_factory=dict)       # {"narration", "mix", "mix_pcm"}
+    meta: dict = field(default_factory=dict)        # title, style, voice ...
+    version: int = TIMELINE_VERSION
+
+    # -------------------------
+    # TIMING
+    # -------------------------
+    @property
+    def num_frames(self):
+        return self.scenes[-1].end_frame if self.scenes else 0
+
+    @property
+    def num_samples(self):
+        return self.scenes[-1].end_sample if self.scenes else 0
+
+    @property
+    def duration(self):
+        return self.num_frames / self.fps
+
+    def time_to_frame(self, t):
+        frame = int(round(t * self.fps))
+        return min(max(frame, 0), max(self.num_frames - 1, 0))
+
+    def resized(self, scale):
+        """
+        Same timeline at another output resolution (even sizes for yuv420p).
+        """
+        if scale == 1:
+            return self
+        width = max(2, int(self.width * scale) // 2 * 2)
+        height = max(2, int(self.height * scale) // 2 * 2)
+        return replace(self, width=width, height=height)
+
+    def scene_at_frame(self, frame):
+        """
+        Scene containing `frame` (binary search over scene starts).
+        """
+        starts = [s.start_frame for s in self.scenes]
+        index = bisect_right(starts, frame) - 1
+        return self.scenes[max(index, 0)]
+
+    def frame_ranges(self, start_frame=0, end_frame=None):
+        """
+        Yields (scene, first_local_frame, last_local_frame_exclusive) for every
+        scene overlapping [start_frame, end_frame), for partial renders.
+        """
+        if end_frame is None:
+            end_frame = self.num_frames
+        for scene in self.scenes:
+            lo = max(start_frame, scene.start_frame)
+            hi = min(end_frame, scene.end_frame)
+            if lo < hi:
+                yield scene, lo - scene.start_frame, hi - scene.start_frame
+
+    # -------------------------
+    # SERIALIZATION
+    # -------------------------
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        data["scenes"] = [TimelineScene(**s) for s in data.get("scenes", [])]
+        return cls(**data)
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def build_timeline(scenes, media, narration_spans, subtitle_style,
+                   fps, sample_rate, width, height, **meta):
+    """
+    Builds the timeline from the scene list, the media layer chosen for each
+    scene and the narration sample spans (already padded to frame boundaries).
+    """
+
+    timeline = Timeline(fps=fps, sample_rate=sample_rate, width=width,
+                        height=height, meta=meta)
+
+    for i, (scene, media_layer, (start, end)) in enumerate(zip(scenes, media, narration_spans)):
+        timeline.scenes.append(TimelineScene(
+            index=i,
+            start_frame=samples_to_frames(start, fps, sample_rate),
+            end_frame=samples_to_frames(end, fps, sample_rate),
+            start_sample=start,
+            end_sample=end,
+            media=media_layer,
+            subtitle={"text": scene["narration"], "style": subtitle_style},
+            narration={"emotion": scene.get("emotion", "neutral")},
+        ))
+
+    return timeline
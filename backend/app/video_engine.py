@@ -3,18 +3,35 @@
 import os
 import sys
 import json
+import uuid
+import hashlib
+import shutil
+import tempfile
+import time
+import copy
 import asyncio
 from dotenv import load_dotenv
-from openai import OpenAI
-import edge_tts
+import threading
 from PIL import Image, ImageFilter, ImageDraw, ImageFont
-from moviepy.editor import (
-    ImageClip, TextClip, AudioFileClip, VideoFileClip,
-    CompositeVideoClip, CompositeAudioClip,
-    concatenate_videoclips
-)
 import textwrap
 import re
+import numpy as np
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from audio_mixer import SAMPLE_RATE, MUSIC_VOLUME, encode_audio, mix_narration_and_music
+from music_library import MUSIC_DIR, get_music_library
+from narration import NarrationTrack
+from subtitles import VIRAL_SUBTITLE_STYLES, identify_keywords, create_viral_subtitle
+from timeline import TIMELINE_FILE, build_timeline, frame_aligned_padding
+from renderer import (
+    OUTPUT_FORMATS, RENDER_PROFILES, STREAM_PLAYLIST, format_output_file,
+    render_timeline, mux_audio, render_stream, stream_to_mp4,
+)
+from progress import StageTimer, report
+from cancellation import check_cancelled
+from scene_stream import SceneStreamParser
+from singleflight import SingleFlight, StreamFlight
+from janitor import touch
+from metrics import LLM_LATENCY, LLM_TOKENS, TTS_LATENCY, log_event, record_cache, timed
 
 # -------------------------
 # CONFIG
@@ -22,15 +39,33 @@ import re
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not set in .env")
+_client = None
+_client_lock = threading.Lock()
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+def get_client():
+    """
+    The process-wide OpenAI client, created on first use (importing openai
+    is slow, and a missing key should only fail the calls that need it).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            if not OPENAI_API_KEY:
+                raise ValueError("OPENAI_API_KEY not set in .env")
+            from openai import OpenAI
+            _client = OpenAI(api_key=OPENAI_API_KEY)
+        return _client
+LLM_MODEL = "gpt-4o-mini"
 
 OUT_W, OUT_H = 1080, 1920
+FPS = 30
 PROMPTS_FILE = "prompts.json"
 OUT_VIDEO = "final_video.mp4"
 OUT_SRT = "subtitles.srt"
+OUT_AUDIO_MIX = "audio_mix.m4a"
+OUT_VIDEO_ONLY = "video_only.mp4"
+TTS_CACHE_DIR = os.path.join("cache", "tts")
+SCENES_CACHE_DIR = os.path.join("cache", "scenes")
 
 STYLE_PROMPTS = {
     "cinematic": "cinematic lighting, filmic color grading, dramatic rim light",
@@ -45,60 +80,6 @@ STYLE_PROMPTS = {
 IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif')
 VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm', '.gif')
 
-# Viral subtitle styles inspired by top creators
-VIRAL_SUBTITLE_STYLES = {
-    "alex_hormozi": {
-        "font": "Impact",  # Bold, attention-grabbing
-        "fontsize": 80,
-        "primary_color": "#FFFF00",  # Yellow
-        "stroke_color": "#000000",
-        "stroke_width": 5,
-        "highlight_color": "#00FFD4",  # Cyan for keywords
-        "bg_opacity": 0.7,
-        "animation": "word_pop"
-    },
-    "mr_beast": {
-        "font": "Impact",
-        "fontsize": 85,
-        "primary_color": "#FFFFFF",
-        "stroke_color": "#FF0000",  # Red stroke
-        "stroke_width": 6,
-        "highlight_color": "#FFEA00",  # Yellow for emphasis
-        "bg_opacity": 0.8,
-        "animation": "bounce"
-    },
-    "modern_minimal": {
-        "font": "Arial-Bold",
-        "fontsize": 70,
-        "primary_color": "#FFFFFF",
-        "stroke_color": "#000000",
-        "stroke_width": 4,
-        "highlight_color": "#A78BFA",  # Purple
-        "bg_opacity": 0.6,
-        "animation": "fade_in"
-    },
-    "trendy_gradient": {
-        "font": "Arial-Bold",
-        "fontsize": 75,
-        "primary_color": "#FF6B6B",  # Gradient effect (simulated with colors)
-        "stroke_color": "#000000",
-        "stroke_width": 5,
-        "highlight_color": "#00FFD3",  # Cyan
-        "bg_opacity": 0.7,
-        "animation": "slide_up"
-    },
-    "bold_contrast": {
-        "font": "Impact",
-        "fontsize": 90,
-        "primary_color": "#000000",  # Black text
-        "stroke_color": "#FFFFFF",  # White stroke (inverted)
-        "stroke_width": 6,
-        "highlight_color": "#FF00FF",  # Magenta
-        "bg_opacity": 0.9,
-        "animation": "scale_in"
-    }
-}
-
 # Microsoft Edge TTS Voice Profiles
 VOICE_PROFILES = {
     "storyteller_female": {
@@ -196,6 +177,76 @@ def read_user_media(folder):
         print(f"   {i}. {os.path.basename(path)} ({file_type})")
     
     return media_paths
+
+def probe_media(media_paths):
+    """
+    Reads size (and duration / fps for videos) of every media file up front,
+    so broken files fail before TTS and render instead of mid-encode.
+    Returns {path: info}.
+    """
+    info = {}
+    for path in media_paths:
+        if is_video_file(path):
+            meta = ffmpeg_parse_infos(path)
+            width, height = meta["video_size"]
+            info[path] = {"width": width, "height": height,
+                          "duration": meta["duration"], "fps": meta["video_fps"]}
+        else:
+            with Image.open(path) as image:
+                info[path] = {"width": image.width, "height": image.height}
+    return info
+
+# -------------------------
+# LLM CALLS
+# -------------------------
+def ask_llm(call, system, user_prompt, temperature=0.3):
+    """
+    One chat completion, timed and token-counted under the `call` label.
+    """
+    with timed(LLM_LATENCY, "llm_request", call=call):
+        resp = get_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=temperature,
+        )
+    record_llm_usage(call, resp.usage)
+    return resp
+
+def ask_llm_stream(call, system, user_prompt, temperature=0.3):
+    """
+    Streamed chat completion: yields the text as it arrives. Timed (and the
+    time to the first token logged) under the `call` label.
+    """
+    started = time.perf_counter()
+    first_token = None
+    with timed(LLM_LATENCY, "llm_request", call=call):
+        stream = get_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            record_llm_usage(call, chunk.usage)
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - started
+                log_event("llm_first_token", call=call, seconds=round(first_token, 4))
+            yield chunk.choices[0].delta.content
+
+def record_llm_usage(call, usage):
+    if usage is not None:
+        LLM_TOKENS.labels(call=call, kind="prompt").inc(usage.prompt_tokens)
+        LLM_TOKENS.labels(call=call, kind="completion").inc(usage.completion_tokens)
+
 # -------------------------
 # SUBTITLE STYLE ANALYSIS
 # -------------------------
@@ -221,14 +272,7 @@ def analyze_subtitle_style(title, scenes):
     Respond with ONE option only.
     """
     
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=0.3,
-    )
+    resp = ask_llm("subtitle_style", system, user_prompt, temperature=0.3)
     
     style_choice = resp.choices[0].message.content.strip().lower()
     
@@ -238,30 +282,6 @@ def analyze_subtitle_style(title, scenes):
     print(f"\n🎬 Selected Subtitle Style: {style_choice.replace('_', ' ').title()}")
     return style_choice
 
-def identify_keywords(text):
-    """
-    Identifies keywords to highlight in subtitles for emphasis.
-    """
-    
-    # Common words to highlight: numbers, superlatives, action verbs, emotions
-    highlight_patterns = [
-        'amazing', 'incredible', 'best', 'worst', 'never', 'always',
-        'first', 'last', 'new', 'now', 'today', 'epic', 'crazy',
-        'unbelievable', 'shocking', 'secret', 'revealed', 'must',
-        'you', 'your', 'free', 'easy', 'simple', 'powerful'
-    ]
-    
-    words = text.lower().split()
-    keywords = []
-    
-    for i, word in enumerate(words):
-        # Check if word matches highlight patterns
-        word_clean = word.strip('.,!?')
-        if word_clean in highlight_patterns or word_clean.isdigit():
-            keywords.append(i)
-    
-    return keywords
-
 # -------------------------
 # VOICE ANALYSIS & SELECTION
 # -------------------------
@@ -286,14 +306,7 @@ def analyze_narration_style(scenes):
     Respond with ONE option only.
     """
     
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=0.3,
-    )
+    resp = ask_llm("narration_style", system, user_prompt, temperature=0.3)
     
     voice_choice = resp.choices[0].message.content.strip().lower()
     
@@ -323,14 +336,7 @@ def analyze_story_mood(title, scenes):
     What mood of background music would fit best? Respond with ONE WORD only.
     """
     
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=0.3,
-    )
+    resp = ask_llm("mood", system, user_prompt, temperature=0.3)
     
     mood = resp.choices[0].message.content.strip().lower()
     
@@ -340,38 +346,29 @@ def analyze_story_mood(title, scenes):
     print(f"🎵 Detected Story Mood: {mood.upper()}")
     return mood
 
-def get_background_music(mood):
+def get_background_music(mood, seed=None):
     """
-    Selects appropriate background music based on mood.
+    Selects appropriate background music based on mood from the
+    pre-decoded music library.
     """
     
-    music_folder = "music"
-    music_file = os.path.join(music_folder, f"music_{mood}.mp3")
-    
-    if not os.path.exists(music_folder):
-        os.makedirs(music_folder)
-        print(f"\n⚠️  Created 'music/' folder. Add background music files:")
+    track = get_music_library().select(mood, seed=seed)
+
+    if track is None:
+        print(f"\n⚠️  No background music available. Add files to {MUSIC_DIR}/")
         print(f"   Download from: https://pixabay.com/music/ (royalty-free)")
         return None
-    
-    if os.path.exists(music_file):
-        print(f"✅ Using background music: {music_file}")
-        return music_file
-    
-    music_files = [f for f in os.listdir(music_folder) if f.endswith(('.mp3', '.wav', '.m4a'))]
-    if music_files:
-        fallback = os.path.join(music_folder, music_files[0])
-        print(f"⚠️  Using fallback music: {fallback}")
-        return fallback
-    
-    return None
+
+    print(f"✅ Using background music: {os.path.basename(track.path)} "
+          f"({track.duration:.0f}s, {track.loudness:.1f} LUFS)")
+    return track
 
 # -------------------------
 # SCENE GENERATION
 # -------------------------
-def generate_scenes_from_title(title, style):
-    system = "You are a professional video scriptwriter. Respond only in JSON."
+SCENES_SYSTEM = "You are a professional video scriptwriter. Respond only in JSON."
 
+def scenes_prompt(title, style):
     user_prompt = f"""
     Title: "{title}"
     Style: "{style}"
@@ -391,35 +388,123 @@ def generate_scenes_from_title(title, style):
     Make narrations viral-worthy with strong hooks and emotional impact.
     Include emotion for voice delivery.
     """
+    return user_prompt
 
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=0.7,
-    )
-
-    raw = resp.choices[0].message.content
-
+def parse_scenes_json(raw):
+    """Scenes out of a completion, tolerating text around the JSON object"""
     try:
         data = json.loads(raw)
-    except:
+    except ValueError:
         start = raw.find("{")
         end = raw.rfind("}")
         data = json.loads(raw[start:end+1])
+    return data["scenes"]
 
-    scenes = data["scenes"]
+def finish_scene(scene, style):
+    """Style suffix on the image prompt and a default emotion"""
     style_text = STYLE_PROMPTS.get(style, "")
+    scene["image_prompt"] += f", {style_text}, ultra-detailed, vertical 9:16"
+    if "emotion" not in scene:
+        scene["emotion"] = "neutral"
+    return scene
+
+# Identical concurrent scene requests share one completion (streamed or not)
+scene_requests = SingleFlight()
+scene_streams = StreamFlight()
+
+def scenes_cache_file(title, style):
+    # The prompt embeds title and style; hashing it also retires entries when it changes
+    key = hashlib.sha1(f"{LLM_MODEL}|{SCENES_SYSTEM}|{scenes_prompt(title, style)}".encode("utf-8"))
+    return os.path.join(SCENES_CACHE_DIR, f"{key.hexdigest()}.json")
+
+def load_cached_scenes(title, style):
+    cache_file = scenes_cache_file(title, style)
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            scenes = json.load(f)["scenes"]
+    except (OSError, ValueError, KeyError):
+        record_cache("scenes", False)
+        return None
+    record_cache("scenes", True)
+    touch(cache_file)
+    return scenes
 
-    for s in scenes:
-        s["image_prompt"] += f", {style_text}, ultra-detailed, vertical 9:16"
-        if "emotion" not in s:
-            s["emotion"] = "neutral"
+def store_cached_scenes(title, style, scenes):
+    cache_file = scenes_cache_file(title, style)
+    os.makedirs(SCENES_CACHE_DIR, exist_ok=True)
+    tmp_file = f"{cache_file}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"title": title, "style": style, "scenes": scenes}, f, indent=2)
+    os.replace(tmp_file, cache_file)
+
+def complete_scenes(title, style):
+    resp = ask_llm("scenes", SCENES_SYSTEM, scenes_prompt(title, style), temperature=0.7)
+    scenes = [finish_scene(s, style) for s in parse_scenes_json(resp.choices[0].message.content)]
+    store_cached_scenes(title, style, scenes)
+    return scenes
 
-    with open(PROMPTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+def generate_scenes_from_title(title, style, prompts_file=PROMPTS_FILE, fresh=False):
+    """
+    Scenes for a title, from the on-disk cache unless `fresh`. Concurrent
+    identical requests wait on one LLM call instead of making their own.
+    """
+    scenes = None if fresh else load_cached_scenes(title, style)
+    if scenes is None:
+        scenes, shared = scene_requests.do((title, style), lambda: complete_scenes(title, style))
+        if shared:
+            log_event("scenes_coalesced", title=title, style=style)
+        # Coalesced callers get the same list; keep it safe to edit
+        scenes = copy.deepcopy(scenes)
+
+    if prompts_file is not None:
+        save_scenes(scenes, prompts_file)
+    return scenes
+
+def stream_scenes_from_title(title, style, prompts_file=PROMPTS_FILE, fresh=False):
+    """
+    Same as generate_scenes_from_title, but with a streamed completion:
+    yields each scene as soon as the model has finished writing it. Cached
+    scenes (unless `fresh`) are yielded straight away. Concurrent identical
+    streams share one completion and each replays its scenes from the start.
+    """
+    scenes = None if fresh else load_cached_scenes(title, style)
+    if scenes is not None:
+        yield from scenes
+        if prompts_file is not None:
+            save_scenes(scenes, prompts_file)
+        return
+
+    stream, shared = scene_streams.do((title, style), lambda: complete_scenes_stream(title, style))
+    if shared:
+        log_event("scenes_coalesced", title=title, style=style, stream=True)
+    scenes = []
+    for scene in stream:
+        # Every stream sharing the completion gets its own copy to edit
+        scene = copy.deepcopy(scene)
+        scenes.append(scene)
+        yield scene
+    if prompts_file is not None:
+        save_scenes(scenes, prompts_file)
+
+def complete_scenes_stream(title, style):
+    """Streamed scene completion: yields finished scenes, then caches the list"""
+    parser = SceneStreamParser()
+    raw = []
+    for text in ask_llm_stream("scenes", SCENES_SYSTEM, scenes_prompt(title, style), temperature=0.7):
+        raw.append(text)
+        for scene in parser.feed(text):
+            yield finish_scene(scene, style)
+
+    scenes = parser.scenes
+    if not scenes:
+        # Not the expected shape for incremental parsing; fall back to the whole text
+        scenes = [finish_scene(s, style) for s in parse_scenes_json("".join(raw))]
+        yield from scenes
+    store_cached_scenes(title, style, scenes)
+
+def save_scenes(scenes, prompts_file=PROMPTS_FILE):
+    with open(prompts_file, "w", encoding="utf-8") as f:
+        json.dump({"scenes": scenes}, f, indent=2)
 
     print("\n🎨 PROMPTS GENERATED:")
     print("=" * 80)
@@ -436,16 +521,16 @@ def generate_scenes_from_title(title, style):
     print("   💡 TIP: You can also use VIDEOS (animated clips)!")
     print("   Supported: .mp4, .mov, .webm, .gif - just name them scene_0.mp4, scene_1.mp4, etc.")
     print("   Mix and match images and videos as you like!")
-    print(f"\n💾 Full prompts saved to: {PROMPTS_FILE}\n")
+    print(f"\n💾 Full prompts saved to: {prompts_file}\n")
 
     return scenes
 
 # -------------------------
 # ADVANCED TTS WITH EDGE-TTS
 # -------------------------
-async def make_expressive_tts_async(text, output_file, voice_profile, emotion="neutral"):
+def tts_voice_settings(voice_profile, emotion="neutral"):
     """
-    Generate expressive TTS using Microsoft Edge TTS (completely free).
+    Resolves the Edge TTS voice, rate and pitch for a profile + emotion.
     """
     
     profile = VOICE_PROFILES[voice_profile]
@@ -466,6 +551,17 @@ async def make_expressive_tts_async(text, output_file, voice_profile, emotion="n
         rate = "-10%"
         pitch = "-5Hz"
     
+    return voice, rate, pitch
+
+async def make_expressive_tts_async(text, output_file, voice_profile, emotion="neutral"):
+    """
+    Generate expressive TTS using Microsoft Edge TTS (completely free).
+    """
+    
+    import edge_tts
+    
+    voice, rate, pitch = tts_voice_settings(voice_profile, emotion)
+    
     communicate = edge_tts.Communicate(text, voice, rate=rate, pitch=pitch)
     await communicate.save(output_file)
     return output_file
@@ -473,170 +569,243 @@ async def make_expressive_tts_async(text, output_file, voice_profile, emotion="n
 def make_expressive_tts(text, output_file, voice_profile, emotion="neutral"):
     return asyncio.run(make_expressive_tts_async(text, output_file, voice_profile, emotion))
 
-# -------------------------
-# VIRAL SUBTITLE CREATION
-# -------------------------
-def create_viral_subtitle(text, style_name, duration, scene_index):
+def get_cached_tts(text, voice_profile, emotion="neutral"):
     """
-    Creates viral-style subtitles with keyword highlighting and dynamic effects.
+    Returns an MP3 of the narration from the on-disk TTS cache, synthesizing
+    it only the first time a (text, voice, rate, pitch) combination is seen.
     """
     
-    style = VIRAL_SUBTITLE_STYLES[style_name]
-    keywords = identify_keywords(text)
-    
-    # Split text into words for word-by-word animation effect
-    words = text.split()
-    
-    # For simplicity, we'll create a composite subtitle with highlighted keywords
-    # In a production environment, you'd want word-by-word timing
+    voice, rate, pitch = tts_voice_settings(voice_profile, emotion)
+    key = hashlib.sha1(f"{voice}|{rate}|{pitch}|{text}".encode("utf-8")).hexdigest()
+    cache_file = os.path.join(TTS_CACHE_DIR, f"{key}.mp3")
     
-    subtitle_clips = []
-    y_position = OUT_H * 0.75  # Position subtitles in lower third
+    hit = os.path.exists(cache_file)
+    record_cache("tts", hit)
+    if hit:
+        touch(cache_file)
+        return cache_file
     
-    # Create main subtitle with keyword highlighting
-    full_text = text
-    
-    # Main subtitle
-    main_sub = TextClip(
-        full_text,
-        fontsize=style["fontsize"],
-        color=style["primary_color"],
-        font=style["font"],
-        stroke_color=style["stroke_color"],
-        stroke_width=style["stroke_width"],
-        method="caption",
-        size=(OUT_W - 120, None),
-        align='center'
-    ).set_duration(duration).set_position(("center", y_position))
-    
-    # Add semi-transparent background for better readability
-    bg_height = main_sub.h + 40
-    bg = ImageClip(create_subtitle_background(OUT_W, bg_height, style["bg_opacity"]))
-    bg = bg.set_duration(duration).set_position(("center", y_position - 20))
-    
-    return CompositeVideoClip([bg, main_sub], size=(OUT_W, OUT_H))
+    os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+    tmp_file = f"{cache_file}.{uuid.uuid4().hex}.tmp"
+    try:
+        with timed(TTS_LATENCY, "tts_request"):
+            make_expressive_tts(text, tmp_file, voice_profile, emotion)
+        os.replace(tmp_file, cache_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return cache_file
 
-def create_subtitle_background(width, height, opacity):
+# -------------------------
+# TIMELINE PREPARATION
+# -------------------------
+def load_scenes(prompts_file=PROMPTS_FILE):
+    with open(prompts_file, "r") as f:
+        data = json.load(f)
+    return data["scenes"]
+
+def scene_media_layers(scenes, media_paths, media_info=None):
+    """Media layer of every scene; the last file repeats when there are fewer files than scenes"""
+    layers = []
+    for i in range(len(scenes)):
+        media_file = media_paths[i] if i < len(media_paths) else media_paths[-1]
+        layers.append({"path": media_file, "type": "video" if is_video_file(media_file) else "image",
+                       **(media_info or {}).get(media_file, {})})
+    return layers
+
+def prepare_timeline(scenes, media_paths, work_dir, voice_profile, subtitle_style,
+                     width=OUT_W, height=OUT_H, progress=None, media_info=None, cancel=None,
+                     **meta):
     """
-    Creates a semi-transparent background for subtitles.
+    Voices every scene (through the TTS cache) onto a frame-aligned narration
+    track in `work_dir` and builds the frame-exact timeline for it.
+    Probed `media_info` ({path: info}) is kept on each scene's media layer.
+    Returns (timeline, narration_track).
     """
-    from PIL import Image
-    import numpy as np
     
-    # Create semi-transparent black background
-    img = Image.new('RGBA', (width, height), (0, 0, 0, int(255 * opacity)))
-    return np.array(img)
+    narration_track = NarrationTrack(work_dir)
+    media = scene_media_layers(scenes, media_paths, media_info)
+
+    for i, scene in enumerate(scenes):
+        check_cancelled(cancel)
+        narration = scene["narration"]
+        emotion = scene.get("emotion", "neutral")
+        media_type = media[i]["type"]
+
+        # Decode the (cached) TTS once onto the memory-mapped narration track,
+        # padded with silence so the scene ends exactly on a frame boundary
+        audio_file = get_cached_tts(narration, voice_profile, emotion)
+        _, end = narration_track.append(audio_file)
+        narration_track.pad(frame_aligned_padding(end, FPS, SAMPLE_RATE))
+
+        duration = narration_track.duration(i)
+        print(f"  ✓ Scene {i} ({media_type.upper()}) | Emotion: {emotion} | Duration: {duration:.1f}s")
+        report(progress, "tts", scene=i, scenes=len(scenes), duration=round(duration, 3))
+
+    narration_track.close()
+    timeline = build_timeline(
+        scenes, media, narration_track.spans, subtitle_style,
+        FPS, SAMPLE_RATE, width, height, voice=voice_profile, **meta
+    )
+    timeline.audio = {"narration": narration_track.path}
+    return timeline, narration_track
 
 # -------------------------
 # VIDEO BUILD WITH VIRAL SUBTITLES
 # -------------------------
-def build_video_from_user_images(image_folder, style="cinematic", title=""):
+def analyze_build(title, scenes, known=None):
+    """
+    The LLM picks for a build (voice, subtitle style, music mood). Builds of
+    the same title and scenes can share one result; picks already in `known`
+    (e.g. pinned in a project manifest) aren't asked again.
+    """
+    known = known or {}
+    return {
+        "voice_profile": known.get("voice_profile") or analyze_narration_style(scenes),
+        "subtitle_style": known.get("subtitle_style") or analyze_subtitle_style(title, scenes),
+        "mood": known.get("mood") or analyze_story_mood(title, scenes),
+    }
+
+def build_video_from_user_images(image_folder, style="cinematic", title="", work_dir=None,
+                                 progress=None, width=OUT_W, height=OUT_H, stream_dir=None,
+                                 scenes=None, analysis=None, render_profile="final", formats=(),
+                                 cancel=None, threads=None, media=None):
     """
     Build video with professional voice, viral subtitles, and background music.
     Supports both images AND videos as input!
+
+    Intermediates (TTS, narration PCM, audio mix) live in `work_dir`; when it
+    isn't given a temporary workspace is used and removed afterwards.
+    `progress` receives event dicts (per-scene TTS, render %, fps, ETA).
+    With `stream_dir`, the render is also written there as HLS while encoding.
+    `scenes` defaults to prompts.json; picks given in `analysis` (see
+    analyze_build) skip the matching LLM calls. `formats` (OUTPUT_FORMATS names) are
+    extra aspect ratios rendered in the same pass, next to the main output
+    as final_video_<W>x<H>.mp4 (see format_output_file). A `cancel` token
+    (cancellation.CancelToken) stops the build between stages, scenes and
+    frames by raising JobCancelled. `threads` caps the encoder threads (see
+    admission.AdmissionController). `media` is (media_paths, media_info)
+    already read and probed from `image_folder`, e.g. shared across a batch.
     """
 
-    with open(PROMPTS_FILE, "r") as f:
-        data = json.load(f)
-    scenes = data["scenes"]
+    if scenes is None:
+        scenes = load_scenes()
+    stages = StageTimer(progress, cancel)
 
     # AI-powered selections
-    voice_profile = analyze_narration_style(scenes)
-    subtitle_style = analyze_subtitle_style(title, scenes)
-    mood = analyze_story_mood(title, scenes)
-    bg_music_file = get_background_music(mood)
+    with stages.stage("analysis"):
+        analysis = analyze_build(title, scenes, analysis)
+        voice_profile = analysis["voice_profile"]
+        subtitle_style = analysis["subtitle_style"]
+        mood = analysis["mood"]
+        bg_music = get_background_music(mood, seed=title)
 
     # Read media files (images or videos) - automatically sorted by scene number
-    media_paths = read_user_media(image_folder)
-
-    clips = []
-    temp_audio = []
-    timer = 0
+    with stages.stage("media"):
+        if media is None:
+            media_paths = read_user_media(image_folder)
+            media = media_paths, probe_media(media_paths)
+        media_paths, media_info = media
+
+    own_work_dir = work_dir is None
+    if own_work_dir:
+        work_dir = tempfile.mkdtemp(prefix="videogpt_")
+        output_video = OUT_VIDEO
+    else:
+        os.makedirs(work_dir, exist_ok=True)
+        output_video = os.path.join(work_dir, OUT_VIDEO)
 
     print(f"\n🎙️  Generating voiceovers with {VOICE_PROFILES[voice_profile]['voice']}")
     print(f"🎬 Using {subtitle_style.replace('_', ' ').title()} subtitle style")
 
-    for i, scene in enumerate(scenes):
-        narration = scene["narration"]
-        emotion = scene.get("emotion", "neutral")
-
-        # Get media file for this scene (fallback to last if not enough files)
-        media_file = media_paths[i] if i < len(media_paths) else media_paths[-1]
-
-        # Generate TTS
-        audio_file = f"audio_{i}.mp3"
-        make_expressive_tts(narration, audio_file, voice_profile, emotion)
-        temp_audio.append(audio_file)
-        audio = AudioFileClip(audio_file)
-
-        # Create base clip - handle both images AND videos
-        if is_video_file(media_file):
-            # It's a video file
-            base_clip = VideoFileClip(media_file)
-            
-            # Trim or loop video to match audio duration
-            if base_clip.duration < audio.duration:
-                # Loop video if too short
-                num_loops = int(audio.duration / base_clip.duration) + 1
-                base_clip = concatenate_videoclips([base_clip] * num_loops)
-            
-            # Trim to exact audio duration
-            base_clip = base_clip.subclip(0, audio.duration)
-            
-            # Resize and fit to vertical format
-            base_clip = base_clip.resize(width=OUT_W)
-            clip = base_clip.on_color(size=(OUT_W, OUT_H), color=(0, 0, 0))
-            
+    # Frame-exact timeline: every scene has integer frame + sample boundaries
+    with stages.stage("tts"):
+        timeline, narration_track = prepare_timeline(
+            scenes, media_paths, work_dir, voice_profile, subtitle_style,
+            width=width, height=height, progress=progress, media_info=media_info, cancel=cancel,
+            title=title, style=style, mood=mood,
+        )
+    timeline.save(os.path.join(work_dir, TIMELINE_FILE))
+    print(f"🧭 Timeline: {len(timeline.scenes)} scenes, {timeline.num_frames} frames "
+          f"({timeline.duration:.2f}s @ {FPS}fps)")
+
+    with stages.stage("audio"):
+        # Mix narration + background music once, outside the per-frame render loop
+        narration_audio = narration_track.pcm
+        mix_pcm_file = os.path.join(work_dir, "mix.f32")
+        mix_buffer = np.memmap(mix_pcm_file, dtype=np.float32,
+                               mode="w+", shape=narration_audio.shape)
+        if bg_music is not None:
+            print(f"\n🎵 Adding background music...")
+            mix = mix_narration_and_music(narration_audio, bg_music.pcm,
+                                          music_volume=MUSIC_VOLUME * bg_music.gain,
+                                          out=mix_buffer)
         else:
-            # It's an image file
-            clip = ImageClip(media_file).set_duration(audio.duration).resize(width=OUT_W)
-            clip = clip.on_color(size=(OUT_W, OUT_H), color=(0, 0, 0))
-
-        # Create viral-style subtitle
-        subtitle_clip = create_viral_subtitle(narration, subtitle_style, audio.duration, i)
-
-        # Composite video with subtitle
-        comp = CompositeVideoClip([clip, subtitle_clip], size=(OUT_W, OUT_H)).set_audio(audio)
-        clips.append(comp)
-
-        timer += audio.duration
-        media_type = "VIDEO" if is_video_file(media_file) else "IMAGE"
-        print(f"  ✓ Scene {i} ({media_type}) | Emotion: {emotion} | Duration: {audio.duration:.1f}s")
-
-    # Concatenate all clips
-    final = concatenate_videoclips(clips)
-    
-    # Add background music with professional mixing
-    if bg_music_file and os.path.exists(bg_music_file):
-        print(f"\n🎵 Adding background music...")
-        
-        bg_music = AudioFileClip(bg_music_file)
-        
-        if bg_music.duration < final.duration:
-            num_loops = int(final.duration / bg_music.duration) + 1
-            from moviepy.audio.AudioClip import concatenate_audioclips
-            bg_music = concatenate_audioclips([bg_music] * num_loops)
-        
-        bg_music = bg_music.subclip(0, final.duration)
-        bg_music = bg_music.volumex(0.18)  # 18% volume for music
-        
-        narration_audio = final.audio
-        composite_audio = CompositeAudioClip([narration_audio, bg_music])
-        final = final.set_audio(composite_audio)
-        
+            mix = mix_narration_and_music(narration_audio, out=mix_buffer)
+        mix.flush()
+        audio_mix_file = encode_audio(mix, os.path.join(work_dir, OUT_AUDIO_MIX))
+        del mix, mix_buffer
         print("✅ Audio mix complete!")
 
-    # Export final video
+        if bg_music is not None:
+            timeline.music = {"path": bg_music.path, "mood": bg_music.mood,
+                              "volume": MUSIC_VOLUME * bg_music.gain}
+        timeline.audio.update({"mix_pcm": mix_pcm_file, "mix": audio_mix_file})
+
     print("\n🎬 Rendering final video...")
-    final.write_videofile(OUT_VIDEO, fps=30, codec="libx264", audio_codec="aac", 
-                          preset='medium', bitrate='8000k')
+    profile = RENDER_PROFILES[render_profile]
+    timeline = timeline.resized(profile["scale"])
+
+    # Other aspect ratios share the decoded frames, TTS and mix of this render
+    extra_sizes = {}
+    for name in formats:
+        format_w, format_h = OUTPUT_FORMATS[name]
+        if (format_w, format_h) != (width, height):
+            extra_sizes[name] = (max(2, int(format_w * profile["scale"]) // 2 * 2),
+                                 max(2, int(format_h * profile["scale"]) // 2 * 2))
+    timeline.meta["outputs"] = {
+        name: os.path.basename(format_output_file(output_video, name)) for name in extra_sizes
+    }
+    if stream_dir:
+        # Progressive: HLS segments (with audio) are watchable while encoding,
+        # then get joined into the final MP4
+        with stages.stage("render"):
+            report(progress, "stream", playlist=os.path.join(stream_dir, STREAM_PLAYLIST))
+            playlist = render_stream(timeline, stream_dir, audio_mix_file,
+                                     preset=profile["preset"], bitrate=profile["bitrate"],
+                                     progress=progress, cancel=cancel, threads=threads,
+                                     extra_outputs=[
+                                         (w, h, format_output_file(output_video, name))
+                                         for name, (w, h) in extra_sizes.items()
+                                     ])
+        with stages.stage("mux"):
+            stream_to_mp4(playlist, output_video)
+    else:
+        # Video frames alone, so the encoder progress is the render progress
+        video_only = os.path.join(work_dir, OUT_VIDEO_ONLY)
+        with stages.stage("render"):
+            render_timeline(timeline, video_only,
+                            preset=profile["preset"], bitrate=profile["bitrate"],
+                            progress=progress, cancel=cancel, threads=threads,
+                            extra_outputs=[
+                                (w, h, format_output_file(video_only, name))
+                                for name, (w, h) in extra_sizes.items()
+                            ])
+        with stages.stage("mux"):
+            mux_audio(video_only, audio_mix_file, output_video)
+            for name in extra_sizes:
+                mux_audio(format_output_file(video_only, name), audio_mix_file,
+                          format_output_file(output_video, name))
+
+    timeline.meta["stages"] = stages.durations
+    timeline.save(os.path.join(work_dir, TIMELINE_FILE))
+    print(f"\n⏱️  Stage timings:\n{stages.summary()}")
 
     # Cleanup
-    for audio_file in temp_audio:
-        if os.path.exists(audio_file):
-            os.remove(audio_file)
+    if own_work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
-    return OUT_VIDEO
+    return output_video
 
 # -------------------------
 # INTERACTIVE UI
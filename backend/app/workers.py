@@ -0,0 +1,364 @@
+"""
+Warm render workers for VideoGPT
+Builds run in long-lived worker processes that import the engine, load the
+subtitle fonts, decode the music library and create the LLM client once at
+startup, then take jobs one after another until they're recycled
+"""
+
+import os
+import time
+import queue
+import threading
+import traceback
+import multiprocessing
+
+import psutil
+
+from cancellation import CancelToken, JobCancelled
+
+WORKERS_ENV = "VIDEOGPT_WORKERS"              # 0 = build in-process (default), "auto" = one per core
+WORKER_MAX_JOBS = int(os.getenv("VIDEOGPT_WORKER_MAX_JOBS", "20"))
+WORKER_MAX_RSS = int(os.getenv("VIDEOGPT_WORKER_MAX_RSS_MB", "2048")) * 1024 * 1024
+WORKER_JOIN_TIMEOUT = 10
+WORKER_START_ATTEMPTS = 5       # workers failing startup in a row before the pool gives up
+WORKER_RESPAWN_BACKOFF = 1.0    # seconds before replacing a worker that failed startup, doubling
+WORKER_RESPAWN_MAX_DELAY = 30.0
+CANCEL_ID_BYTES = 64    # room for the job id a cancel is addressed to
+
+
+def execute_build(job_id, build_kwargs, progress=None, profile_dir=None, cancel=None):
+    """
+    Runs one build in the current process, with job-tagged logs, peak RSS
+    tracking and optional profiling. Used in-process and inside workers.
+    Returns {"output", "peak_rss"} (peak_rss is None when other builds ran
+    in this process meanwhile, see PeakRSS); raises JobCancelled if `cancel`
+    fires.
+    """
+
+    from video_engine import build_video_from_user_images
+    from metrics import PeakRSS, job_context
+    from profiler import JobProfiler
+
+    with job_context(job_id), PeakRSS() as rss:
+        if profile_dir:
+            with JobProfiler(profile_dir):
+                output = build_video_from_user_images(progress=progress, cancel=cancel,
+                                                      **build_kwargs)
+        else:
+            output = build_video_from_user_images(progress=progress, cancel=cancel, **build_kwargs)
+    return {"output": output, "peak_rss": rss.job_peak}
+
+
+def preload():
+    """
+    Everything a build would otherwise initialize on first use.
+    """
+
+    import video_engine
+    from music_library import get_music_library
+    from subtitles import preload_subtitle_fonts
+
+    preload_subtitle_fonts(video_engine.OUT_W, video_engine.OUT_H)
+    get_music_library()
+    if video_engine.OPENAI_API_KEY:
+        video_engine.get_client()
+    import edge_tts  # noqa: F401  (imported lazily by the engine)
+
+
+class WorkerCancelToken(CancelToken):
+    """
+    A worker's shared cancel Event plus the id of the job the parent meant to
+    cancel: a cancel aimed at a job the worker already finished doesn't stop
+    the one it has moved on to
+    """
+
+    def __init__(self, event, target, job_id):
+        super().__init__(event)
+        self.target = target
+        self.job_id = job_id.encode()[:CANCEL_ID_BYTES]
+
+    @property
+    def cancelled(self):
+        return self.event.is_set() and self.target.value == self.job_id
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled(self.reason)
+
+
+def worker_main(worker_id, tasks, events, max_jobs, max_rss, cancel_event, cancel_target):
+    """
+    Worker process loop. Messages to the parent on `events`:
+    ("ready", worker_id), ("start_failed", worker_id, message),
+    ("start", worker_id, job_id), ("event", job_id, event),
+    ("done", job_id, result), ("error", job_id, message),
+    ("cancelled", job_id, reason), ("retire", worker_id).
+    The parent writes a job id to `cancel_target` and sets `cancel_event` to
+    cancel that job; the worker ignores it unless it is running that job.
+    """
+
+    try:
+        preload()
+    except Exception as e:
+        traceback.print_exc()
+        events.put(("start_failed", worker_id, f"{type(e).__name__}: {e}"))
+        return
+    events.put(("ready", worker_id))
+    process = psutil.Process()
+
+    jobs_done = 0
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job_id, build_kwargs, profile_dir = task
+        cancel_event.clear()
+        events.put(("start", worker_id, job_id))
+        try:
+            result = execute_build(
+                job_id, build_kwargs,
+                progress=lambda event: events.put(("event", job_id, event)),
+                profile_dir=profile_dir,
+                cancel=WorkerCancelToken(cancel_event, cancel_target, job_id),
+            )
+            events.put(("done", job_id, result))
+        except JobCancelled as e:
+            events.put(("cancelled", job_id, e.reason))
+        except Exception as e:
+            traceback.print_exc()
+            events.put(("error", job_id, str(e)))
+
+        jobs_done += 1
+        if jobs_done >= max_jobs or process.memory_info().rss > max_rss:
+            break
+
+    events.put(("retire", worker_id))
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of warm worker processes fed from one task queue. A
+    dispatcher thread relays worker messages to the job's progress callback
+    and result slot, and replaces workers that retire or die. Workers that
+    die before they are warm are replaced with a growing delay; after
+    WORKER_START_ATTEMPTS such failures in a row the pool is broken and
+    fails its queued and new jobs.
+    """
+
+    def __init__(self, size, max_jobs=WORKER_MAX_JOBS, max_rss=WORKER_MAX_RSS):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss
+        # spawn: the API process has threads and an event loop, which fork can't copy safely
+        self.context = multiprocessing.get_context("spawn")
+        self.tasks = self.context.Queue()
+        self.events = self.context.Queue()
+        self.lock = threading.Lock()
+        self.workers = {}       # worker_id -> Process
+        self.cancel_events = {} # worker_id -> (Event, job id Array): cancels the named job
+        self.running = {}       # worker_id -> job_id
+        self.pending = {}       # job_id -> {"progress", "done", "result", "error", "cancelled"}
+        self.next_worker_id = 0
+        self.closed = False
+        self.ready = set()          # workers that finished preload
+        self.start_failures = 0     # in a row, reset by a worker getting ready
+        self.start_error = None
+        self.respawns = 0           # workers to start once respawn_at passes
+        self.respawn_at = 0.0
+        self.broken = None          # error failing every job once workers can't start
+
+        for _ in range(size):
+            self._spawn()
+        self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def _spawn(self):
+        with self.lock:
+            worker_id = self.next_worker_id
+            self.next_worker_id += 1
+            cancel_event = self.context.Event()
+            cancel_target = self.context.Array("c", CANCEL_ID_BYTES)
+            process = self.context.Process(
+                target=worker_main,
+                args=(worker_id, self.tasks, self.events, self.max_jobs, self.max_rss,
+                      cancel_event, cancel_target),
+                name=f"videogpt-worker-{worker_id}",
+                daemon=True,
+            )
+            process.start()
+            self.workers[worker_id] = process
+            self.cancel_events[worker_id] = (cancel_event, cancel_target)
+        print(f"🧰 Render worker {worker_id} started (pid {process.pid})")
+
+    def _finish(self, job_id, result=None, error=None):
+        with self.lock:
+            slot = self.pending.pop(job_id, None)
+        if slot is not None:
+            slot["result"], slot["error"] = result, error
+            slot["done"].set()
+
+    def _dispatch(self):
+        while not self.closed:
+            try:
+                message = self.events.get(timeout=1.0)
+            except queue.Empty:
+                self._reap()
+                continue
+
+            kind = message[0]
+            if kind == "event":
+                _, job_id, event = message
+                slot = self.pending.get(job_id)
+                if slot is not None and slot["progress"] is not None:
+                    try:
+                        slot["progress"](event)
+                    except Exception as e:
+                        print(f"⚠️  Progress callback failed: {e}")
+            elif kind == "start":
+                _, worker_id, job_id = message
+                with self.lock:
+                    self.running[worker_id] = job_id
+                    slot = self.pending.get(job_id)
+                    if slot is not None and slot["cancelled"] is not None:
+                        # Cancelled while still queued
+                        self._signal_cancel(worker_id, job_id)
+            elif kind in ("done", "error", "cancelled"):
+                _, job_id, payload = message
+                with self.lock:
+                    for worker_id, running_job in list(self.running.items()):
+                        if running_job == job_id:
+                            del self.running[worker_id]
+                if kind == "done":
+                    self._finish(job_id, result=payload)
+                elif kind == "cancelled":
+                    self._finish(job_id, error=JobCancelled(payload))
+                else:
+                    self._finish(job_id, error=payload)
+            elif kind == "ready":
+                self.ready.add(message[1])
+                self.start_failures = 0
+                print(f"✅ Render worker {message[1]} warm")
+            elif kind == "start_failed":
+                self.start_error = message[2]
+            elif kind == "retire":
+                self._retire(message[1])
+
+    def _retire(self, worker_id):
+        with self.lock:
+            process = self.workers.pop(worker_id, None)
+            self.cancel_events.pop(worker_id, None)
+            self.ready.discard(worker_id)
+        if process is not None:
+            process.join(WORKER_JOIN_TIMEOUT)
+            print(f"♻️  Render worker {worker_id} recycled")
+        if not self.closed:
+            self._spawn()
+
+    def _reap(self):
+        """
+        Fails the job of any worker that died without retiring and replaces
+        it (after a backoff if it died during startup)
+        """
+        if self.respawns and time.time() >= self.respawn_at and not self.closed:
+            for _ in range(self.respawns):
+                self._spawn()
+            self.respawns = 0
+
+        with self.lock:
+            dead = [(wid, p) for wid, p in self.workers.items() if not p.is_alive()]
+        for worker_id, process in dead:
+            with self.lock:
+                self.workers.pop(worker_id, None)
+                self.cancel_events.pop(worker_id, None)
+                job_id = self.running.pop(worker_id, None)
+            if job_id is not None:
+                self._finish(job_id, error=f"Render worker crashed (exit code {process.exitcode})")
+            print(f"💥 Render worker {worker_id} exited ({process.exitcode})")
+            if worker_id not in self.ready:
+                self._start_failed()
+            elif not self.closed:
+                self.ready.discard(worker_id)
+                self._spawn()
+
+    def _start_failed(self):
+        """A worker died before getting warm: back off, or give up after too many"""
+        self.start_failures += 1
+        if self.start_failures >= WORKER_START_ATTEMPTS:
+            with self.lock:
+                self.broken = (f"Render workers can't start "
+                               f"({self.start_error or 'exited during startup'})")
+                stranded = list(self.pending)
+            print(f"🛑 {self.broken}; failing {len(stranded)} queued job(s)")
+            for job_id in stranded:
+                self._finish(job_id, error=self.broken)
+            return
+        delay = min(WORKER_RESPAWN_BACKOFF * 2 ** (self.start_failures - 1),
+                    WORKER_RESPAWN_MAX_DELAY)
+        print(f"⏳ Render worker failed to start ({self.start_error}); retrying in {delay:.1f}s")
+        self.respawns += 1
+        self.respawn_at = time.time() + delay
+
+    def run(self, job_id, build_kwargs, progress=None, profile_dir=None):
+        """
+        Queues a build and blocks until a worker finishes it. Returns the
+        same dict as execute_build; raises RuntimeError if the build failed
+        and JobCancelled if it was cancelled.
+        """
+
+        slot = {"progress": progress, "done": threading.Event(), "result": None, "error": None,
+                "cancelled": None}
+        with self.lock:
+            if self.broken:
+                raise RuntimeError(self.broken)
+            self.pending[job_id] = slot
+        self.tasks.put((job_id, build_kwargs, profile_dir))
+        slot["done"].wait()
+        if isinstance(slot["error"], JobCancelled):
+            raise slot["error"]
+        if slot["error"] is not None:
+            raise RuntimeError(slot["error"])
+        return slot["result"]
+
+    def cancel(self, job_id, reason="cancelled"):
+        """
+        Cancels a queued or running build; the worker stops at its next check
+        and run() raises JobCancelled.
+        """
+
+        with self.lock:
+            slot = self.pending.get(job_id)
+            if slot is None:
+                return False
+            slot["cancelled"] = reason
+            for worker_id, running_job in self.running.items():
+                if running_job == job_id:
+                    self._signal_cancel(worker_id, job_id)
+        return True
+
+    def _signal_cancel(self, worker_id, job_id):
+        """Tells a worker to cancel `job_id` (call with the lock held)"""
+        signal = self.cancel_events.get(worker_id)
+        if signal is not None:
+            cancel_event, cancel_target = signal
+            cancel_target.value = job_id.encode()[:CANCEL_ID_BYTES]
+            cancel_event.set()
+
+    def close(self):
+        self.closed = True
+        for _ in range(len(self.workers)):
+            self.tasks.put(None)
+        for process in list(self.workers.values()):
+            process.join(WORKER_JOIN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+
+
+def worker_count():
+    """
+    Size of the warm pool. With "auto" there is one worker per core and the
+    admission controller decides how many of them build at once.
+    """
+    workers = os.getenv(WORKERS_ENV, "0") or "0"
+    if workers == "auto":
+        return psutil.cpu_count() or 1
+    return int(workers)
@@ -0,0 +1,183 @@
+"""
+Cost model and fit / reservation logic of the admission controller, on a
+fake host (no live CPU or memory readings).
+"""
+
+import threading
+
+import pytest
+
+import admission
+from admission import AdmissionController, JobCost, estimate_cost, narration_seconds
+from cancellation import CancelToken, JobCancelled
+
+GB = 1024 ** 3
+
+
+class FakeHost:
+    """Stands in for psutil (live readings) and time (clocks) inside admission"""
+
+    def __init__(self):
+        self.cpu = 10.0
+        self.available = 16 * GB
+        self.cpu_samples = 0
+        self.now = 1_000_000.0
+
+    def cpu_percent(self, interval=None):
+        self.cpu_samples += 1
+        return self.cpu
+
+    def virtual_memory(self):
+        return type("Memory", (), {"available": self.available})()
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def host(monkeypatch):
+    host = FakeHost()
+    monkeypatch.setattr(admission, "psutil", host)
+    monkeypatch.setattr(admission, "time", host)
+    monkeypatch.setattr(admission, "log_event", lambda *args, **fields: None)
+    return host
+
+
+def controller(**options):
+    options = {"cores": 8, "memory": 16 * GB, "cpu_target": 1.0, "cpu_high": 90,
+               "memory_target": 0.5, "memory_reserve": GB, **options}
+    return AdmissionController(**options)
+
+
+def cost(cores=1.0, memory=GB):
+    return JobCost(cores=cores, memory=memory, duration=10, frames=300, out_pixels=1080 * 1920,
+                   outputs=1, scenes=3, media=3, videos=0)
+
+
+def fits(control, job_id, job_cost):
+    control.waiting[job_id] = admission.time.time()
+    try:
+        return control._fits(job_id, job_cost)
+    finally:
+        del control.waiting[job_id]
+
+
+def test_first_job_always_fits(host):
+    control = controller()
+    host.cpu = 100.0
+    assert fits(control, "big", cost(cores=64, memory=64 * GB))
+
+
+def test_reserved_cores_limit_admission(host):
+    control = controller()
+    control.admitted["a"] = cost(cores=6)
+    assert fits(control, "b", cost(cores=2))
+    assert not fits(control, "c", cost(cores=2.5))
+
+
+def test_reserved_memory_limit_admission(host):
+    control = controller()
+    control.admitted["a"] = cost(memory=6 * GB)
+    assert fits(control, "b", cost(memory=2 * GB))
+    assert not fits(control, "c", cost(memory=3 * GB))
+
+
+def test_live_pressure_blocks_a_second_job(host):
+    control = controller()
+    control.admitted["a"] = cost()
+    host.now += admission.ADMISSION_POLL
+    host.cpu = 95.0
+    assert not fits(control, "b", cost())
+
+    host.now += admission.ADMISSION_POLL
+    host.cpu = 10.0
+    host.available = 1.5 * GB   # leaves less than the 1 GB reserve
+    assert not fits(control, "b", cost())
+    host.available = 8 * GB
+    assert fits(control, "b", cost())
+
+
+def test_cpu_is_sampled_once_per_poll(host):
+    control = controller()
+    control.admitted["a"] = cost()
+    primed = host.cpu_samples
+    for _ in range(10):
+        fits(control, "b", cost())
+        control.snapshot()
+    assert host.cpu_samples == primed
+
+    host.now += admission.ADMISSION_POLL
+    host.cpu = 95.0
+    assert not fits(control, "b", cost())
+    assert host.cpu_samples == primed + 1
+
+
+def test_oldest_waiting_job_is_not_overtaken_forever(host):
+    control = controller()
+    control.admitted["a"] = cost(cores=7)
+    control.waiting["starving"] = host.now - admission.STARVATION_SECONDS - 1
+    assert not fits(control, "small", cost(cores=0.5))
+    del control.waiting["starving"]
+    assert fits(control, "small", cost(cores=0.5))
+
+
+def test_acquire_reserves_and_release_frees(host):
+    control = controller()
+    assert control.acquire("a", cost(cores=2.2)) == 3   # threads: admitted cores, rounded up
+    assert control.snapshot()["reserved_cores"] == 2.2
+    control.release("a")
+    assert control.snapshot()["running"] == 0
+    # Alone it is admitted however big, but never gets more threads than cores
+    assert control.acquire("b", cost(cores=64)) == 8
+
+
+def test_waiting_job_is_cancelled(host, monkeypatch):
+    control = controller()
+    control.admitted["a"] = cost(cores=8)
+    token = CancelToken()
+    waits = []
+    # Cancel while the job waits for capacity instead of sleeping the poll
+    monkeypatch.setattr(control.cond, "wait", lambda timeout=None: token.cancel("user"))
+    with pytest.raises(JobCancelled):
+        control.acquire("b", cost(cores=2), cancel=token, on_wait=lambda: waits.append(1))
+    assert waits == [1]
+    assert "b" not in control.waiting and "b" not in control.admitted
+
+
+def test_release_wakes_a_waiting_job(host):
+    control = controller()
+    control.admitted["a"] = cost(cores=8)
+    admitted = threading.Event()
+
+    def acquire():
+        control.acquire("b", cost(cores=2))
+        admitted.set()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    assert not admitted.wait(0.2)
+    control.release("a")
+    assert admitted.wait(5)
+    thread.join()
+
+
+def test_estimate_cost():
+    scenes = [{"narration": "one two three"}, {"narration": " ".join(["word"] * 26)}]
+    media_info = {"a.jpg": {"width": 4000, "height": 3000},
+                  "b.mp4": {"width": 1920, "height": 1080, "fps": 30, "duration": 5}}
+    job = estimate_cost(media_info, ["a.jpg", "b.mp4"], scenes, 1080, 1920, 30,
+                        scale=0.5, extra_sizes=[(540, 540)])
+
+    assert narration_seconds("one two three") == admission.MIN_SCENE_SECONDS
+    assert job.duration == pytest.approx(admission.MIN_SCENE_SECONDS + 10)
+    assert job.frames == int(job.duration * 30)
+    assert job.out_pixels == 540 * 960 + 540 * 540
+    assert (job.outputs, job.scenes, job.media, job.videos) == (2, 2, 2, 1)
+    assert job.memory > admission.JOB_BASE_MEMORY
+    assert job.cores > admission.COMPOSITE_CORES
@@ -0,0 +1,142 @@
+"""
+Lease, expiry, retry and failure semantics of the job brokers. Both run the
+same tests: JobBroker on a temporary SQLite file, RedisJobBroker on
+fakeredis when it is installed.
+"""
+
+import pytest
+
+import broker
+from broker import JobBroker, RedisJobBroker
+
+LEASE = 60
+
+
+class Clock:
+    """Stands in for the time module inside broker"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(broker, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def make_broker(request, tmp_path):
+    def make(max_attempts=3):
+        if request.param == "sqlite":
+            return JobBroker(str(tmp_path / "broker.db"), lease_seconds=LEASE,
+                             max_attempts=max_attempts)
+        fakeredis = pytest.importorskip("fakeredis")
+        return RedisJobBroker("redis://test", lease_seconds=LEASE, max_attempts=max_attempts,
+                              client=fakeredis.FakeRedis(decode_responses=True))
+    return make
+
+
+def test_lease_hands_out_oldest_job_once(make_broker, clock):
+    jobs = make_broker()
+    jobs.enqueue("a", {"n": 1})
+    clock.advance(1)
+    jobs.enqueue("b", {"n": 2})
+
+    assert jobs.lease("w1") == ("a", {"n": 1}, 1)
+    assert jobs.lease("w2") == ("b", {"n": 2}, 1)
+    assert jobs.lease("w3") is None
+    assert jobs.get("a")["status"] == "leased"
+    assert jobs.get("a")["worker"] == "w1"
+
+
+def test_heartbeat_keeps_lease(make_broker, clock):
+    jobs = make_broker()
+    jobs.enqueue("a", {})
+    jobs.lease("w1")
+
+    clock.advance(LEASE - 10)
+    assert jobs.heartbeat("a", "w1")
+    assert not jobs.heartbeat("a", "w2")
+    clock.advance(LEASE - 10)
+    jobs.reap()
+    assert jobs.get("a")["status"] == "leased"
+    assert jobs.lease("w2") is None
+
+
+def test_expired_lease_is_retried_by_another_worker(make_broker, clock):
+    jobs = make_broker()
+    jobs.enqueue("a", {"n": 1})
+    jobs.lease("w1")
+
+    clock.advance(LEASE + 1)
+    assert jobs.lease("w2") == ("a", {"n": 1}, 2)
+    assert [event for _, event in jobs.events("a")] == [
+        {"type": "retry", "attempt": 2, "lost_worker": "w1"}]
+
+    # The lost worker can neither renew nor finish the job any more
+    assert not jobs.heartbeat("a", "w1")
+    assert not jobs.complete("a", "w1", {"output": "stale.mp4"})
+    assert jobs.complete("a", "w2", {"output": "final.mp4"})
+    job = jobs.get("a")
+    assert job["status"] == "done"
+    assert job["result"] == {"output": "final.mp4"}
+    assert job["attempts"] == 2
+
+
+def test_job_fails_after_max_attempts(make_broker, clock):
+    jobs = make_broker(max_attempts=2)
+    jobs.enqueue("a", {})
+    for worker in ("w1", "w2"):
+        assert jobs.lease(worker) is not None
+        clock.advance(LEASE + 1)
+
+    jobs.reap()
+    job = jobs.get("a")
+    assert job["status"] == "failed"
+    assert "2 time(s)" in job["error"]
+    assert job["worker"] is None
+    assert jobs.lease("w3") is None
+
+
+def test_fail_and_cancel_end_the_lease(make_broker, clock):
+    jobs = make_broker()
+    jobs.enqueue("a", {})
+    jobs.enqueue("b", {})
+    jobs.lease("w1")
+    jobs.lease("w2")
+
+    assert jobs.fail("a", "w1", "boom")
+    assert jobs.get("a")["status"] == "failed"
+    assert jobs.get("a")["error"] == "boom"
+
+    assert jobs.cancel("b")
+    assert not jobs.heartbeat("b", "w2")
+    assert jobs.get("b")["status"] == "cancelled"
+    assert not jobs.cancel("b")
+
+    # Neither comes back when its old lease would have expired
+    clock.advance(LEASE + 1)
+    assert jobs.lease("w3") is None
+
+
+def test_events_and_forget(make_broker, clock):
+    jobs = make_broker()
+    jobs.enqueue("a", {})
+    jobs.publish("a", {"type": "stage", "stage": "tts"})
+    jobs.publish("a", {"type": "stage", "stage": "render"})
+
+    seq, _ = jobs.events("a")[0]
+    assert [event["stage"] for _, event in jobs.events("a", seq)] == ["render"]
+
+    jobs.forget("a")
+    assert jobs.get("a") is None
+    assert jobs.events("a") == []
+    assert jobs.lease("w1") is None
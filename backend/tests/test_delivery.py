@@ -0,0 +1,68 @@
+"""
+Range and conditional-request parsing of media delivery.
+"""
+
+import pytest
+
+from delivery import is_not_modified, parse_range, range_applies
+
+ETAG = '"abc123"'
+LAST_MODIFIED = "Wed, 21 Oct 2026 07:28:00 GMT"
+MTIME = 1792567680.0    # LAST_MODIFIED as a timestamp
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),       # suffix longer than the file: all of it
+    ("bytes=900-5000", (900, 999)),  # end clamped to the file
+    ("bytes= 10-20", (10, 20)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None, "", "items=0-1", "bytes=0-1,5-6", "bytes=a-b", "bytes=20-10",
+])
+def test_parse_range_serves_whole_file(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", 1000),
+    ("bytes=-0", 1000),
+    ("bytes=0-", 0),
+])
+def test_parse_range_unsatisfiable(header, size):
+    assert parse_range(header, size) is False
+
+
+def test_if_none_match():
+    assert is_not_modified({"if-none-match": ETAG}, ETAG, MTIME)
+    assert is_not_modified({"if-none-match": f'"other", W/{ETAG}'}, ETAG, MTIME)
+    assert is_not_modified({"if-none-match": "*"}, ETAG, MTIME)
+    assert not is_not_modified({"if-none-match": '"other"'}, ETAG, MTIME)
+
+
+def test_if_modified_since():
+    assert is_not_modified({"if-modified-since": LAST_MODIFIED}, ETAG, MTIME)
+    assert is_not_modified({"if-modified-since": LAST_MODIFIED}, ETAG, MTIME + 0.5)
+    assert not is_not_modified({"if-modified-since": LAST_MODIFIED}, ETAG, MTIME + 1)
+    assert not is_not_modified({"if-modified-since": "not a date"}, ETAG, MTIME)
+    assert not is_not_modified({}, ETAG, MTIME)
+
+
+def test_if_none_match_wins_over_if_modified_since():
+    headers = {"if-none-match": '"other"', "if-modified-since": LAST_MODIFIED}
+    assert not is_not_modified(headers, ETAG, MTIME)
+
+
+def test_range_applies():
+    assert range_applies({}, ETAG, LAST_MODIFIED)
+    assert range_applies({"if-range": ETAG}, ETAG, LAST_MODIFIED)
+    assert not range_applies({"if-range": '"stale"'}, ETAG, LAST_MODIFIED)
+    assert not range_applies({"if-range": f"W/{ETAG}"}, ETAG, LAST_MODIFIED)
+    assert range_applies({"if-range": LAST_MODIFIED}, ETAG, LAST_MODIFIED)
+    assert not range_applies({"if-range": "Tue, 20 Oct 2026 07:28:00 GMT"}, ETAG, LAST_MODIFIED)
@@ -0,0 +1,63 @@
+"""
+Incremental parsing of streamed scene completions.
+"""
+
+import json
+
+import pytest
+
+from scene_stream import SceneStreamParser
+
+SCENES = [
+    {"narration": 'She said "run" {now}', "image_prompt": "a \\ backslash, [brackets]"},
+    {"narration": "Second", "image_prompt": "sky", "emotion": "calm"},
+    {"narration": "Nested", "image_prompt": "x", "meta": {"tags": ["a", {"b": 1}]}},
+]
+DOCUMENT = "```json\n" + json.dumps({"scenes": SCENES}, indent=2) + "\n```"
+
+
+def feed_chunks(parser, text, size):
+    seen = []
+    for i in range(0, len(text), size):
+        seen.append(parser.feed(text[i:i + size]))
+    return seen
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(DOCUMENT)])
+def test_any_chunking_yields_the_same_scenes(size):
+    parser = SceneStreamParser()
+    completed = [scene for chunk in feed_chunks(parser, DOCUMENT, size) for scene in chunk]
+    assert completed == SCENES
+    assert parser.scenes == SCENES
+
+
+def test_chunk_boundary_inside_an_escape():
+    parser = SceneStreamParser()
+    text = json.dumps({"scenes": SCENES[:1]})
+    # Split right after the backslash of the \" escape inside the narration
+    split = text.index('\\"') + 1
+    assert parser.feed(text[:split]) == []
+    assert parser.in_string and parser.escaped
+    assert parser.feed(text[split:]) == SCENES[:1]
+
+
+def test_scenes_are_returned_as_soon_as_they_close():
+    parser = SceneStreamParser()
+    text = json.dumps({"scenes": SCENES})
+    first_end = text.index("}, {") + 1
+    assert parser.feed(text[:first_end]) == SCENES[:1]
+    assert parser.feed(text[first_end:]) == SCENES[1:]
+
+
+def test_top_level_array():
+    parser = SceneStreamParser()
+    assert parser.feed(json.dumps(SCENES[1:])) == SCENES[1:]
+
+
+def test_buffer_is_trimmed_between_scenes():
+    parser = SceneStreamParser()
+    text = json.dumps({"scenes": SCENES * 20})
+    for i in range(0, len(text), 50):
+        parser.feed(text[i:i + 50])
+        assert len(parser.buffer) <= len(json.dumps(SCENES[2])) + 50
+    assert len(parser.scenes) == 60
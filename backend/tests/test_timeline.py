@@ -0,0 +1,89 @@
+"""
+Frame and sample arithmetic of the frame-exact timeline.
+"""
+
+from timeline import (
+    Timeline, build_timeline, frame_aligned_padding, frame_to_sample, samples_to_frames,
+)
+
+FPS = 30
+SAMPLE_RATE = 48000     # 1600 samples per frame
+
+
+def make_timeline(frames_per_scene=(30, 45, 15)):
+    spans, start = [], 0
+    for frames in frames_per_scene:
+        end = start + frames * SAMPLE_RATE // FPS
+        spans.append((start, end))
+        start = end
+    scenes = [{"narration": f"scene {i}"} for i in range(len(spans))]
+    media = [{"path": f"{i}.jpg", "type": "image"} for i in range(len(spans))]
+    return build_timeline(scenes, media, spans, "modern_minimal", FPS, SAMPLE_RATE, 1080, 1920)
+
+
+def test_samples_round_up_to_whole_frames():
+    assert samples_to_frames(0, FPS, SAMPLE_RATE) == 0
+    assert samples_to_frames(1600, FPS, SAMPLE_RATE) == 1
+    assert samples_to_frames(1601, FPS, SAMPLE_RATE) == 2
+    assert frame_to_sample(2, FPS, SAMPLE_RATE) == 3200
+
+
+def test_padding_ends_audio_on_a_frame_boundary():
+    assert frame_aligned_padding(3200, FPS, SAMPLE_RATE) == 0
+    assert frame_aligned_padding(3201, FPS, SAMPLE_RATE) == 1599
+    # 44.1 kHz doesn't divide into 30 fps frames; the boundary is still exact
+    end = 44101
+    padded = end + frame_aligned_padding(end, FPS, 44100)
+    assert padded == frame_to_sample(samples_to_frames(end, FPS, 44100), FPS, 44100)
+
+
+def test_scenes_are_contiguous():
+    timeline = make_timeline()
+    assert [(s.start_frame, s.end_frame) for s in timeline.scenes] == [(0, 30), (30, 75), (75, 90)]
+    assert timeline.num_frames == 90
+    assert timeline.num_samples == 90 * 1600
+    assert timeline.duration == 3.0
+
+
+def test_scene_at_frame_boundaries():
+    timeline = make_timeline()
+    assert timeline.scene_at_frame(0).index == 0
+    assert timeline.scene_at_frame(29).index == 0
+    assert timeline.scene_at_frame(30).index == 1
+    assert timeline.scene_at_frame(74).index == 1
+    assert timeline.scene_at_frame(75).index == 2
+    assert timeline.scene_at_frame(-5).index == 0
+
+
+def test_time_to_frame_clamps_to_the_timeline():
+    timeline = make_timeline()
+    assert timeline.time_to_frame(1.0) == 30
+    assert timeline.time_to_frame(-1) == 0
+    assert timeline.time_to_frame(60) == 89
+
+
+def test_frame_ranges_cover_a_partial_render():
+    timeline = make_timeline()
+    ranges = [(scene.index, lo, hi) for scene, lo, hi in timeline.frame_ranges(20, 80)]
+    assert ranges == [(0, 20, 30), (1, 0, 45), (2, 0, 5)]
+
+
+def test_resized_keeps_timing_and_even_sizes():
+    timeline = make_timeline()
+    assert timeline.resized(1) is timeline
+
+    small = timeline.resized(1 / 3)
+    assert (small.width, small.height) == (360, 640)
+    assert small.scenes == timeline.scenes
+
+    odd = Timeline(fps=FPS, sample_rate=SAMPLE_RATE, width=1001, height=1001).resized(0.5)
+    assert (odd.width, odd.height) == (500, 500)
+    tiny = timeline.resized(0.001)
+    assert (tiny.width, tiny.height) == (2, 2)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    timeline = make_timeline()
+    timeline.meta["voice"] = "storyteller_female"
+    path = timeline.save(str(tmp_path / "timeline.json"))
+    assert Timeline.load(path) == timeline
@@ -33,6 +33,7 @@ export default function Page() {
   const [scenes, setScenes] = useState<Scene[]>([]);
   const [files, setFiles] = useState<File[]>([]);
   const [uploadId, setUploadId] = useState<string | null>(null);
+  const [projectId, setProjectId] = useState<string | null>(null);
   const [jobId, setJobId] = useState<string | null>(null);
   const [status, setStatus] = useState<any>(null);
   const [isDragging, setIsDragging] = useState(false);
@@ -42,16 +43,22 @@ export default function Page() {
 
   useEffect(() => {
     if (!jobId) return;
-    const id = setInterval(async () => {
+    // Progress is pushed by the server (SSE); EventSource reconnects on its own
+    const source = new EventSource(`${API_ROOT}/api/events/${jobId}`);
+    source.onmessage = (e) => {
+      const data = JSON.parse(e.data);
+      if (data.type === "deleted") { source.close(); return; }
+      setStatus((prev: any) => ({ ...prev, ...data }));
+      if (data.status === "done" || data.status === "error" || data.status === "cancelled") source.close();
+    };
+    source.onerror = async () => {
+      if (source.readyState !== EventSource.CLOSED) return;
       try {
         const res = await axios.get(`${API_ROOT}/api/status/${jobId}`);
         setStatus(res.data);
-        if (res.data.status === "done" || res.data.status === "error") clearInterval(id);
-      } catch {
-        clearInterval(id);
-      }
-    }, 1500);
-    return () => clearInterval(id);
+      } catch {}
+    };
+    return () => source.close();
   }, [jobId]);
 
   function setLoading(key:string, v:boolean){
@@ -69,6 +76,7 @@ export default function Page() {
       });
       const data = await res.json();
       setScenes(data.scenes || []);
+      setProjectId(data.project_id || null);
       setStep(2);
     } catch (e:any) {
       alert("Generate failed: " + e.message);
@@ -112,6 +120,8 @@ export default function Page() {
       fd.append("upload_id", uploadId);
       fd.append("title", title);
       fd.append("style", styleChoice);
+      // Build from this project's scenes, not whatever was generated last
+      if (projectId) fd.append("project_id", projectId);
       const res = await fetch(`${API_ROOT}/api/build`, { method: "POST", body: fd });
       const data = await res.json();
       if (!data.job_id) { alert("No job_id returned"); console.log(data); return; }
@@ -994,6 +1004,7 @@ export default function Page() {
               
               <div className="small-muted" style={{marginTop: 10}}>
                 Progress: {status?.progress ?? 0}% - {status?.status_message || "Waiting to start"}
+                {status?.status === "building" && status?.eta != null && ` · ~${Math.ceil(status.eta)}s left`}
               </div>
 
               {status?.status === "error" && (